@@ -0,0 +1,110 @@
+"""Read latency while a heavy save is running.
+
+Starts a bulk save of many programs and, while it runs, polls program
+reads from several concurrent tasks at a fixed rate, the way dashboard
+requests arrive. Latency is measured from when each read was due.
+Blocking: handlers call database.py directly inside the event loop, so
+every read waits for the save to finish. Async: writes go through
+run_write and reads through run_read, so reads keep being served.
+
+Uses a throwaway database in a temp directory. Run from apps/api:
+    python -m benchmarks.concurrency [--programs N] [--readers R]
+
+Exits non-zero when async p99 read latency exceeds --max-read-ms.
+tests/test_concurrency.py runs the async scenario under pytest.
+"""
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+from typing import Callable, Dict, List
+
+import numpy as np
+
+import database
+from engine import get_exercise_library, session_to_dict, weekly_plan
+
+def sample_programs(count: int) -> List[tuple]:
+    library = get_exercise_library()
+    weeks = []
+    for days in (3, 4, 5):
+        for focus in ('strength', 'cardio'):
+            goals = {'days_per_week': days, 'high_level_focus': focus, 'strength_focus': 'hypertrophy',
+                     'equipment': ['all'], 'muscle_target': []}
+            weeks.append([dict(session_to_dict(session), focus=focus) for session in weekly_plan(goals, library)])
+    return [(f"Squad {i}", "benchmark", weeks[i % len(weeks)]) for i in range(count)]
+
+async def poll_reads(read: Callable, program_id: int, interval: float, done: asyncio.Event,
+                     latencies: List[float]):
+    """Issue a read every `interval` seconds; latency counts from when it was due"""
+    due = time.perf_counter()
+    while not done.is_set():
+        await read(database.get_program_workouts, program_id)
+        latencies.append((time.perf_counter() - due) * 1e3)
+        due += interval
+        await asyncio.sleep(max(0.0, due - time.perf_counter()))
+
+async def scenario(write: Callable, read: Callable, programs: List[tuple], program_id: int,
+                   readers: int, interval: float) -> Dict:
+    done = asyncio.Event()
+    latencies: List[float] = []
+    pollers = [asyncio.create_task(poll_reads(read, program_id, interval, done, latencies))
+               for _ in range(readers)]
+    await asyncio.sleep(0.05)  # readers warm up before the save starts
+
+    start = time.perf_counter()
+    await write(database.save_programs_bulk, programs)
+    save_ms = (time.perf_counter() - start) * 1e3
+    await asyncio.sleep(0.05)  # let reads that came due during the save complete
+    done.set()
+    await asyncio.gather(*pollers)
+
+    return {
+        'save_ms': save_ms,
+        'reads': len(latencies),
+        'p50_ms': float(np.percentile(latencies, 50)),
+        'p99_ms': float(np.percentile(latencies, 99)),
+        'max_ms': max(latencies),
+    }
+
+async def blocking(fn, *args):
+    # What an async handler calling sqlite3 directly does
+    return fn(*args)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--programs', type=int, default=3000, help='programs in the heavy save')
+    parser.add_argument('--readers', type=int, default=8, help='concurrent read pollers')
+    parser.add_argument('--interval-ms', type=float, default=20.0, help='time between one poller\'s reads')
+    parser.add_argument('--max-read-ms', type=float, default=50.0)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        database.DB_NAME = os.path.join(tmp, "concurrency.db")
+        database.init_db()
+        programs = sample_programs(args.programs)
+        program_id = database.save_program_to_db(*programs[0])
+
+        results = {
+            mode: asyncio.run(scenario(write, read, programs, program_id, args.readers, args.interval_ms / 1e3))
+            for mode, write, read in [
+                ('blocking', blocking, blocking),
+                ('async', database.run_write, database.run_read),
+            ]
+        }
+        database.shutdown_executors()
+        database.close_connection_pool()
+
+    print(f"{'mode':<10}{'save ms':>10}{'reads':>8}{'p50 ms':>10}{'p99 ms':>10}{'max ms':>10}")
+    for mode, r in results.items():
+        print(f"{mode:<10}{r['save_ms']:>10.1f}{r['reads']:>8}{r['p50_ms']:>10.2f}"
+              f"{r['p99_ms']:>10.2f}{r['max_ms']:>10.1f}")
+
+    if results['async']['p99_ms'] > args.max_read_ms:
+        print(f"async p99 read latency above {args.max_read_ms} ms")
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,214 @@
+"""Latency and allocation benchmarks for the planning engine.
+
+Covers every entry in `schedules` (3-5 days x strength/cardio) for all four
+strength focuses, across representative equipment kits and muscle targets.
+Timed per call: weekly_plan, the four create_*_day builders and
+export_program_to_text. Allocations are measured in a separate tracemalloc
+pass so tracing does not skew the timings.
+
+Run from apps/api:
+    python -m benchmarks.planning --save benchmarks/baseline.json
+    python -m benchmarks.planning --baseline benchmarks/baseline.json
+
+With --baseline the run exits non-zero when any case's median is more than
+--threshold slower than the saved one (and by at least --min-delta-us).
+Baselines are machine specific; compare runs from the same idle host.
+"""
+import argparse
+import json
+import platform
+import sys
+import time
+import tracemalloc
+from itertools import product
+from typing import Callable, Dict, List, Tuple
+
+import numpy as np
+
+from engine import (
+    MuscleVector, create_accessory_day, create_full_day, create_lower_day,
+    create_muscle_emphasis, create_upper_day, export_program_to_text,
+    get_exercise_library, schedules, weekly_plan,
+)
+
+STRENGTH_FOCUSES = ['endurance', 'hypertrophy', 'power', 'strength']
+
+KITS = {
+    'all': ['all'],
+    'bodyweight': [],
+    'dumbbell': ['dumbbell', 'bar'],
+    'barbell': ['barbell', 'plates', 'rack', 'bench'],
+}
+
+TARGETS = {
+    'none': [],
+    'chest': ['chest'],
+    'legs': ['quad', 'glute'],
+    'pull': ['lat', 'bicep', 'core'],
+}
+
+# Builder and the minutes the schedules most often give it
+BUILDERS = {
+    'create_upper_day': (create_upper_day, 55),
+    'create_lower_day': (create_lower_day, 55),
+    'create_full_day': (create_full_day, 55),
+    'create_accessory_day': (create_accessory_day, 35),
+}
+
+def plan_cases() -> List[Tuple[str, Dict]]:
+    """(case name, plan goals) for every schedule x focus x kit x target"""
+    cases = []
+    for days, focus in sorted((d, f) for d in schedules for f in schedules[d]):
+        for strength_focus, kit, target in product(STRENGTH_FOCUSES, KITS, TARGETS):
+            name = f"{days}d/{focus}/{strength_focus}/{kit}/{target}"
+            cases.append((name, {
+                'days_per_week': days,
+                'high_level_focus': focus,
+                'strength_focus': strength_focus,
+                'equipment': KITS[kit],
+                'muscle_target': TARGETS[target],
+            }))
+    return cases
+
+def builder_cases(library) -> List[Tuple[str, Callable[[], tuple], Callable]]:
+    """Day builders only depend on the strength focus, kit and target"""
+    cases = []
+    for (name, (builder, minutes)), strength_focus, kit, target in product(
+            BUILDERS.items(), STRENGTH_FOCUSES, KITS, TARGETS):
+        goal = MuscleVector.from_dict(create_muscle_emphasis(TARGETS[target])).normalized()
+        tracks_primary = strength_focus in ['power', 'strength']
+
+        def setup(goal=goal, minutes=minutes, kit=kit, tracks_primary=tracks_primary):
+            return (MuscleVector(), goal, minutes, {} if tracks_primary else None, library, KITS[kit])
+
+        cases.append((f"{name}:{strength_focus}/{kit}/{target}", setup, builder))
+    return cases
+
+def percentile(samples: List[float], q: float) -> float:
+    return float(np.percentile(samples, q))
+
+def measure(fn: Callable, setup: Callable[[], tuple], iterations: int, alloc_iterations: int) -> Dict:
+    """Per-call latency percentiles (us) and peak traced allocation (KB)"""
+    fn(*setup())  # warm caches so the first sample is not an outlier
+
+    samples = []
+    for _ in range(iterations):
+        args = setup()
+        start = time.perf_counter()
+        fn(*args)
+        samples.append((time.perf_counter() - start) * 1e6)
+
+    peaks = []
+    tracemalloc.start()
+    try:
+        for _ in range(alloc_iterations):
+            args = setup()
+            tracemalloc.reset_peak()
+            base, _ = tracemalloc.get_traced_memory()
+            fn(*args)
+            _, peak = tracemalloc.get_traced_memory()
+            peaks.append(peak - base)
+    finally:
+        tracemalloc.stop()
+
+    return {
+        'p50_us': round(percentile(samples, 50), 2),
+        'p95_us': round(percentile(samples, 95), 2),
+        'p99_us': round(percentile(samples, 99), 2),
+        'peak_kb': round(max(peaks) / 1024, 2),
+    }
+
+def run(iterations: int, alloc_iterations: int, only: str = None) -> Dict[str, Dict]:
+    library = get_exercise_library()
+    results = {}
+
+    for name, goals in plan_cases():
+        week = weekly_plan(goals, library)
+        benches = [
+            ('weekly_plan', weekly_plan, lambda goals=goals: (goals, library)),
+            ('export_program_to_text', export_program_to_text,
+             lambda week=week, goals=goals: (week, goals['strength_focus'])),
+        ]
+        for label, fn, setup in benches:
+            if only and only not in label:
+                continue
+            results[f"{label}:{name}"] = measure(fn, setup, iterations, alloc_iterations)
+
+    for name, setup, builder in builder_cases(library):
+        if only and only not in name:
+            continue
+        results[name] = measure(builder, setup, iterations, alloc_iterations)
+
+    return results
+
+def summarize(results: Dict[str, Dict]) -> None:
+    by_function: Dict[str, List[Dict]] = {}
+    for name, stats in results.items():
+        by_function.setdefault(name.split(':', 1)[0], []).append(stats)
+
+    print(f"{'function':<24}{'cases':>7}{'p50 us':>10}{'p95 us':>10}{'p99 us':>10}{'peak KB':>10}")
+    for function, rows in by_function.items():
+        print(f"{function:<24}{len(rows):>7}"
+              f"{np.median([r['p50_us'] for r in rows]):>10.1f}"
+              f"{np.median([r['p95_us'] for r in rows]):>10.1f}"
+              f"{max(r['p99_us'] for r in rows):>10.1f}"
+              f"{max(r['peak_kb'] for r in rows):>10.1f}")
+
+def regressions(results: Dict[str, Dict], baseline: Dict[str, Dict],
+                threshold: float, min_delta_us: float) -> List[str]:
+    """Cases whose median slowed past the threshold, worst first"""
+    failures = []
+    for name, stats in results.items():
+        old = baseline.get(name)
+        if not old:
+            continue
+        limit = max(old['p50_us'] * (1 + threshold), old['p50_us'] + min_delta_us)
+        if stats['p50_us'] > limit:
+            failures.append((stats['p50_us'] / old['p50_us'],
+                             f"{name}: p50 {old['p50_us']:.1f} -> {stats['p50_us']:.1f} us"))
+    return [line for _, line in sorted(failures, reverse=True)]
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--iterations', type=int, default=50, help='timed calls per case')
+    parser.add_argument('--alloc-iterations', type=int, default=3, help='traced calls per case')
+    parser.add_argument('--only', help='run cases whose name contains this string')
+    parser.add_argument('--save', metavar='PATH', help='write results as a baseline JSON')
+    parser.add_argument('--baseline', metavar='PATH', help='compare against a saved baseline')
+    parser.add_argument('--threshold', type=float, default=0.25,
+                        help='allowed p50 slowdown as a fraction (default 0.25)')
+    parser.add_argument('--min-delta-us', type=float, default=5.0,
+                        help='ignore slowdowns smaller than this many microseconds')
+    parser.add_argument('--show', type=int, default=20, help='regressions to list')
+    args = parser.parse_args()
+
+    results = run(args.iterations, args.alloc_iterations, args.only)
+    summarize(results)
+
+    if args.save:
+        with open(args.save, 'w') as f:
+            json.dump({
+                'python': platform.python_version(),
+                'machine': platform.machine(),
+                'iterations': args.iterations,
+                'cases': results,
+            }, f, indent=1, sort_keys=True)
+        print(f"baseline written to {args.save} ({len(results)} cases)")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)['cases']
+        failures = regressions(results, baseline, args.threshold, args.min_delta_us)
+        missing = len(set(results) - set(baseline))
+        print(f"compared {len(results) - missing} cases against {args.baseline}"
+              + (f" ({missing} not in baseline)" if missing else ""))
+        if failures:
+            print(f"{len(failures)} case(s) slower than {args.threshold:.0%}:")
+            for line in failures[:args.show]:
+                print(f"  {line}")
+            if len(failures) > args.show:
+                print(f"  ... and {len(failures) - args.show} more")
+            sys.exit(1)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,100 @@
+"""Compare plan serialization paths.
+
+Legacy: asdict() on each session, then pydantic validation and JSON
+encoding the way FastAPI handles a `response_model=ChatResponse` return.
+Direct: engine.week_json, which writes the bytes the endpoints now return.
+
+Run from apps/api:  python -m benchmarks.serialize [--plans N] [--repeat R]
+"""
+import argparse
+import json
+import time
+from dataclasses import asdict, dataclass, field, replace
+from typing import Any, Dict, List, Optional
+
+from pydantic import BaseModel, TypeAdapter
+
+from engine import dumps_json, get_exercise_library, weekly_plan, week_json
+
+class ChatResponse(BaseModel):
+    message: str
+    state: Dict[str, Any]
+    is_complete: bool = False
+    plan: Optional[str] = None
+    plan_data: Optional[List[Dict[str, Any]]] = None
+
+def sample_goals(count: int) -> List[Dict]:
+    kits = [['all'], ['dumbbell', 'bar'], ['barbell', 'plates', 'rack', 'bench'], []]
+    targets = [[], ['chest'], ['quad', 'glute'], ['lat', 'bicep', 'core']]
+    goals = []
+    for i in range(count):
+        goals.append({
+            'days_per_week': 3 + i % 3,
+            'high_level_focus': ['strength', 'cardio'][i % 2],
+            'strength_focus': ['endurance', 'hypertrophy', 'power', 'strength'][i % 4],
+            'equipment': kits[i % len(kits)],
+            'muscle_target': targets[(i // 4) % len(targets)],
+        })
+    return goals
+
+@dataclass
+class LegacyExercise:
+    """Exercise as it was before definitions were shared, reps and all"""
+    name: str
+    equipment: List[str]
+    category: str
+    difficulty: int = 1
+    primary_muscles: List[str] = field(default_factory=list)
+    activation: Dict[str, float] = field(default_factory=dict)
+    instructions: str = ""
+    reps: str = ""
+
+def legacy_week(week):
+    """The plan as it looked when circuits held standalone Exercise copies"""
+    return [
+        replace(session, circuits=[
+            replace(circuit, exercises=[LegacyExercise(**p.to_dict()) for p in circuit.exercises])
+            for circuit in session.circuits
+        ], warmup=list(session.warmup), cooldown=list(session.cooldown))
+        for session in week
+    ]
+
+def legacy_encode(week, adapter) -> bytes:
+    response = ChatResponse(message="", state={}, is_complete=True,
+                            plan_data=[asdict(day) for day in week])
+    validated = adapter.validate_python(response)
+    return dumps_json(adapter.dump_python(validated, mode='json'))
+
+def timed(fn, items, repeat: int) -> float:
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for item in items:
+            fn(item)
+        best = min(best, time.perf_counter() - start)
+    return best / len(items)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--plans', type=int, default=200)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    library = get_exercise_library()
+    weeks = [weekly_plan(goals, library) for goals in sample_goals(args.plans)]
+    legacy_weeks = [legacy_week(week) for week in weeks]
+    adapter = TypeAdapter(ChatResponse)
+
+    for week, old in zip(weeks, legacy_weeks):
+        expected = json.loads(legacy_encode(old, adapter))['plan_data']
+        assert json.loads(week_json(week)) == expected, "serializers disagree"
+
+    legacy = timed(lambda week: legacy_encode(week, adapter), legacy_weeks, args.repeat)
+    direct = timed(week_json, weeks, args.repeat)
+    print(f"plans: {args.plans}, best of {args.repeat}")
+    print(f"asdict + pydantic: {legacy * 1e6:8.1f} us/plan")
+    print(f"week_json:         {direct * 1e6:8.1f} us/plan")
+    print(f"speedup:           {legacy / direct:8.1f}x")
+
+if __name__ == '__main__':
+    main()
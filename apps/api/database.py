@@ -1,159 +1,772 @@
+import asyncio
+import hashlib
+import importlib.util
 import sqlite3
 import json
 import os
+import queue
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache, partial
 
 DB_NAME = "german_gym_bros.db"
 
+# NNN_name.sql/.py files, applied in order; PRAGMA user_version is the last one applied
+MIGRATIONS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "migrations")
+
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "8"))
+DB_POOL_TIMEOUT_SECONDS = 10.0
+STATEMENT_CACHE_SIZE = 256
+
+# Run on every new connection. WAL lets readers carry on while one writer
+# commits, and synchronous=NORMAL is still crash-safe for the app in WAL.
+CONNECTION_PRAGMAS = (
+    "PRAGMA journal_mode = WAL",
+    "PRAGMA synchronous = NORMAL",
+    "PRAGMA cache_size = -65536",  # KiB, i.e. 64 MB
+    "PRAGMA mmap_size = 268435456",
+    "PRAGMA temp_store = MEMORY",
+    "PRAGMA busy_timeout = 5000",
+    "PRAGMA foreign_keys = ON",
+)
+
+class PooledConnection(sqlite3.Connection):
+    """A connection whose close() hands it back to its pool.
+
+    Anything left uncommitted is rolled back first, so the next borrower
+    always starts clean. A repeat close() does nothing, so one borrow can
+    never put the connection in the pool twice. discard() really closes it.
+    """
+    pool = None
+    borrowed = False
+
+    def close(self):
+        if self.pool is None:
+            super().close()
+            return
+        if not self.borrowed:
+            return
+        if self.in_transaction:
+            self.rollback()
+        self.borrowed = False
+        self.pool.release(self)
+
+    def discard(self):
+        super().close()
+
+class ConnectionPool:
+    """Up to `size` long-lived connections shared by all threads.
+
+    Each connection is only ever used by one borrower at a time, which is
+    what makes check_same_thread=False safe here. Idle connections are
+    reused most-recent-first so their page caches stay warm.
+    """
+
+    def __init__(self, path: str, size: int = DB_POOL_SIZE):
+        self.path = path
+        self.size = size
+        self.closed = False
+        self._idle = queue.LifoQueue()
+        self._created = 0
+        self._lock = threading.Lock()
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, factory=PooledConnection, check_same_thread=False,
+                               cached_statements=STATEMENT_CACHE_SIZE)
+        conn.row_factory = sqlite3.Row
+        for pragma in CONNECTION_PRAGMAS:
+            conn.execute(pragma)
+        conn.pool = self
+        return conn
+
+    def acquire(self):
+        conn = self._borrow()
+        conn.borrowed = True
+        return conn
+
+    def _borrow(self):
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+        with self._lock:
+            grow = self._created < self.size
+            if grow:
+                self._created += 1
+        if grow:
+            try:
+                return self._connect()
+            except Exception:
+                with self._lock:
+                    self._created -= 1
+                raise
+        try:
+            return self._idle.get(timeout=DB_POOL_TIMEOUT_SECONDS)
+        except queue.Empty:
+            raise sqlite3.OperationalError(f"No database connection free after {DB_POOL_TIMEOUT_SECONDS}s")
+
+    def release(self, conn):
+        conn.row_factory = sqlite3.Row
+        if self.closed:
+            conn.discard()
+            return
+        self._idle.put(conn)
+
+    def close_all(self):
+        """Close idle connections now and borrowed ones as they come back"""
+        self.closed = True
+        while True:
+            try:
+                self._idle.get_nowait().discard()
+            except queue.Empty:
+                break
+
+@lru_cache(maxsize=None)
+def get_connection_pool() -> ConnectionPool:
+    """Shared pool for DB_NAME, opened on first use"""
+    return ConnectionPool(DB_NAME)
+
+def close_connection_pool():
+    get_connection_pool().close_all()
+    get_connection_pool.cache_clear()
+
 def get_db_connection():
-    conn = sqlite3.connect(DB_NAME)
-    conn.row_factory = sqlite3.Row
-    return conn
+    """Borrow a pooled connection; close() returns it to the pool"""
+    return get_connection_pool().acquire()
+
+# The handlers are async, so they call the functions below through
+# run_read/run_write to keep sqlite3 off the event loop. Reads share a
+# thread pool one smaller than the connection pool, leaving a connection
+# for the writer. Writes queue on a single thread and run in arrival order,
+# so they never wait on each other's write lock. Streaming responses read
+# through iter_read, so they never hold connections beyond the read pool.
+DB_READ_WORKERS = max(1, DB_POOL_SIZE - 1)
+
+@lru_cache(maxsize=None)
+def get_read_executor() -> ThreadPoolExecutor:
+    return ThreadPoolExecutor(DB_READ_WORKERS, thread_name_prefix="db-read")
+
+@lru_cache(maxsize=None)
+def get_write_executor() -> ThreadPoolExecutor:
+    return ThreadPoolExecutor(1, thread_name_prefix="db-write")
+
+async def run_read(fn, *args, **kwargs):
+    """Await a read-only data-access call on the read pool"""
+    return await asyncio.get_running_loop().run_in_executor(get_read_executor(), partial(fn, *args, **kwargs))
+
+async def iter_read(iterator):
+    """Drive a blocking iterator that reads the database on the read pool, one item per call"""
+    done = object()
+    while True:
+        item = await run_read(next, iterator, done)
+        if item is done:
+            return
+        yield item
+
+async def run_write(fn, *args, **kwargs):
+    """Await a data-access call that writes, queued behind earlier writes"""
+    return await asyncio.get_running_loop().run_in_executor(get_write_executor(), partial(fn, *args, **kwargs))
+
+def shutdown_executors():
+    """Finish queued calls, then stop the read and write threads"""
+    for executor in (get_write_executor, get_read_executor):
+        executor().shutdown(wait=True)
+        executor.cache_clear()
+
+def migration_files():
+    """[(version, path)] for every migration, oldest first"""
+    migrations = []
+    for name in os.listdir(MIGRATIONS_DIR):
+        if name.endswith(('.sql', '.py')):
+            migrations.append((int(name.split('_', 1)[0]), os.path.join(MIGRATIONS_DIR, name)))
+    return sorted(migrations)
+
+def run_migration(conn, path):
+    """Execute one migration inside the caller's transaction.
+
+    A .sql file is run statement by statement; a .py file (for data that
+    SQL alone can't transform) must define upgrade(conn).
+    """
+    if path.endswith('.py'):
+        spec = importlib.util.spec_from_file_location(os.path.basename(path)[:-3], path)
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+        module.upgrade(conn)
+        return
+    with open(path, 'r') as f:
+        for statement in sql_statements(f.read()):
+            conn.execute(statement)
+
+def sql_statements(script):
+    """Split a script into complete statements (trigger bodies stay whole)"""
+    statement = ''
+    for line in script.splitlines(keepends=True):
+        statement += line
+        if sqlite3.complete_statement(statement):
+            yield statement
+            statement = ''
+
+def migrate(conn):
+    """Apply every migration newer than the database's user_version.
+
+    Each migration runs in its own IMMEDIATE transaction together with its
+    version bump, so a failure leaves the database at the previous
+    version, and concurrent workers starting up apply each one once.
+    Foreign keys are off while it runs (table rebuilds need that); a
+    migration that orphans rows is rolled back. Returns the versions
+    applied.
+    """
+    applied = []
+    conn.execute("PRAGMA foreign_keys = OFF")
+    try:
+        for version, path in migration_files():
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                if conn.execute("PRAGMA user_version").fetchone()[0] >= version:
+                    conn.rollback()
+                    continue
+                orphans = len(conn.execute("PRAGMA foreign_key_check").fetchall())
+                run_migration(conn, path)
+                added = len(conn.execute("PRAGMA foreign_key_check").fetchall()) - orphans
+                if added > 0:
+                    raise sqlite3.IntegrityError(
+                        f"Migration {version} leaves {added} more rows pointing at missing parents")
+                conn.execute(f"PRAGMA user_version = {version}")
+                conn.commit()
+                applied.append(version)
+            except Exception:
+                conn.rollback()
+                raise
+    finally:
+        conn.execute("PRAGMA foreign_keys = ON")
+    return applied
 
 def init_db():
-    if not os.path.exists(DB_NAME):
-        print("Initializing database...")
-        conn = get_db_connection()
-        with open('sqlite_schema.sql', 'r') as f:
-            conn.executescript(f.read())
-        conn.commit()
+    exists = os.path.exists(DB_NAME)
+    print("Database already exists." if exists else "Initializing database...")
+    conn = get_db_connection()
+    try:
+        applied = migrate(conn)
+    finally:
         conn.close()
+    if not exists:
         print("Database initialized.")
-    else:
-        print("Database already exists.")
+    elif applied:
+        print(f"Database migrated to version {applied[-1]}.")
+
+# Where each saved part of a day goes in workout_components.order_index
+COMPONENT_ORDER = {'warmup': 0, 'cardio': 99, 'cooldown': 100}
+
+BLOB_CACHE_SIZE = 4096
+
+def canonical_json(value):
+    """The one spelling of a payload that its blob is keyed on"""
+    return json.dumps(value, sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+
+def blob_hash(text):
+    return hashlib.blake2b(text.encode('utf-8'), digest_size=16).digest()
+
+def store_blobs(cursor, payloads):
+    """Make sure a blob exists for each (value, JSON text) pair; returns their hashes in order.
+
+    Only the hash is taken from the canonical form. The blob keeps the text
+    as given, so readers see keys in the order they were written; a payload
+    that differs from a stored one only in spelling shares its blob.
+    """
+    keys, blobs = [], {}
+    for value, text in payloads:
+        key = blob_hash(canonical_json(value))
+        blobs.setdefault(key, text)
+        keys.append(key)
+    cursor.executemany("INSERT OR IGNORE INTO component_blobs (hash, data) VALUES (?, ?)", blobs.items())
+    return keys
+
+def release_blobs(cursor, keys):
+    """Delete the blobs among `keys` that no component references any more"""
+    keys = [key for key in set(keys) if key is not None]
+    if keys:
+        placeholders = ','.join(['?'] * len(keys))
+        cursor.execute(
+            f"DELETE FROM component_blobs WHERE hash IN ({placeholders})"
+            " AND NOT EXISTS (SELECT 1 FROM workout_components WHERE blob_hash = component_blobs.hash)",
+            keys
+        )
+
+class BlobCache:
+    """Decoded component payloads by content hash, least recently used out.
+
+    Identical warmups, cooldowns and circuits recur across days and
+    programs, so most reads skip json.loads. Entries are shared by every
+    reader: treat them as read-only.
+    """
+
+    def __init__(self, size: int = BLOB_CACHE_SIZE):
+        self.size = size
+        self.hits = 0
+        self.misses = 0
+        self._values = OrderedDict()
+        self._lock = threading.Lock()
+
+    def decode(self, key, text):
+        with self._lock:
+            if key in self._values:
+                self._values.move_to_end(key)
+                self.hits += 1
+                return self._values[key]
+            self.misses += 1
+        value = json.loads(text)
+        with self._lock:
+            self._values[key] = value
+            if len(self._values) > self.size:
+                self._values.popitem(last=False)
+        return value
+
+@lru_cache(maxsize=None)
+def get_blob_cache() -> BlobCache:
+    return BlobCache()
+
+def decode_component(comp):
+    """A stored component's payload; raw `data` is only left on rows that aren't valid JSON"""
+    if comp['blob_hash'] is not None:
+        return get_blob_cache().decode(comp['blob_hash'], comp['data'])
+    return json.loads(comp['data'])
+
+# Component columns for decode_component/components_to_day, with the blob join they need
+COMPONENT_COLUMNS = "c.component_type, c.blob_hash, COALESCE(b.data, c.data) AS data"
+COMPONENT_BLOBS_JOIN = "LEFT JOIN component_blobs b ON b.hash = c.blob_hash"
+
+def day_components(day):
+    """(component_type, order_index, payload) rows for one day of a plan"""
+    rows = []
+    if day.get('warmup'):
+        rows.append(('warmup', COMPONENT_ORDER['warmup'], day['warmup']))
+    for i, circuit in enumerate(day.get('circuits', [])):
+        rows.append(('circuit', i + 1, circuit))
+    for kind in ('cardio', 'cooldown'):
+        if day.get(kind):
+            rows.append((kind, COMPONENT_ORDER[kind], day[kind]))
+    return rows
+
+def insert_program(cursor, program_name, description, plan_data):
+    """Insert one program inside the caller's transaction.
+
+    Workouts go in with one executemany. Returns the program id and its
+    component rows, ready for the caller to executemany into
+    workout_components.
+    """
+    cursor.execute(
+        "INSERT INTO training_programs (name, description) VALUES (?, ?)",
+        (program_name, description)
+    )
+    program_id = cursor.lastrowid
+
+    # plan_data is a list of day dicts with keys: day, focus, warmup, circuits, cardio, cooldown
+    cursor.executemany(
+        "INSERT INTO workouts (program_id, day_number, name, focus) VALUES (?, ?, ?, ?)",
+        [(program_id, day.get('day'), f"Day {day.get('day')}", day.get('focus')) for day in plan_data]
+    )
+    # AUTOINCREMENT ids are consecutive while this transaction holds the write lock
+    last_id = cursor.execute("SELECT last_insert_rowid()").fetchone()[0]
+    workout_ids = range(last_id - len(plan_data) + 1, last_id + 1)
+
+    components = [
+        (workout_id,) + component
+        for workout_id, day in zip(workout_ids, plan_data)
+        for component in day_components(day)
+    ]
+    return program_id, components
+
+def insert_components(cursor, components):
+    """Insert (workout_id, component_type, order_index, payload) rows.
+
+    Payloads are stored once each in component_blobs; components point at
+    them by hash.
+    """
+    keys = store_blobs(cursor, [(value, json.dumps(value)) for _, _, _, value in components])
+    cursor.executemany(
+        "INSERT INTO workout_components (workout_id, component_type, order_index, blob_hash) VALUES (?, ?, ?, ?)",
+        [(workout_id, kind, order_index, key) for (workout_id, kind, order_index, _), key in zip(components, keys)]
+    )
 
 def save_program_to_db(program_name, description, plan_data):
     conn = get_db_connection()
     cursor = conn.cursor()
-    
+
     try:
-        # 1. Create Program
-        cursor.execute(
-            "INSERT INTO training_programs (name, description) VALUES (?, ?)",
-            (program_name, description)
-        )
-        program_id = cursor.lastrowid
-        
-        # 2. Iterate through days (plan_data is a list of day objects)
-        for day in plan_data:
-            # day is a dict with keys: day, focus, warmup, circuits, cardio
-            day_num = day.get('day')
-            focus = day.get('focus')
-            
-            cursor.execute(
-                "INSERT INTO workouts (program_id, day_number, name, focus) VALUES (?, ?, ?, ?)",
-                (program_id, day_num, f"Day {day_num}", focus)
-            )
-            workout_id = cursor.lastrowid
-            
-            # 3. Save Components
-            
-            # Warmup
-            if day.get('warmup'):
-                cursor.execute(
-                    "INSERT INTO workout_components (workout_id, component_type, order_index, data) VALUES (?, ?, ?, ?)",
-                    (workout_id, 'warmup', 0, json.dumps(day['warmup']))
-                )
-            
-            # Circuits
-            circuits = day.get('circuits', [])
-            for i, circuit in enumerate(circuits):
-                cursor.execute(
-                    "INSERT INTO workout_components (workout_id, component_type, order_index, data) VALUES (?, ?, ?, ?)",
-                    (workout_id, 'circuit', i + 1, json.dumps(circuit))
-                )
-                
-            # Cardio
-            if day.get('cardio'):
-                cursor.execute(
-                    "INSERT INTO workout_components (workout_id, component_type, order_index, data) VALUES (?, ?, ?, ?)",
-                    (workout_id, 'cardio', 99, json.dumps(day['cardio']))
-                )
-
-            # Cooldown
-            if day.get('cooldown'):
-                cursor.execute(
-                    "INSERT INTO workout_components (workout_id, component_type, order_index, data) VALUES (?, ?, ?, ?)",
-                    (workout_id, 'cooldown', 100, json.dumps(day['cooldown']))
-                )
-                
+        program_id, components = insert_program(cursor, program_name, description, plan_data)
+        insert_components(cursor, components)
         conn.commit()
+        get_active_program_cache().invalidate()
         return program_id
-        
     except Exception as e:
         conn.rollback()
         raise e
     finally:
         conn.close()
 
-def get_latest_program():
+def save_programs_bulk(programs):
+    """Save many programs in one transaction; all are saved or none are.
+
+    `programs` are (program_name, description, plan_data) tuples. Every
+    program's components go in with a single executemany. Returns the
+    program ids in the same order.
+    """
     conn = get_db_connection()
     cursor = conn.cursor()
-    
+
     try:
-        # Get latest program
-        cursor.execute("SELECT * FROM training_programs ORDER BY created_at DESC LIMIT 1")
-        program = cursor.fetchone()
-        
-        if not program:
+        program_ids, components = [], []
+        for program_name, description, plan_data in programs:
+            program_id, rows = insert_program(cursor, program_name, description, plan_data)
+            program_ids.append(program_id)
+            components.extend(rows)
+        insert_components(cursor, components)
+        conn.commit()
+        get_active_program_cache().invalidate()
+        return program_ids
+    except Exception as e:
+        conn.rollback()
+        raise e
+    finally:
+        conn.close()
+
+# A program's workouts as one JSON array, each with its components.
+# Component data that isn't valid JSON stays a string. Expects the program
+# as `p` in the enclosing query. json_group_array has no ORDER BY before
+# SQLite 3.44, so the arrays come out in no set order: see sort_workouts.
+PROGRAM_WORKOUTS_JSON = """json((
+    SELECT json_group_array(json_object(
+        'id', w.id, 'program_id', w.program_id, 'day_number', w.day_number,
+        'name', w.name, 'focus', w.focus,
+        'components', json((
+            SELECT json_group_array(json_object(
+                'id', c.id, 'workout_id', c.workout_id, 'component_type', c.component_type,
+                'order_index', c.order_index,
+                'data', CASE WHEN json_valid(c.data) THEN json(c.data) ELSE c.data END
+            ))
+            FROM (
+                SELECT wc.id, wc.workout_id, wc.component_type, wc.order_index, COALESCE(b.data, wc.data) AS data
+                FROM workout_components wc LEFT JOIN component_blobs b ON b.hash = wc.blob_hash
+                WHERE wc.workout_id = w.id
+            ) c
+        ))
+    ))
+    FROM workouts w WHERE w.program_id = p.id
+))"""
+
+def sort_workouts(workouts):
+    """Put decoded PROGRAM_WORKOUTS_JSON in day order, components in order_index order.
+
+    NULLs sort first, as in SQLite's ORDER BY.
+    """
+    workouts.sort(key=lambda w: (w['day_number'] is not None, w['day_number'] or 0, w['id']))
+    for workout in workouts:
+        workout['components'].sort(key=lambda c: (c['order_index'] is not None, c['order_index'] or 0, c['id']))
+    return workouts
+
+# The latest program as one JSON document
+LATEST_PROGRAM_QUERY = f"""
+SELECT json_object(
+    'id', p.id, 'name', p.name, 'description', p.description, 'created_at', p.created_at,
+    'workouts', {PROGRAM_WORKOUTS_JSON}
+)
+FROM (SELECT * FROM training_programs ORDER BY created_at DESC, id DESC LIMIT 1) p
+"""
+
+PROGRAMS_PAGE_LIMIT = 100
+
+def get_latest_program_json():
+    """The latest program as compact UTF-8 JSON, b'null' if there is none"""
+    conn = get_db_connection()
+    try:
+        row = conn.execute(LATEST_PROGRAM_QUERY).fetchone()
+    finally:
+        conn.close()
+    if not row:
+        return b'null'
+    program = json.loads(row[0])
+    sort_workouts(program['workouts'])
+    return json.dumps(program, separators=(",", ":"), ensure_ascii=False).encode('utf-8')
+
+def get_latest_program():
+    """The most recent program with its workouts and parsed components, or None"""
+    return json.loads(get_latest_program_json())
+
+def list_programs(after=None, limit=20, include_workouts=False):
+    """One page of program history, newest first.
+
+    `after` is the (created_at, id) of the last program on the previous
+    page; the page continues strictly below it on the (created_at, id)
+    index, so every page costs the same however deep it is. Each summary
+    carries its workout count; with `include_workouts` also the nested
+    workouts and components. Returns (programs, cursor for the next page
+    or None).
+    """
+    limit = max(1, min(int(limit), PROGRAMS_PAGE_LIMIT))
+    where, params = ("WHERE (created_at, id) < (?, ?)", list(after)) if after else ("", [])
+    workouts = f", {PROGRAM_WORKOUTS_JSON} AS workouts" if include_workouts else ""
+    query = f"""
+        SELECT p.id, p.name, p.description, p.created_at, COUNT(w.id) AS workout_count{workouts}
+        FROM (SELECT * FROM training_programs {where} ORDER BY created_at DESC, id DESC LIMIT ?) p
+        LEFT JOIN workouts w ON w.program_id = p.id
+        GROUP BY p.id
+        ORDER BY p.created_at DESC, p.id DESC
+    """
+    conn = get_db_connection()
+    try:
+        rows = conn.execute(query, params + [limit]).fetchall()
+    finally:
+        conn.close()
+
+    programs = []
+    for row in rows:
+        program = dict(row)
+        if include_workouts:
+            program['workouts'] = sort_workouts(json.loads(program['workouts']))
+        programs.append(program)
+    next_after = (rows[-1]['created_at'], rows[-1]['id']) if len(rows) == limit else None
+    return programs, next_after
+
+def exercise_usage(exercise=None, equipment=None, category=None, since=None):
+    """Programs whose stored circuits use matching exercises, newest first.
+
+    Filters (case-insensitive, combined with AND) apply to the same
+    exercise, e.g. exercise='Barbell Deadlift' or equipment='rack'; `since`
+    keeps programs created at or after that timestamp. Answered from the
+    component_exercises index. Each program lists how many of its
+    circuits and workouts match.
+    """
+    filters, params = [], []
+    for column, value in (('exercise_name', exercise), ('equipment', equipment), ('category', category)):
+        if value is not None:
+            filters.append(f"ce.{column} = ?")
+            params.append(value)
+    if since is not None:
+        filters.append("p.created_at >= ?")
+        params.append(since)
+    if not filters:
+        raise ValueError("Give at least one of exercise, equipment, category or since")
+
+    conn = get_db_connection()
+    try:
+        rows = conn.execute(
+            "SELECT p.id, p.name, p.created_at,"
+            " COUNT(DISTINCT ce.component_id) AS circuits, COUNT(DISTINCT ce.workout_id) AS workouts"
+            " FROM component_exercises ce"
+            " JOIN workouts w ON w.id = ce.workout_id"
+            " JOIN training_programs p ON p.id = w.program_id"
+            f" WHERE {' AND '.join(filters)}"
+            " GROUP BY p.id ORDER BY p.created_at DESC, p.id DESC",
+            params
+        ).fetchall()
+        return [dict(row) for row in rows]
+    finally:
+        conn.close()
+
+class ActiveProgramCache:
+    """The serialized latest program, reused until a program is written.
+
+    Every function here that changes programs calls invalidate() after it
+    commits, so unchanged reads never reach SQLite. Only writes made by
+    this process are seen; run one worker per database file.
+    """
+
+    def __init__(self):
+        self.version = 0
+        self.hits = 0
+        self.misses = 0
+        self._entry = None  # (version, etag, body)
+        self._lock = threading.Lock()
+
+    def invalidate(self):
+        with self._lock:
+            self.version += 1
+
+    def cached(self):
+        """(ETag, JSON body) if still current, else None; never touches SQLite"""
+        with self._lock:
+            if self._entry and self._entry[0] == self.version:
+                self.hits += 1
+                return self._entry[1:]
+        return None
+
+    def get(self):
+        """(ETag, JSON body) of the latest program"""
+        with self._lock:
+            version = self.version
+            if self._entry and self._entry[0] == version:
+                self.hits += 1
+                return self._entry[1:]
+            self.misses += 1
+
+        body = get_latest_program_json()
+        etag = '"' + hashlib.blake2b(body, digest_size=12).hexdigest() + '"'
+        with self._lock:
+            # A write that landed while loading already moved the version on
+            if self.version == version:
+                self._entry = (version, etag, body)
+        return etag, body
+
+    def stats(self):
+        with self._lock:
+            return {'version': self.version, 'hits': self.hits, 'misses': self.misses}
+
+@lru_cache(maxsize=None)
+def get_active_program_cache() -> ActiveProgramCache:
+    return ActiveProgramCache()
+
+def get_program(program_id):
+    conn = get_db_connection()
+    try:
+        program = conn.execute("SELECT * FROM training_programs WHERE id = ?", (program_id,)).fetchone()
+        return dict(program) if program else None
+    finally:
+        conn.close()
+
+def components_to_day(workout, components):
+    """Rebuild a day in the engine's session_to_dict shape from stored components"""
+    day = {'day': workout['day_number'], 'focus': workout['focus'],
+           'warmup': [], 'circuits': [], 'cardio': None, 'cooldown': []}
+    for comp in components:
+        try:
+            data = decode_component(comp)
+        except (TypeError, ValueError):
+            continue
+        kind = comp['component_type']
+        if kind == 'circuit':
+            day['circuits'].append(data)
+        elif kind in ('warmup', 'cardio', 'cooldown'):
+            day[kind] = data
+    return day
+
+def iter_program_days(program_id):
+    """Yield a program's days one workout at a time.
+
+    Each day borrows a pooled connection only while it is read: a streaming
+    response holds the generator open for as long as the client takes to
+    download, and keeping one connection for all of that would tie up the
+    pool.
+    """
+    conn = get_db_connection()
+    try:
+        workouts = conn.execute(
+            "SELECT id, day_number, focus FROM workouts WHERE program_id = ? ORDER BY day_number",
+            (program_id,)
+        ).fetchall()
+    finally:
+        conn.close()
+
+    for workout in workouts:
+        conn = get_db_connection()
+        try:
+            components = conn.execute(
+                f"SELECT {COMPONENT_COLUMNS} FROM workout_components c {COMPONENT_BLOBS_JOIN}"
+                " WHERE c.workout_id = ? ORDER BY c.order_index",
+                (workout['id'],)
+            ).fetchall()
+        finally:
+            conn.close()
+        yield components_to_day(workout, components)
+
+def get_workout_day(workout_id):
+    """One stored workout rebuilt by components_to_day, or None if it doesn't exist"""
+    conn = get_db_connection()
+    try:
+        workout = conn.execute("SELECT id, day_number, focus FROM workouts WHERE id = ?", (workout_id,)).fetchone()
+        if not workout:
             return None
-            
-        program_data = dict(program)
-        program_id = program['id']
-        
-        # Get workouts for this program
-        cursor.execute("SELECT * FROM workouts WHERE program_id = ? ORDER BY day_number", (program_id,))
-        workouts = [dict(w) for w in cursor.fetchall()]
-        
-        # Get components for each workout
-        for workout in workouts:
-            cursor.execute("SELECT * FROM workout_components WHERE workout_id = ? ORDER BY order_index", (workout['id'],))
-            components = cursor.fetchall()
-            
-            workout['components'] = []
-            for comp in components:
-                comp_data = dict(comp)
-                # Parse JSON data
-                try:
-                    comp_data['data'] = json.loads(comp_data['data'])
-                except:
-                    pass
-                workout['components'].append(comp_data)
-                
-        program_data['workouts'] = workouts
-        return program_data
-        
+        components = conn.execute(
+            f"SELECT {COMPONENT_COLUMNS} FROM workout_components c {COMPONENT_BLOBS_JOIN}"
+            " WHERE c.workout_id = ? ORDER BY c.order_index",
+            (workout_id,)
+        ).fetchall()
+        return components_to_day(workout, components)
     finally:
         conn.close()
 
-def delete_workout(workout_id):
+def get_program_workouts(program_id):
+    """[(workout_id, day)] for a program, days rebuilt by components_to_day"""
+    conn = get_db_connection()
+    try:
+        workouts = conn.execute(
+            "SELECT id, day_number, focus FROM workouts WHERE program_id = ? ORDER BY day_number",
+            (program_id,)
+        ).fetchall()
+        components = {}
+        for comp in conn.execute(
+            f"SELECT c.workout_id, {COMPONENT_COLUMNS} FROM workout_components c {COMPONENT_BLOBS_JOIN}"
+            " JOIN workouts w ON w.id = c.workout_id WHERE w.program_id = ? ORDER BY c.workout_id, c.order_index",
+            (program_id,)
+        ):
+            components.setdefault(comp['workout_id'], []).append(comp)
+        return [(w['id'], components_to_day(w, components.get(w['id'], []))) for w in workouts]
+    finally:
+        conn.close()
+
+def write_circuit_components(circuits_by_workout):
+    """Replace circuits for several workouts, touching only rows that differ.
+
+    `circuits_by_workout` maps workout_id to its new list of circuit dicts.
+    Returns the number of rows inserted, updated or deleted. Blobs that
+    repointed rows no longer use are released only after every row is
+    written, since circuits that move between slots reuse them.
+    """
     conn = get_db_connection()
     cursor = conn.cursor()
-    
+    written, replaced = 0, []
+
     try:
-        # Get program_id before deleting
-        cursor.execute("SELECT program_id FROM workouts WHERE id = ?", (workout_id,))
-        result = cursor.fetchone()
-        if not result:
-            return False
-            
-        program_id = result['program_id']
+        for workout_id, circuits in circuits_by_workout.items():
+            cursor.execute(
+                "SELECT id, blob_hash FROM workout_components WHERE workout_id = ? AND component_type = 'circuit' ORDER BY order_index",
+                (workout_id,)
+            )
+            existing = cursor.fetchall()
+            keys = store_blobs(cursor, [(circuit, json.dumps(circuit)) for circuit in circuits])
 
-        # 1. Delete components first
-        cursor.execute("DELETE FROM workout_components WHERE workout_id = ?", (workout_id,))
-        
-        # 2. Delete workout
-        cursor.execute("DELETE FROM workouts WHERE id = ?", (workout_id,))
-        
-        # 3. Check if program has any workouts left
-        cursor.execute("SELECT COUNT(*) FROM workouts WHERE program_id = ?", (program_id,))
-        count = cursor.fetchone()[0]
-        
-        if count == 0:
-            # Delete the program if no workouts remain
-            cursor.execute("DELETE FROM training_programs WHERE id = ?", (program_id,))
-        
+            for i, key in enumerate(keys):
+                if i < len(existing):
+                    # Same hash, same canonical payload
+                    if existing[i]['blob_hash'] == key:
+                        continue
+                    replaced.append(existing[i]['blob_hash'])
+                    cursor.execute(
+                        "UPDATE workout_components SET blob_hash = ?, data = NULL, order_index = ? WHERE id = ?",
+                        (key, i + 1, existing[i]['id'])
+                    )
+                else:
+                    cursor.execute(
+                        "INSERT INTO workout_components (workout_id, component_type, order_index, blob_hash) VALUES (?, ?, ?, ?)",
+                        (workout_id, 'circuit', i + 1, key)
+                    )
+                written += 1
+
+            stale = [row['id'] for row in existing[len(circuits):]]
+            if stale:
+                placeholders = ','.join(['?'] * len(stale))
+                cursor.execute(f"DELETE FROM workout_components WHERE id IN ({placeholders})", stale)
+                written += len(stale)
+
+        release_blobs(cursor, replaced)
         conn.commit()
-        return True
+        get_active_program_cache().invalidate()
+        return written
+    except Exception as e:
+        conn.rollback()
+        raise e
+    finally:
+        conn.close()
+
+def delete_workout(workout_id):
+    # Components cascade, and the delete_empty_program trigger removes a program left without workouts
+    conn = get_db_connection()
+
+    try:
+        deleted = conn.execute("DELETE FROM workouts WHERE id = ?", (workout_id,)).rowcount
+        conn.commit()
+        get_active_program_cache().invalidate()
+        return deleted > 0
     except Exception as e:
         conn.rollback()
         raise e
@@ -161,27 +774,13 @@ def delete_workout(workout_id):
         conn.close()
 
 def delete_program(program_id):
+    # Workouts and their components cascade
     conn = get_db_connection()
-    cursor = conn.cursor()
-    
+
     try:
-        # 1. Get all workouts for this program
-        cursor.execute("SELECT id FROM workouts WHERE program_id = ?", (program_id,))
-        workouts = cursor.fetchall()
-        workout_ids = [w['id'] for w in workouts]
-        
-        if workout_ids:
-            # 2. Delete components for all workouts
-            placeholders = ','.join(['?'] * len(workout_ids))
-            cursor.execute(f"DELETE FROM workout_components WHERE workout_id IN ({placeholders})", workout_ids)
-            
-            # 3. Delete workouts
-            cursor.execute("DELETE FROM workouts WHERE program_id = ?", (program_id,))
-            
-        # 4. Delete program
-        cursor.execute("DELETE FROM training_programs WHERE id = ?", (program_id,))
-        
+        conn.execute("DELETE FROM training_programs WHERE id = ?", (program_id,))
         conn.commit()
+        get_active_program_cache().invalidate()
         return True
     except Exception as e:
         conn.rollback()
@@ -200,18 +799,105 @@ def update_workout_components(workout_id, components):
         # 2. Insert new components
         for comp in components:
             # comp is a dict with: component_type, order_index, data
-            # Ensure data is JSON string
-            data_str = json.dumps(comp['data']) if isinstance(comp['data'], (dict, list)) else comp['data']
-            
+            # JSON payloads, given decoded or as text, are stored as shared
+            # blobs; anything else stays inline
+            key, data_str = None, comp['data']
+            if isinstance(data_str, (dict, list)):
+                key, = store_blobs(cursor, [(data_str, json.dumps(data_str))])
+                data_str = None
+            elif isinstance(data_str, str):
+                try:
+                    value = json.loads(data_str)
+                except ValueError:
+                    pass
+                else:
+                    key, = store_blobs(cursor, [(value, data_str)])
+                    data_str = None
+
             cursor.execute(
-                "INSERT INTO workout_components (workout_id, component_type, order_index, data) VALUES (?, ?, ?, ?)",
-                (workout_id, comp['component_type'], comp.get('order_index', 0), data_str)
+                "INSERT INTO workout_components (workout_id, component_type, order_index, data, blob_hash) VALUES (?, ?, ?, ?, ?)",
+                (workout_id, comp['component_type'], comp.get('order_index', 0), data_str, key)
             )
             
         conn.commit()
+        get_active_program_cache().invalidate()
         return True
     except Exception as e:
         conn.rollback()
         raise e
     finally:
         conn.close()
+
+FITNESS_FIELDS = ('age', 'resting_hr', 'two_mile_seconds')
+
+def save_roster(roster, soldiers):
+    """Add or update soldiers on a roster with their bodyweight and 1RMs.
+
+    `soldiers` are dicts with name, bodyweight_kg and one_rep_max_kg
+    ({lift: kg}), and optionally the cardio inputs age, resting_hr and
+    two_mile_seconds. Soldiers are matched by name within the roster; a
+    lift or cardio field recorded again replaces the earlier value, and
+    fields left out keep theirs.
+    Returns the soldier ids.
+    """
+    conn = get_db_connection()
+    cursor = conn.cursor()
+
+    try:
+        cursor.executemany(
+            "INSERT INTO soldiers (roster, name, bodyweight_kg) VALUES (?, ?, ?)"
+            " ON CONFLICT (roster, name) DO UPDATE SET bodyweight_kg = COALESCE(excluded.bodyweight_kg, bodyweight_kg)",
+            [(roster, s['name'], s.get('bodyweight_kg')) for s in soldiers]
+        )
+        ids = dict(cursor.execute("SELECT name, id FROM soldiers WHERE roster = ?", (roster,)).fetchall())
+        cursor.executemany(
+            "INSERT OR REPLACE INTO soldier_maxes (soldier_id, lift, one_rep_max_kg) VALUES (?, ?, ?)",
+            [(ids[s['name']], lift, kg)
+             for s in soldiers for lift, kg in (s.get('one_rep_max_kg') or {}).items() if kg is not None]
+        )
+        cursor.executemany(
+            "INSERT INTO soldier_fitness (soldier_id, age, resting_hr, two_mile_seconds) VALUES (?, ?, ?, ?)"
+            " ON CONFLICT (soldier_id) DO UPDATE SET"
+            " age = COALESCE(excluded.age, age),"
+            " resting_hr = COALESCE(excluded.resting_hr, resting_hr),"
+            " two_mile_seconds = COALESCE(excluded.two_mile_seconds, two_mile_seconds),"
+            " recorded_at = CURRENT_TIMESTAMP",
+            [(ids[s['name']], s.get('age'), s.get('resting_hr'), s.get('two_mile_seconds'))
+             for s in soldiers if any(s.get(key) is not None for key in FITNESS_FIELDS)]
+        )
+        conn.commit()
+        return [ids[s['name']] for s in soldiers]
+    except Exception as e:
+        conn.rollback()
+        raise e
+    finally:
+        conn.close()
+
+def get_roster(roster):
+    """(soldier rows, 1RM rows) for a roster, as the tuples Roster.from_rows takes"""
+    conn = get_db_connection()
+    try:
+        soldiers = conn.execute(
+            "SELECT id, name, bodyweight_kg FROM soldiers WHERE roster = ? ORDER BY id", (roster,)
+        ).fetchall()
+        maxes = conn.execute(
+            "SELECT m.soldier_id, m.lift, m.one_rep_max_kg FROM soldier_maxes m"
+            " JOIN soldiers s ON s.id = m.soldier_id WHERE s.roster = ?",
+            (roster,)
+        ).fetchall()
+        return [tuple(row) for row in soldiers], [tuple(row) for row in maxes]
+    finally:
+        conn.close()
+
+def get_roster_fitness(roster):
+    """(id, name, age, resting_hr, two_mile_seconds) rows for FitnessRoster.from_rows"""
+    conn = get_db_connection()
+    try:
+        rows = conn.execute(
+            "SELECT s.id, s.name, f.age, f.resting_hr, f.two_mile_seconds FROM soldiers s"
+            " LEFT JOIN soldier_fitness f ON f.soldier_id = s.id WHERE s.roster = ? ORDER BY s.id",
+            (roster,)
+        ).fetchall()
+        return [tuple(row) for row in rows]
+    finally:
+        conn.close()
@@ -1,45 +1,137 @@
+import csv
+import io
+import json
+import math
+import threading
+import time
 import numpy as np
-from dataclasses import dataclass, field, replace
-from typing import List, Dict, Optional, Tuple
+from collections import OrderedDict
+from collections.abc import Mapping
+from dataclasses import asdict, dataclass, field, replace
+from functools import cached_property, lru_cache
+from types import MappingProxyType
+from typing import Iterable, Iterator, List, Dict, Optional, Tuple
 
 # --- DATA STRUCTURES ---
 
-@dataclass
+@dataclass(frozen=True, eq=False)
 class Exercise:
-    """Represents a single exercise with its properties"""
+    """Represents a single exercise with its properties.
+
+    Definitions are shared by every plan that uses them, so they are frozen
+    all the way down (lists become tuples, `activation` a read-only
+    mapping) and compare and hash by identity. Per-use details such as reps
+    live on a Prescription.
+    """
     name: str
-    equipment: List[str]
+    equipment: Tuple[str, ...]
     category: str
     difficulty: int = 1  # 1-5 scale
-    primary_muscles: List[str] = field(default_factory=list)
-    activation: Dict[str, float] = field(default_factory=dict)
+    primary_muscles: Tuple[str, ...] = ()
+    activation: Mapping = field(default_factory=dict)
     instructions: str = ""
-    reps: str = ""  # Added for UI display
 
-@dataclass
+    def __post_init__(self):
+        object.__setattr__(self, 'equipment', tuple(self.equipment))
+        object.__setattr__(self, 'primary_muscles', tuple(self.primary_muscles))
+        object.__setattr__(self, 'activation', MappingProxyType(dict(self.activation)))
+
+    def to_dict(self) -> Dict:
+        return {
+            'name': self.name,
+            'equipment': list(self.equipment),
+            'category': self.category,
+            'difficulty': self.difficulty,
+            'primary_muscles': list(self.primary_muscles),
+            'activation': dict(self.activation),
+            'instructions': self.instructions,
+        }
+
+    @cached_property
+    def json_head(self) -> bytes:
+        """Encoded fields up to (not including) reps, shared by every use"""
+        return dumps_json(self.to_dict())[:-1] + b',"reps":'
+
+class Prescription:
+    """One use of a shared Exercise in a circuit: the exercise, its reps and
+    any per-use overrides. Unknown attributes read through to the override
+    or the exercise, so it can stand in wherever an Exercise is read.
+    """
+    __slots__ = ('exercise', 'reps', 'overrides')
+
+    def __init__(self, exercise: Exercise, reps: str = "", **overrides):
+        object.__setattr__(self, 'exercise', exercise)
+        object.__setattr__(self, 'reps', reps)
+        object.__setattr__(self, 'overrides', overrides or None)
+
+    @property
+    def exercise_id(self) -> str:
+        return self.exercise.name
+
+    def __getattr__(self, name):
+        overrides = object.__getattribute__(self, 'overrides')
+        if overrides and name in overrides:
+            return overrides[name]
+        return getattr(object.__getattribute__(self, 'exercise'), name)
+
+    def __setattr__(self, name, value):
+        if name in Prescription.__slots__:
+            object.__setattr__(self, name, value)
+        else:
+            if self.overrides is None:
+                object.__setattr__(self, 'overrides', {})
+            self.overrides[name] = value
+
+    def __repr__(self):
+        return f"Prescription({self.exercise.name!r}, reps={self.reps!r})"
+
+    def copy(self) -> 'Prescription':
+        return Prescription(self.exercise, self.reps, **(self.overrides or {}))
+
+    def to_dict(self) -> Dict:
+        """Same keys as asdict() on a standalone Exercise"""
+        fields = {
+            'name': self.name,
+            'equipment': list(self.equipment),
+            'category': self.category,
+            'difficulty': self.difficulty,
+            'primary_muscles': list(self.primary_muscles),
+            'activation': dict(self.activation),
+            'instructions': self.instructions,
+            'reps': self.reps,
+        }
+        if self.overrides:
+            fields.update((k, v) for k, v in self.overrides.items() if k not in fields)
+        return fields
+
+@dataclass(slots=True)
 class Circuit:
     """Represents a circuit of exercises"""
-    exercises: List[Exercise]
+    exercises: List[Prescription]
     rounds: int = 3
     work_seconds: int = 45
     rest_seconds: int = 15
     rest_between_rounds: int = 60
 
-@dataclass
+@dataclass(slots=True)
 class CardioWorkout:
     """Represents a cardio session"""
     type: str  # Distance, Intervals, Tempo, HIIT
     duration_minutes: int
     details: Dict[str, any] = field(default_factory=dict)
 
-@dataclass
+@dataclass(slots=True)
 class WorkoutSession:
-    """Represents a complete workout session"""
+    """Represents a complete workout session.
+
+    Warmup and cooldown are shared tuples from generate_warmup and
+    generate_cooldown; assign a new sequence rather than editing them.
+    """
     day: int
     circuits: List[Circuit] = field(default_factory=list)
     cardio: Optional[CardioWorkout] = None
-    warmup: List[str] = field(default_factory=list)
-    cooldown: List[str] = field(default_factory=list)
+    warmup: Tuple[str, ...] = ()
+    cooldown: Tuple[str, ...] = ()
 
 # --- EXERCISE LIBRARY ---
 
@@ -287,10 +379,104 @@ def create_exercise_library():
         'reardelt': reardelt_exercises,
     }
 
+# Equipment mask that satisfies every exercise ('all' or no list given)
+ALL_EQUIPMENT = -1
+
+class ExerciseLibrary(Mapping):
+    """Read-only exercise library indexed by equipment bitmask.
+
+    Every equipment name in the library maps to one bit, and each category
+    keeps the masks of its exercises, so equipment filtering is a subset
+    test on ints. Filter results are memoized per (category, mask), with the
+    mask narrowed to equipment the category uses so the memo stays small.
+    """
+
+    def __init__(self, categories: Dict[str, List[Exercise]]):
+        self._categories = {name: tuple(exercises) for name, exercises in categories.items()}
+        self._by_name = {exercise.name: exercise
+                         for exercises in self._categories.values() for exercise in exercises}
+        equipment = sorted({eq for exercises in self._categories.values()
+                            for exercise in exercises for eq in exercise.equipment})
+        self.equipment_bits = {name: 1 << i for i, name in enumerate(equipment)}
+        self.masks = {
+            name: tuple(self.equipment_mask(exercise.equipment) for exercise in exercises)
+            for name, exercises in self._categories.items()
+        }
+        self._category_equipment = {name: sum_masks(masks) for name, masks in self.masks.items()}
+        self._filtered: Dict[Tuple[str, int], Tuple[Exercise, ...]] = {}
+
+    def __getitem__(self, category: str) -> Tuple[Exercise, ...]:
+        return self._categories[category]
+
+    def __iter__(self):
+        return iter(self._categories)
+
+    def __len__(self) -> int:
+        return len(self._categories)
+
+    def exercise(self, exercise_id: str) -> Optional[Exercise]:
+        """Shared definition for an exercise ID (its name)"""
+        return self._by_name.get(exercise_id)
+
+    def equipment_mask(self, equipment: Optional[List[str]]) -> int:
+        """Bitmask for an equipment list; names no exercise needs (or non-names) are ignored"""
+        mask = 0
+        for name in equipment or ():
+            if isinstance(name, str):
+                mask |= self.equipment_bits.get(name, 0)
+        return mask
+
+    def available_mask(self, available_equipment: Optional[List[str]]) -> int:
+        """Mask for what a squad has on hand, with filter_exercises_by_equipment's defaults"""
+        if not available_equipment or 'all' in available_equipment:
+            return ALL_EQUIPMENT
+        return self.equipment_mask(available_equipment)
+
+    def filter(self, category: str, available: int) -> Tuple[Exercise, ...]:
+        """Exercises in a category doable with the `available` equipment mask"""
+        key = (category, available & self._category_equipment.get(category, 0))
+        filtered = self._filtered.get(key)
+        if filtered is None:
+            exercises = self._categories.get(category, ())
+            filtered = tuple(exercise for exercise, mask in zip(exercises, self.masks.get(category, ()))
+                             if not mask & ~available)
+            # Same fallback as filter_exercises_by_equipment: all if none match
+            filtered = self._filtered.setdefault(key, filtered or exercises)
+        return filtered
+
+def sum_masks(masks) -> int:
+    """Union of equipment bitmasks"""
+    union = 0
+    for mask in masks:
+        union |= mask
+    return union
+
+@lru_cache(maxsize=None)
+def get_exercise_library() -> ExerciseLibrary:
+    """Shared exercise library, built on first use"""
+    return ExerciseLibrary(create_exercise_library())
+
 # --- GENERATORS ---
 
-def create_cardio_workout(workout_type: str, duration_minutes: int, focus: str = 'distance') -> CardioWorkout:
-    """Creates detailed cardio workout based on type and duration"""
+def create_cardio_workout(workout_type: str, duration_minutes: int, focus: str = 'distance',
+                          fitness: Optional['FitnessRoster'] = None) -> CardioWorkout:
+    """Creates detailed cardio workout based on type and duration.
+
+    With a `fitness` roster, details also carry every soldier's pacing
+    (see pace_cardio) under 'pacing'.
+    """
+    workout = generic_cardio_workout(workout_type, duration_minutes, focus)
+    if fitness is not None and workout.type in CARDIO_EFFORT:
+        workout.details['pacing'] = pace_cardio(
+            workout.type, duration_minutes, workout.details, fitness).to_dict()
+    return workout
+
+def interval_work_meters(duration_minutes: int) -> int:
+    """Distance of one interval rep for a session this long"""
+    return 400 if duration_minutes > 30 else 200
+
+def generic_cardio_workout(workout_type: str, duration_minutes: int, focus: str = 'distance') -> CardioWorkout:
+    """Cardio session of a schedule type without per-soldier pacing"""
 
     if workout_type == "Distance":
         # Steady state cardio
@@ -308,7 +494,7 @@ def create_cardio_workout(workout_type: str, duration_minutes: int, focus: str =
 
     elif workout_type == "Intervals":
         # High intensity intervals
-        work_time = 400 if duration_minutes > 30 else 200
+        work_time = interval_work_meters(duration_minutes)
         rest_time = work_time // 2
         rounds = (duration_minutes * 60) // (work_time + rest_time)
 
@@ -373,8 +559,14 @@ def filter_exercises_by_equipment(exercises: List[Exercise], available_equipment
 
     return filtered if filtered else exercises  # Return all if none match
 
-def create_circuits(exercises: List[Exercise], num_soldiers: int = 20,
-                   circuit_size: int = 3) -> List[Circuit]:
+CIRCUIT_SIZE = 3
+# Stations with at most this many soldiers each get the short rest
+SHORT_REST_SOLDIERS_PER_STATION = 2
+# Squads above this size rest longer between rounds
+LARGE_SQUAD_SOLDIERS = 20
+
+def create_circuits(exercises: List[Prescription], num_soldiers: int = 20,
+                   circuit_size: int = CIRCUIT_SIZE) -> List[Circuit]:
     """Create efficient circuits from exercises"""
 
     circuits = []
@@ -386,18 +578,32 @@ def create_circuits(exercises: List[Exercise], num_soldiers: int = 20,
         # Calculate work/rest based on number of soldiers
         soldiers_per_station = max(2, num_soldiers // len(circuit_exercises))
         work_seconds = 45
-        rest_seconds = 15 if soldiers_per_station <= 2 else 30
+        rest_seconds = 15 if soldiers_per_station <= SHORT_REST_SOLDIERS_PER_STATION else 30
 
         circuits.append(Circuit(
             exercises=circuit_exercises,
             rounds=3,
             work_seconds=work_seconds,
             rest_seconds=rest_seconds,
-            rest_between_rounds=90 if num_soldiers > 20 else 60
+            rest_between_rounds=90 if num_soldiers > LARGE_SQUAD_SOLDIERS else 60
         ))
 
     return circuits
 
+def circuit_soldier_class(num_soldiers):
+    """Smallest soldier count that create_circuits treats the same as this one.
+
+    Squad size only moves rest times: stations of up to CIRCUIT_SIZE
+    exercises get short rests up to SHORT_REST_SOLDIERS_PER_STATION soldiers
+    each, and rounds rest longer above LARGE_SQUAD_SOLDIERS.
+    """
+    try:
+        if num_soldiers > LARGE_SQUAD_SOLDIERS:
+            return LARGE_SQUAD_SOLDIERS + 1
+        return min(num_soldiers, (SHORT_REST_SOLDIERS_PER_STATION + 1) * CIRCUIT_SIZE)
+    except TypeError:
+        return num_soldiers
+
 def get_rep_range(strength_focus: str, exercise_difficulty: int) -> Tuple[int, int]:
     """Get recommended rep range based on training focus"""
 
@@ -417,6 +623,12 @@ def get_rep_range(strength_focus: str, exercise_difficulty: int) -> Tuple[int, i
 
     return base_range
 
+@lru_cache(maxsize=None)
+def rep_label(strength_focus: str, exercise_difficulty: int) -> str:
+    """get_rep_range as "low-high", one shared string per range"""
+    rep_range = get_rep_range(strength_focus, exercise_difficulty)
+    return f"{rep_range[0]}-{rep_range[1]}"
+
 def get_intensity_recommendation(strength_focus: str) -> str:
     """Get intensity recommendation based on focus"""
 
@@ -429,8 +641,9 @@ def get_intensity_recommendation(strength_focus: str) -> str:
 
     return intensities.get(strength_focus, '65-80% 1RM or RPE 7-8')
 
-def generate_warmup(workout_type: str) -> List[str]:
-    """Generate appropriate warmup for workout type"""
+@lru_cache(maxsize=None)
+def generate_warmup(workout_type: str) -> Tuple[str, ...]:
+    """Generate appropriate warmup for workout type (one shared tuple per type)"""
 
     general_warmup = [
         "5 minutes light cardio (jog, jump rope, or bike)",
@@ -455,12 +668,13 @@ def generate_warmup(workout_type: str) -> List[str]:
             "Leg swings - 10 each direction"
         ])
 
-    return general_warmup
+    return tuple(general_warmup)
 
-def generate_cooldown() -> List[str]:
-    """Generate cooldown routine"""
+@lru_cache(maxsize=None)
+def generate_cooldown() -> Tuple[str, ...]:
+    """Generate cooldown routine (one shared tuple)"""
 
-    return [
+    return (
         "5 minutes easy cardio (walk or light jog)",
         "Chest stretch - 30 seconds each side",
         "Shoulder stretch - 30 seconds each side",
@@ -469,7 +683,7 @@ def generate_cooldown() -> List[str]:
         "Quad stretch - 30 seconds each side",
         "Child's pose - 1 minute",
         "Deep breathing - 2 minutes"
-    ]
+    )
 
 # --- PLANNING LOGIC ---
 
@@ -495,11 +709,251 @@ schedules = {
     },
 }
 
+# Fixed muscle order shared by every emphasis vector
+MUSCLES = list(baseline)
+MUSCLE_INDEX = {m: i for i, m in enumerate(MUSCLES)}
+
+def muscle_indices(muscles: List[str]) -> np.ndarray:
+    """Positions of the given muscles in MUSCLES"""
+    return np.array([MUSCLE_INDEX[m] for m in muscles], dtype=np.intp)
+
+class MuscleVector:
+    """Muscle emphasis state backed by one float64 array over MUSCLES.
+
+    Normalizing is a single divide instead of a fresh dict per selection
+    step. The total is summed in MUSCLES order, matching the dict-based
+    engine exactly; a running total drifts by an ulp once contributions
+    like 0.3 appear and that is enough to flip near-tied picks.
+    """
+    __slots__ = ('values',)
+
+    def __init__(self, values: Optional[np.ndarray] = None):
+        if values is None:
+            self.values = np.zeros(len(MUSCLES))
+        else:
+            self.values = np.array(values, dtype=np.float64)
+
+    @classmethod
+    def from_dict(cls, emphasis: Dict[str, float]) -> 'MuscleVector':
+        """Build a vector from a muscle -> value mapping"""
+        vec = cls()
+        for muscle, value in emphasis.items():
+            vec.values[MUSCLE_INDEX[muscle]] = value
+        return vec
+
+    def __getitem__(self, muscle: str) -> float:
+        return float(self.values[MUSCLE_INDEX[muscle]])
+
+    def add(self, delta, index=None):
+        """Add a contribution, either full length or at the given positions"""
+        if index is None:
+            self.values += delta
+        else:
+            self.values[index] += delta
+
+    @property
+    def total(self) -> float:
+        return sum(self.values.tolist())
+
+    def normalized(self) -> np.ndarray:
+        """Values scaled to sum to one (unchanged if the total is zero)"""
+        total = self.total
+        if not total:
+            return self.values.copy()
+        return self.values / total
+
+    def to_dict(self) -> Dict[str, float]:
+        return {m: float(v) for m, v in zip(MUSCLES, self.values)}
+
+class MuscleMatrix:
+    """Emphasis state for many squads at once, one MUSCLES-ordered row each"""
+    __slots__ = ('values',)
+
+    def __init__(self, squads: int):
+        self.values = np.zeros((squads, len(MUSCLES)))
+
+    def add(self, delta, index=None):
+        """Add per-squad contributions, either full rows or at the given columns"""
+        if index is None:
+            self.values += delta
+        else:
+            self.values[:, index] += delta
+
+    @property
+    def total(self) -> np.ndarray:
+        # Column by column so every row sums in the same order as MuscleVector
+        total = np.zeros(len(self.values))
+        for column in self.values.T:
+            total += column
+        return total
+
+    def normalized(self) -> np.ndarray:
+        """Rows scaled to sum to one (zero rows are left unchanged)"""
+        total = self.total
+        total[total == 0] = 1.0
+        return self.values / total[:, None]
+
+# Emphasis added by each primary (heavy) movement
+PRIMARY_LIFTS = {
+    name: MuscleVector.from_dict(contribution).values
+    for name, contribution in {
+        'bench': {'frontdelt': 0.75, 'tricep': 0.75, 'chest': 1.5},
+        'row': {'trap_rhomboid': 1.5, 'lat': 0.75, 'bicep': 0.75},
+        'squat': {'quad': 1.5, 'glute': 1.5, 'lowback': 0.75},
+        'hinge': {'hamstring': 1.5, 'lowback': 1.5, 'glute': 0.75},
+    }.items()
+}
+
+# Relative score gap below which candidate lifts count as tied
+LIFT_TIE_TOLERANCE = 1e-9
+
+@dataclass(frozen=True)
+class LiftTable:
+    """Candidate lifts scored over a fixed subset of muscles.
+
+    `rows` holds each lift's raw contribution and `scoring` the rows it is
+    ranked by, so one matrix-vector product scores every candidate.
+    """
+    names: Tuple[str, ...]
+    muscles: np.ndarray
+    rows: np.ndarray
+    scoring: np.ndarray
+    cosine: bool = False
+    scale: float = 1.0  # largest scoring-row norm, bounds rounding error
+
+    def pick(self, need: np.ndarray) -> int:
+        """Index of the best-scoring lift (first one wins ties)"""
+        scores = (self.scoring @ need).tolist()
+        top = max(scores)
+
+        # The matrix product rounds differently from a per-lift dot, so
+        # near-ties are re-ranked with the per-lift score to keep picks exact.
+        margin = LIFT_TIE_TOLERANCE * self.scale * math.sqrt(need @ need)
+        close = [i for i, score in enumerate(scores) if score >= top - margin]
+        if len(close) == 1:
+            return close[0]
+        return max(close, key=lambda i: self.score(need, i))
+
+    def pick_many(self, needs: np.ndarray) -> np.ndarray:
+        """Row-wise pick for a (squads x muscles) need matrix"""
+        scores = needs @ self.scoring.T
+        best = scores.argmax(axis=1)
+        top = scores[np.arange(len(scores)), best]
+        margin = LIFT_TIE_TOLERANCE * self.scale * np.sqrt(np.einsum('ij,ij->i', needs, needs))
+        tied = (scores >= (top - margin)[:, None]).sum(axis=1) > 1
+        for row in np.flatnonzero(tied):
+            # np.dot rounds strided rows differently, so re-rank a contiguous copy
+            best[row] = self.pick(np.ascontiguousarray(needs[row]))
+        return best
+
+    def score(self, need: np.ndarray, index: int) -> float:
+        """Score of a single lift, computed the unbatched way"""
+        if self.cosine:
+            return cosine_similarity(need, self.rows[index])
+        return np.dot(need, self.rows[index])
+
+def build_lift_table(muscles: List[str], lifts: Dict[str, List[float]],
+                     cosine: bool = False) -> LiftTable:
+    """Build a read-only lift table, pre-normalizing rows for cosine scoring"""
+    rows = np.array(list(lifts.values()), dtype=np.float64)
+    scoring = rows / np.linalg.norm(rows, axis=1, keepdims=True) if cosine else rows.copy()
+    indices = muscle_indices(muscles)
+    for arr in (rows, scoring, indices):
+        arr.setflags(write=False)
+    scale = float(np.linalg.norm(scoring, axis=1).max())
+    return LiftTable(tuple(lifts), indices, rows, scoring, cosine, scale)
+
+# Lift tables for the day builders. Upper and lower days rank lifts by
+# cosine similarity over their own muscles (as in the original notebook);
+# full days rank by raw dot product over both halves.
+UPPER_LIFTS = build_lift_table(
+    ["chest", "tricep", "frontdelt", "lat", "bicep", "trap_rhomboid"],
+    {
+        'hp': [1, 0.5, 0.5, 0, 0, 0],
+        'vp': [0, 0.5, 1, 0, 0, 0],
+        'hpl': [0, 0, 0, 0.5, 0.5, 1],
+        'vpl': [0, 0, 0, 1, 1, 0],
+        'tricep': [0, 1, 0, 0, 0, 0],
+        'bicep': [0, 0, 0, 0, 1, 0],
+        'middelt': [0, 0.3, 0.5, 0, 0, 0],
+        'reardelt': [0, 0, 0, 0.3, 0, 0.6],
+    },
+    cosine=True,
+)
+
+LOWER_LIFTS = build_lift_table(
+    ["quad", "glute", "lowback", "hamstring", "calf"],
+    {
+        'squat': [1, 1, 0.5, 0, 0],
+        'hinge': [0, 0.5, 1, 1, 0],
+        'quad': [1, 0, 0, 0, 0],
+        'hamstring': [0, 0, 0, 1, 0],
+        'calf': [0, 0, 0, 0, 1],
+    },
+    cosine=True,
+)
+
+FULL_LIFTS = build_lift_table(
+    ["chest", "tricep", "frontdelt", "lat", "bicep", "trap_rhomboid",
+     "quad", "glute", "lowback", "hamstring", "calf"],
+    {
+        'hp': [1, 0.5, 0.5, 0, 0, 0, 0, 0, 0, 0, 0],
+        'vp': [0, 0.5, 1, 0, 0, 0, 0, 0, 0, 0, 0],
+        'hpl': [0, 0, 0, 0.5, 0.5, 1, 0, 0, 0, 0, 0],
+        'vpl': [0, 0, 0, 1, 1, 0, 0, 0, 0, 0, 0],
+        'tricep': [0, 1, 0, 0, 0, 0, 0, 0, 0, 0, 0],
+        'bicep': [0, 0, 0, 0, 1, 0, 0, 0, 0, 0, 0],
+        'squat': [0, 0, 0, 0, 0, 0, 1, 1, 0.5, 0, 0],
+        'hinge': [0, 0, 0, 0, 0, 0, 0, 0.5, 1, 1, 0],
+        'quad': [0, 0, 0, 0, 0, 0, 1, 0, 0, 0, 0],
+        'hamstring': [0, 0, 0, 0, 0, 0, 0, 0, 0, 1, 0],
+        'calf': [0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 1],
+    },
+)
+
+# Per strength block: lift table, primary movement pairs and minutes they use
+BLOCK_LIFTS = {
+    'U': (UPPER_LIFTS, [('bench', 'row')], 15),
+    'L': (LOWER_LIFTS, [('squat', 'hinge')], 15),
+    'F': (FULL_LIFTS, [('squat', 'hinge'), ('bench', 'row')], 25),
+}
+
+# Exercises per circuit for each block type
+BLOCK_CIRCUIT_SIZE = {'U': CIRCUIT_SIZE, 'L': CIRCUIT_SIZE, 'F': CIRCUIT_SIZE, 'A': 2}
+
+def take_primary_lifts(block: str, primary_movements: Optional[Dict], current) -> List[str]:
+    """Add the primary lifts a strength block takes to `current` and return them.
+
+    From each of the block's pairs the first lift not yet done this week is
+    taken. `current` is a MuscleVector or a MuscleMatrix (every squad takes
+    the same lifts).
+    """
+    taken = []
+    if primary_movements is None or block not in BLOCK_LIFTS:
+        return taken
+    for first, second in BLOCK_LIFTS[block][1]:
+        for lift in (first, second):
+            if lift not in primary_movements:
+                primary_movements[lift] = 1
+                taken.append(lift)
+                current.add(PRIMARY_LIFTS[lift])
+                break
+    return taken
+
+# Exercise category that best trains each muscle (used for accessory work)
+MUSCLE_TO_CATEGORY = {
+    'chest': 'hp', 'frontdelt': 'vp', 'tricep': 'tricep',
+    'lat': 'vpl', 'bicep': 'bicep', 'trap_rhomboid': 'hpl',
+    'quad': 'quad', 'hamstring': 'hamstring', 'glute': 'squat',
+    'calf': 'calf', 'core': 'core', 'middelt': 'middelt',
+    'reardelt': 'reardelt', 'lowback': 'hinge'
+}
+
 def create_muscle_emphasis(muscles: List[str]) -> Dict[str, float]:
     """Create muscle emphasis based on target muscles"""
     emphasis = baseline.copy()
     for muscle in muscles:
-        if muscle in emphasis:
+        if isinstance(muscle, str) and muscle in emphasis:
             emphasis[muscle] *= 1.5
     return emphasis
 
@@ -517,285 +971,144 @@ def cosine_similarity(a: np.ndarray, b: np.ndarray) -> float:
     return np.dot(a, b) / (np.linalg.norm(a) * np.linalg.norm(b))
 
 def select_exercises(categories: List[str], available_equipment: List[str],
-                    exercise_library: Dict, num_exercises: int = None) -> List[Exercise]:
+                    exercise_library: Dict, num_exercises: int = None) -> List[Prescription]:
     """Select specific exercises from categories based on equipment"""
 
     selected = []
+    if isinstance(exercise_library, ExerciseLibrary):
+        available_mask = exercise_library.available_mask(available_equipment)
 
     for category in categories:
-        category_exercises = exercise_library.get(category, [])
-        available = filter_exercises_by_equipment(category_exercises, available_equipment)
+        if isinstance(exercise_library, ExerciseLibrary):
+            available = exercise_library.filter(category, available_mask)
+        else:
+            category_exercises = exercise_library.get(category, [])
+            available = filter_exercises_by_equipment(category_exercises, available_equipment)
 
         if available:
             # Select exercise (can add logic for variety)
-            # IMPORTANT: Return a COPY so we can modify it (e.g. add reps)
-            selected.append(replace(available[0]))
+            # Reps are set later on the Prescription, never on the shared Exercise
+            selected.append(Prescription(available[0]))
 
     if num_exercises and len(selected) > num_exercises:
         selected = selected[:num_exercises]
 
     return selected
 
-def create_upper_day(current: Dict, goal: Dict, minutes: int,
-                    primary_movements: Optional[Dict], exercise_library: Dict,
-                    available_equipment: List[str]) -> Dict:
-    """Create upper body workout day with specific exercises"""
-
-    day = {'primary': [], 'circuits': []}
+def create_strength_day(block: str, current: MuscleVector, goal: np.ndarray, minutes: int,
+                        primary_movements: Optional[Dict], exercise_library: Dict,
+                        available_equipment: List[str]) -> Dict:
+    """Create a strength day for an upper, lower or full block (see BLOCK_LIFTS)"""
 
-    # Handle primary movements
+    lifts, _, primary_minutes = BLOCK_LIFTS[block]
+    day = {'primary': take_primary_lifts(block, primary_movements, current), 'circuits': []}
     if primary_movements is not None:
-        if 'bench' not in primary_movements:
-            primary_movements['bench'] = 1
-            day['primary'].append('bench')
-            current['frontdelt'] += 0.75
-            current['tricep'] += 0.75
-            current['chest'] += 1.5
-        elif 'row' not in primary_movements:
-            primary_movements['row'] = 1
-            day['primary'].append('row')
-            current['trap_rhomboid'] += 1.5
-            current['lat'] += 0.75
-            current['bicep'] += 0.75
-        minutes -= 15
+        minutes -= primary_minutes
 
     # Exercise selection based on needs
     exercises_needed = []
+    want = goal[lifts.muscles]
 
-    upper_lifts = {
-        'hp': np.array([1, 0.5, 0.5, 0, 0, 0, 0, 0, 0, 0, 0]),
-        'vp': np.array([0, 0.5, 1, 0, 0, 0, 0, 0, 0, 0, 0]),
-        'hpl': np.array([0, 0, 0, 0.5, 0.5, 1, 0, 0, 0, 0, 0]),
-        'vpl': np.array([0, 0, 0, 1, 1, 0, 0, 0, 0, 0, 0]),
-        'tricep': np.array([0, 1, 0, 0, 0, 0, 0, 0, 0, 0, 0]),
-        'bicep': np.array([0, 0, 0, 0, 1, 0, 0, 0, 0, 0, 0]),
-    }
-
-    muscles = ["chest", "tricep", "frontdelt", "lat", "bicep", "trap_rhomboid",
-               "quad", "glute", "lowback", "hamstring", "calf"]
-    
-    # Filter current and goal to match muscles list length if needed, 
-    # but here we use all_muscles in create_full_day, let's ensure consistency.
-    # In create_upper_day in notebook, it used a smaller list of muscles.
-    # To avoid shape mismatch, let's use the full muscle list everywhere or be careful.
-    # The notebook had different muscle lists for different functions.
-    # Let's standardize on the full list for simplicity or stick to notebook logic.
-    # Notebook logic for upper:
-    # muscles = ["chest", "tricep", "frontdelt", "lat", "bicep", "trap_rhomboid"]
-    # upper_lifts vectors were length 6.
-    # BUT in create_full_day, vectors are length 11.
-    # Let's stick to the notebook's logic exactly to avoid breaking math.
-    
-    # Re-reading notebook for create_upper_day:
-    # upper_lifts vectors are length 6.
-    # muscles list is length 6.
-    
-    upper_lifts_local = {
-        'hp': np.array([1, 0.5, 0.5, 0, 0, 0]),
-        'vp': np.array([0, 0.5, 1, 0, 0, 0]),
-        'hpl': np.array([0, 0, 0, 0.5, 0.5, 1]),
-        'vpl': np.array([0, 0, 0, 1, 1, 0]),
-        'tricep': np.array([0, 1, 0, 0, 0, 0]),
-        'bicep': np.array([0, 0, 0, 0, 1, 0]),
-        'middelt': np.array([0, 0.3, 0.5, 0, 0, 0]),
-        'reardelt': np.array([0, 0, 0, 0.3, 0, 0.6]),
-    }
-    muscles_local = ["chest", "tricep", "frontdelt", "lat", "bicep", "trap_rhomboid"]
-    
-    want = np.array([goal[m] for m in muscles_local])
-
-    # Select exercises based on needs
     for _ in range(minutes // 7):
-        normed_cur = normalize(current)
-        cur = np.array([normed_cur[m] for m in muscles_local])
-        need = want - cur
-
-        scores = {name: cosine_similarity(need, vec) for name, vec in upper_lifts_local.items()}
-        best_lift = max(scores, key=scores.get)
+        need = want - current.normalized()[lifts.muscles]
+        best = lifts.pick(need)
 
-        exercises_needed.append(best_lift)
-        for i, m in enumerate(muscles_local):
-            current[m] += upper_lifts_local[best_lift][i]
+        exercises_needed.append(lifts.names[best])
+        current.add(lifts.rows[best], lifts.muscles)
 
     # Convert categories to actual exercises
     actual_exercises = select_exercises(exercises_needed, available_equipment, exercise_library)
     day['exercises'] = actual_exercises
+    day['lifts'] = exercises_needed
 
     return day
 
-def create_lower_day(current: Dict, goal: Dict, minutes: int,
+def create_upper_day(current: MuscleVector, goal: np.ndarray, minutes: int,
                     primary_movements: Optional[Dict], exercise_library: Dict,
                     available_equipment: List[str]) -> Dict:
-    """Create lower body workout day with specific exercises"""
-
-    day = {'primary': [], 'circuits': []}
-
-    if primary_movements is not None:
-        if 'squat' not in primary_movements:
-            primary_movements['squat'] = 1
-            day['primary'].append('squat')
-            current['quad'] += 1.5
-            current['glute'] += 1.5
-            current['lowback'] += 0.75
-        elif 'hinge' not in primary_movements:
-            primary_movements['hinge'] = 1
-            day['primary'].append('hinge')
-            current['hamstring'] += 1.5
-            current['lowback'] += 1.5
-            current['glute'] += 0.75
-        minutes -= 15
-
-    exercises_needed = []
-
-    lower_lifts = {
-        'squat': np.array([1, 1, 0.5, 0, 0]),
-        'hinge': np.array([0, 0.5, 1, 1, 0]),
-        'quad': np.array([1, 0, 0, 0, 0]),
-        'hamstring': np.array([0, 0, 0, 1, 0]),
-        'calf': np.array([0, 0, 0, 0, 1]),
-    }
-
-    muscles = ["quad", "glute", "lowback", "hamstring", "calf"]
-    want = np.array([goal[m] for m in muscles])
-
-    for _ in range(minutes // 7):
-        normed_cur = normalize(current)
-        cur = np.array([normed_cur[m] for m in muscles])
-        need = want - cur
-
-        scores = {name: cosine_similarity(need, vec) for name, vec in lower_lifts.items()}
-        best_lift = max(scores, key=scores.get)
-
-        exercises_needed.append(best_lift)
-        for i, m in enumerate(muscles):
-            current[m] += lower_lifts[best_lift][i]
-
-    actual_exercises = select_exercises(exercises_needed, available_equipment, exercise_library)
-    day['exercises'] = actual_exercises
+    """Create upper body workout day with specific exercises"""
+    return create_strength_day('U', current, goal, minutes, primary_movements,
+                               exercise_library, available_equipment)
 
-    return day
+def create_lower_day(current: MuscleVector, goal: np.ndarray, minutes: int,
+                    primary_movements: Optional[Dict], exercise_library: Dict,
+                    available_equipment: List[str]) -> Dict:
+    """Create lower body workout day with specific exercises"""
+    return create_strength_day('L', current, goal, minutes, primary_movements,
+                               exercise_library, available_equipment)
 
-def create_full_day(current: Dict, goal: Dict, minutes: int,
+def create_full_day(current: MuscleVector, goal: np.ndarray, minutes: int,
                    primary_movements: Optional[Dict], exercise_library: Dict,
                    available_equipment: List[str]) -> Dict:
     """Create full body workout day with specific exercises"""
+    return create_strength_day('F', current, goal, minutes, primary_movements,
+                               exercise_library, available_equipment)
 
-    day = {'primary': [], 'circuits': []}
-
-    if primary_movements is not None:
-        # Lower body primary
-        if 'squat' not in primary_movements:
-            primary_movements['squat'] = 1
-            day['primary'].append('squat')
-            current['quad'] += 1.5
-            current['glute'] += 1.5
-            current['lowback'] += 0.75
-        elif 'hinge' not in primary_movements:
-            primary_movements['hinge'] = 1
-            day['primary'].append('hinge')
-            current['hamstring'] += 1.5
-            current['lowback'] += 1.5
-            current['glute'] += 0.75
-
-        # Upper body primary
-        if 'bench' not in primary_movements:
-            primary_movements['bench'] = 1
-            day['primary'].append('bench')
-            current['frontdelt'] += 0.75
-            current['tricep'] += 0.75
-            current['chest'] += 1.5
-        elif 'row' not in primary_movements:
-            primary_movements['row'] = 1
-            day['primary'].append('row')
-            current['trap_rhomboid'] += 1.5
-            current['lat'] += 0.75
-            current['bicep'] += 0.75
-
-        minutes -= 25
-
-    exercises_needed = []
-    all_muscles = [
-        "chest", "tricep", "frontdelt", "lat", "bicep", "trap_rhomboid",
-        "quad", "glute", "lowback", "hamstring", "calf"
-    ]
-
-    upper_lifts = {
-        'hp': np.array([1, 0.5, 0.5, 0, 0, 0, 0, 0, 0, 0, 0]),
-        'vp': np.array([0, 0.5, 1, 0, 0, 0, 0, 0, 0, 0, 0]),
-        'hpl': np.array([0, 0, 0, 0.5, 0.5, 1, 0, 0, 0, 0, 0]),
-        'vpl': np.array([0, 0, 0, 1, 1, 0, 0, 0, 0, 0, 0]),
-        'tricep': np.array([0, 1, 0, 0, 0, 0, 0, 0, 0, 0, 0]),
-        'bicep': np.array([0, 0, 0, 0, 1, 0, 0, 0, 0, 0, 0]),
-    }
-
-    lower_lifts = {
-        'squat': np.array([0, 0, 0, 0, 0, 0, 1, 1, 0.5, 0, 0]),
-        'hinge': np.array([0, 0, 0, 0, 0, 0, 0, 0.5, 1, 1, 0]),
-        'quad': np.array([0, 0, 0, 0, 0, 0, 1, 0, 0, 0, 0]),
-        'hamstring': np.array([0, 0, 0, 0, 0, 0, 0, 0, 0, 1, 0]),
-        'calf': np.array([0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 1]),
-    }
-
-    all_lifts = {**upper_lifts, **lower_lifts}
-
-    for _ in range(minutes // 7):
-        normed_cur = normalize(current)
-        cur = np.array([normed_cur[m] for m in all_muscles])
-        want = np.array([goal[m] for m in all_muscles])
-        need = want - cur
-
-        scores = {name: np.dot(need, vec) for name, vec in all_lifts.items()}
-        best_lift = max(scores, key=scores.get)
-
-        exercises_needed.append(best_lift)
-        for i, m in enumerate(all_muscles):
-            current[m] += all_lifts[best_lift][i]
-
-    actual_exercises = select_exercises(exercises_needed, available_equipment, exercise_library)
-    day['exercises'] = actual_exercises
-
-    return day
-
-def create_accessory_day(current: Dict, goal: Dict, minutes: int,
+def create_accessory_day(current: MuscleVector, goal: np.ndarray, minutes: int,
                         primary_movements: Optional[Dict], exercise_library: Dict,
                         available_equipment: List[str]) -> Dict:
     """Create accessory workout day targeting lagging muscles"""
 
     day = {'circuits': []}
     exercises_needed = []
+    lagging = []
 
-    for _ in range(minutes // 7):
-        normed_cur = normalize(current)
+    targeted = goal > 0
 
+    for _ in range(minutes // 7):
         # Find most lagging muscle group
-        lag = (float('inf'), None)
-        for k, v in normed_cur.items():
-            if k in goal and goal[k] > 0:
-                ratio = v / goal[k]
-                if ratio < lag[0]:
-                    lag = (ratio, k)
+        ratios = np.full(len(MUSCLES), np.inf)
+        np.divide(current.normalized(), goal, out=ratios, where=targeted)
+        lag_index = int(np.argmin(ratios))
+        lag = (ratios[lag_index], MUSCLES[lag_index] if targeted[lag_index] else None)
 
         if lag[1]:
-            # Map muscle to exercise category
-            muscle_to_category = {
-                'chest': 'hp', 'frontdelt': 'vp', 'tricep': 'tricep',
-                'lat': 'vpl', 'bicep': 'bicep', 'trap_rhomboid': 'hpl',
-                'quad': 'quad', 'hamstring': 'hamstring', 'glute': 'squat',
-                'calf': 'calf', 'core': 'core', 'middelt': 'middelt',
-                'reardelt': 'reardelt', 'lowback': 'hinge'
-            }
-
-            category = muscle_to_category.get(lag[1], 'core')
+            category = MUSCLE_TO_CATEGORY.get(lag[1], 'core')
             exercises_needed.append(category)
-            current[lag[1]] += 1
+            lagging.append(lag[1])
+            current.add(1.0, lag_index)
 
     actual_exercises = select_exercises(exercises_needed, available_equipment, exercise_library)
     day['exercises'] = actual_exercises
+    day['lifts'] = lagging
 
     return day
 
-def weekly_plan(plan_goals: Dict, exercise_library: Dict) -> List[WorkoutSession]:
+BLOCK_BUILDERS = {
+    'U': create_upper_day,
+    'L': create_lower_day,
+    'F': create_full_day,
+    'A': create_accessory_day,
+}
+
+def check_plan_goals(plan_goals: Dict):
+    """Raise ValueError naming the first field weekly_plan can't accept"""
+    days = plan_goals.get('days_per_week')
+    if type(days) is not int or days not in schedules:
+        raise ValueError(f"days_per_week must be one of {', '.join(map(str, schedules))}")
+    if plan_goals.get('high_level_focus') not in schedules[days]:
+        raise ValueError(f"high_level_focus must be one of {', '.join(schedules[days])}")
+    soldiers = plan_goals.get('num_soldiers', 20)
+    if type(soldiers) is not int or soldiers < 1:
+        raise ValueError("num_soldiers must be a positive integer")
+    for field in ('equipment', 'muscle_target'):
+        if not isinstance(plan_goals.get(field, []), list):
+            raise ValueError(f"{field} must be a list")
+
+def weekly_plan(plan_goals: Dict, exercise_library: Dict,
+                deadline_ms: Optional[float] = None) -> List[WorkoutSession]:
     """Generate complete weekly workout plan with all details"""
+    return plan_week(plan_goals, exercise_library, deadline_ms)[0]
+
+def plan_week(plan_goals: Dict, exercise_library: Dict,
+              deadline_ms: Optional[float] = None) -> Tuple[List[WorkoutSession], Optional[Dict]]:
+    """weekly_plan and the optimizer's summary.
+
+    With `deadline_ms`, the greedy lift picks are then improved by
+    improve_lifts until that many milliseconds after the call started. The
+    summary is None without a deadline.
+    """
+    deadline = time.perf_counter() + deadline_ms / 1000 if deadline_ms is not None else None
 
     # Extract parameters
     days_per_week = plan_goals['days_per_week']
@@ -811,16 +1124,12 @@ def weekly_plan(plan_goals: Dict, exercise_library: Dict) -> List[WorkoutSession
     detailed_week = []
 
     # Initialize tracking
-    muscle_emphasis_goal = normalize(create_muscle_emphasis(muscle_target))
-    muscle_emphasis_current = {
-        'lat': 0, 'trap_rhomboid': 0, 'frontdelt': 0, 'chest': 0,
-        'middelt': 0, 'reardelt': 0, 'bicep': 0, 'tricep': 0,
-        'core': 0, 'quad': 0, 'calf': 0, 'hamstring': 0,
-        'lowback': 0, 'glute': 0,
-    }
+    muscle_emphasis_goal = MuscleVector.from_dict(create_muscle_emphasis(muscle_target)).normalized()
+    muscle_emphasis_current = MuscleVector()
 
     primary_movements = {} if (strength_focus in ['power', 'strength']) else None
     run_ct = 0
+    blocks = [] if deadline is not None else None
 
     # Generate each day
     for day_num, day in enumerate(week):
@@ -839,125 +1148,1194 @@ def weekly_plan(plan_goals: Dict, exercise_library: Dict) -> List[WorkoutSession
                     cardio_type, exercise[1], cardio_focus
                 )
 
-            elif exercise[0] == 'U':
-                # Upper body strength
-                day_plan = create_upper_day(
+            else:
+                # Strength block: upper, lower, full or accessory
+                day_plan = BLOCK_BUILDERS[exercise[0]](
                     muscle_emphasis_current, muscle_emphasis_goal,
                     exercise[1], primary_movements, exercise_library,
                     available_equipment
                 )
 
                 if 'exercises' in day_plan:
-                    circuits = create_circuits(day_plan['exercises'], num_soldiers)
+                    circuits = create_circuits(day_plan['exercises'], num_soldiers, BLOCK_CIRCUIT_SIZE[exercise[0]])
                     workout_session.circuits.extend(circuits)
+                    if blocks is not None:
+                        blocks.append((workout_session, exercise[0], day_plan['lifts'], circuits))
 
-                workout_session.warmup = generate_warmup('U')
+                workout_session.warmup = generate_warmup(exercise[0])
 
-            elif exercise[0] == 'L':
-                # Lower body strength
-                day_plan = create_lower_day(
-                    muscle_emphasis_current, muscle_emphasis_goal,
-                    exercise[1], primary_movements, exercise_library,
-                    available_equipment
-                )
+        workout_session.cooldown = generate_cooldown()
+        detailed_week.append(workout_session)
 
-                if 'exercises' in day_plan:
-                    circuits = create_circuits(day_plan['exercises'], num_soldiers)
-                    workout_session.circuits.extend(circuits)
+    report = None
+    if blocks:
+        report = optimize_week_lifts(blocks, muscle_emphasis_current, muscle_emphasis_goal, deadline,
+                                     num_soldiers, exercise_library, available_equipment)
+
+    # Populate reps for all exercises
+    for workout in detailed_week:
+        for circuit in workout.circuits:
+            for exercise in circuit.exercises:
+                exercise.reps = rep_label(strength_focus, exercise.difficulty)
+
+    return detailed_week, report
+
+def select_lifts_batch(block: str, minutes: int, current: MuscleMatrix, goals: np.ndarray,
+                       primary_movements: Optional[Dict]) -> List[List[str]]:
+    """Run one strength block's greedy selection for every squad at once.
+
+    Mirrors create_upper_day / create_lower_day / create_full_day /
+    create_accessory_day and returns each squad's exercise categories.
+    """
+    squads = len(goals)
+    chosen = [[] for _ in range(squads)]
+
+    if block == 'A':
+        targeted = goals > 0
+        rows = np.arange(squads)
+        for _ in range(minutes // 7):
+            ratios = np.full(goals.shape, np.inf)
+            np.divide(current.normalized(), goals, out=ratios, where=targeted)
+            lag = ratios.argmin(axis=1)
+            lagging = targeted[rows, lag]
+            current.values[rows[lagging], lag[lagging]] += 1
+            for squad in np.flatnonzero(lagging):
+                chosen[squad].append(MUSCLE_TO_CATEGORY.get(MUSCLES[lag[squad]], 'core'))
+        return chosen
+
+    lifts, _, primary_minutes = BLOCK_LIFTS[block]
+    take_primary_lifts(block, primary_movements, current)
+    if primary_movements is not None:
+        minutes -= primary_minutes
 
-                workout_session.warmup = generate_warmup('L')
+    wants = goals[:, lifts.muscles]
+    for _ in range(minutes // 7):
+        best = lifts.pick_many(wants - current.normalized()[:, lifts.muscles])
+        current.add(lifts.rows[best], lifts.muscles)
+        for squad, lift in enumerate(best.tolist()):
+            chosen[squad].append(lifts.names[lift])
+    return chosen
+
+def weekly_plan_batch(list_of_plan_goals: List[Dict], exercise_library: Dict) -> List[List[WorkoutSession]]:
+    """Generate weekly plans for many squads, selecting lifts for all of them at once.
+
+    Squads sharing a schedule template and primary-lift mode step through
+    the greedy selection together on a (squads x muscles) matrix. Each plan
+    is identical to what weekly_plan returns for the same goals.
+    """
+    plans: List[Optional[List[WorkoutSession]]] = [None] * len(list_of_plan_goals)
+
+    groups: Dict[Tuple, List[int]] = {}
+    for i, plan_goals in enumerate(list_of_plan_goals):
+        strength_focus = plan_goals.get('strength_focus', 'hypertrophy')
+        key = (plan_goals['days_per_week'], plan_goals['high_level_focus'],
+               strength_focus in ['power', 'strength'])
+        groups.setdefault(key, []).append(i)
+
+    for (days_per_week, high_level_focus, uses_primary), members in groups.items():
+        week = schedules[days_per_week][high_level_focus]
+        member_goals = [list_of_plan_goals[i] for i in members]
+
+        goals = np.stack([
+            MuscleVector.from_dict(create_muscle_emphasis(g.get('muscle_target', []))).normalized()
+            for g in member_goals
+        ])
+        current = MuscleMatrix(len(members))
+        primary_movements = {} if uses_primary else None
+        run_ct = 0
+
+        weeks = [[] for _ in members]
+        for day_num, day in enumerate(week):
+            sessions = [WorkoutSession(day=day_num + 1) for _ in members]
+
+            for block, minutes in day:
+                if block == 'C':
+                    if minutes > 30:
+                        cardio_type = "Distance"
+                    else:
+                        run_ct += 1
+                        cardio_type = ["Intervals", "Tempo", "HIIT"][min(run_ct - 1, 2)]
+                    for session, g in zip(sessions, member_goals):
+                        session.cardio = create_cardio_workout(
+                            cardio_type, minutes, g.get('cardio_focus', 'distance')
+                        )
+                    continue
+
+                categories = select_lifts_batch(block, minutes, current, goals, primary_movements)
+                circuit_size = BLOCK_CIRCUIT_SIZE[block]
+                for session, g, cats in zip(sessions, member_goals, categories):
+                    exercises = select_exercises(cats, g.get('equipment', ['all']), exercise_library)
+                    session.circuits.extend(create_circuits(exercises, g.get('num_soldiers', 20), circuit_size))
+                    session.warmup = generate_warmup(block)
+
+            for detailed_week, session in zip(weeks, sessions):
+                session.cooldown = generate_cooldown()
+                detailed_week.append(session)
+
+        for i, g, detailed_week in zip(members, member_goals, weeks):
+            strength_focus = g.get('strength_focus', 'hypertrophy')
+            for workout in detailed_week:
+                for circuit in workout.circuits:
+                    for exercise in circuit.exercises:
+                        exercise.reps = rep_label(strength_focus, exercise.difficulty)
+            plans[i] = detailed_week
+
+    return plans
+
+# --- ANYTIME OPTIMIZER ---
+
+# Accessory slots train one muscle each, so any muscle is a valid swap
+ACCESSORY_LIFTS = build_lift_table(
+    MUSCLES, {muscle: np.eye(len(MUSCLES))[i].tolist() for i, muscle in enumerate(MUSCLES)}
+)
+
+def spread_rows(lifts: LiftTable) -> np.ndarray:
+    """A lift table's rows placed into full MUSCLES-length vectors"""
+    rows = np.zeros((len(lifts.names), len(MUSCLES)))
+    rows[:, lifts.muscles] = lifts.rows
+    rows.setflags(write=False)
+    return rows
+
+# Per block type: lift table and its rows over all MUSCLES
+OPTIMIZER_LIFTS = {
+    block: (lifts, spread_rows(lifts))
+    for block, lifts in {'U': UPPER_LIFTS, 'L': LOWER_LIFTS, 'F': FULL_LIFTS, 'A': ACCESSORY_LIFTS}.items()
+}
 
-            elif exercise[0] == 'F':
-                # Full body strength
-                day_plan = create_full_day(
-                    muscle_emphasis_current, muscle_emphasis_goal,
-                    exercise[1], primary_movements, exercise_library,
-                    available_equipment
-                )
+# Stop once this many random restarts in a row fail to beat the best week
+OPTIMIZER_STALE_KICKS = 64
+# Slots re-picked at random per restart
+OPTIMIZER_KICK_SIZE = 2
+# Smallest distance change that counts as an improvement
+OPTIMIZER_EPSILON = 1e-12
+
+def emphasis_distance(totals: np.ndarray, goal: np.ndarray) -> float:
+    """Euclidean distance between a week's normalized emphasis and the goal"""
+    total = totals.sum()
+    return float(np.linalg.norm((totals / total if total else totals) - goal))
+
+def improve_lifts(blocks: List[str], choices: List[np.ndarray], fixed: np.ndarray,
+                  goal: np.ndarray, deadline: float, seed: int = 0) -> Tuple[List[np.ndarray], Dict]:
+    """Iterated local search over every strength slot in a week.
+
+    `choices[i]` holds lift indices into OPTIMIZER_LIFTS[blocks[i]] and
+    `fixed` is the emphasis the search can't change (primary lifts). From
+    the given picks, repeatedly make the single-slot swap that most reduces
+    emphasis_distance; at a local optimum, re-pick a few random slots of
+    the best week and descend again. Runs until `deadline` (perf_counter
+    seconds) or OPTIMIZER_STALE_KICKS restarts without improvement, and
+    returns the best choices with a summary.
+    """
+    rng = np.random.default_rng(seed)
+    rows = [OPTIMIZER_LIFTS[block][1] for block in blocks]
+    current = [choice.copy() for choice in choices]
+    slots = [(i, j) for i, choice in enumerate(current) for j in range(len(choice))]
+
+    def week_totals(picks):
+        totals = fixed.copy()
+        for block_rows, choice in zip(rows, picks):
+            totals += block_rows[choice].sum(axis=0)
+        return totals
+
+    totals = week_totals(current)
+    distance = greedy_distance = emphasis_distance(totals, goal)
+    best, best_distance = [choice.copy() for choice in current], distance
+    moves = kicks = stale = 0
+    converged = False
+
+    while time.perf_counter() < deadline:
+        # Distance after every possible single-slot swap, one block at a time
+        move = None
+        for i, (block_rows, choice) in enumerate(zip(rows, current)):
+            if not len(choice):
+                continue
+            candidates = (totals - block_rows[choice])[:, None, :] + block_rows[None, :, :]
+            distances = np.linalg.norm(candidates / candidates.sum(axis=2, keepdims=True) - goal, axis=2)
+            slot, lift = divmod(int(distances.argmin()), len(block_rows))
+            if distances[slot, lift] < distance - OPTIMIZER_EPSILON:
+                move = (i, slot, lift)
+                distance = float(distances[slot, lift])
+        if move:
+            i, slot, lift = move
+            totals += rows[i][lift] - rows[i][current[i][slot]]
+            current[i][slot] = lift
+            moves += 1
+            continue
+
+        if distance < best_distance - OPTIMIZER_EPSILON:
+            best, best_distance = [choice.copy() for choice in current], distance
+            stale = 0
+        else:
+            stale += 1
+        if stale >= OPTIMIZER_STALE_KICKS or not slots:
+            converged = True
+            break
+
+        current = [choice.copy() for choice in best]
+        for k in rng.choice(len(slots), size=min(OPTIMIZER_KICK_SIZE, len(slots)), replace=False):
+            i, slot = slots[k]
+            current[i][slot] = rng.integers(len(rows[i]))
+        totals = week_totals(current)
+        distance = emphasis_distance(totals, goal)
+        kicks += 1
+
+    if distance < best_distance - OPTIMIZER_EPSILON:
+        best, best_distance = current, distance
+
+    return best, {
+        'greedy_distance': greedy_distance,
+        'distance': best_distance,
+        'moves': moves,
+        'kicks': kicks,
+        'converged': converged,
+    }
 
-                if 'exercises' in day_plan:
-                    circuits = create_circuits(day_plan['exercises'], num_soldiers)
-                    workout_session.circuits.extend(circuits)
+def optimize_week_lifts(blocks: List[Tuple], current: MuscleVector, goal: np.ndarray, deadline: float,
+                        num_soldiers: int, exercise_library: Dict, available_equipment: List[str]) -> Dict:
+    """Improve weekly_plan's greedy strength blocks in place until `deadline`.
+
+    `blocks` holds (session, block type, lifts, circuits) per strength block
+    and `current` the week's final emphasis. Blocks whose lifts change get
+    their exercises re-selected and circuits rebuilt. Returns the search
+    summary.
+    """
+    started = time.perf_counter()
+    kinds = [kind for _, kind, _, _ in blocks]
+    choices = [
+        np.array([OPTIMIZER_LIFTS[kind][0].names.index(name) for name in lifts], dtype=np.intp)
+        for _, kind, lifts, _ in blocks
+    ]
+    fixed = current.values.copy()
+    for kind, choice in zip(kinds, choices):
+        fixed -= OPTIMIZER_LIFTS[kind][1][choice].sum(axis=0)
+
+    best, summary = improve_lifts(kinds, choices, fixed, goal, deadline)
+
+    changed = 0
+    for (session, kind, _, circuits), old, new in zip(blocks, choices, best):
+        if np.array_equal(old, new):
+            continue
+        changed += 1
+        names = [OPTIMIZER_LIFTS[kind][0].names[i] for i in new.tolist()]
+        if kind == 'A':
+            names = [MUSCLE_TO_CATEGORY.get(muscle, 'core') for muscle in names]
+        exercises = select_exercises(names, available_equipment, exercise_library)
+        start = next((i for i, circuit in enumerate(session.circuits) if circuits and circuit is circuits[0]),
+                     len(session.circuits))
+        session.circuits[start:start + len(circuits)] = create_circuits(
+            exercises, num_soldiers, BLOCK_CIRCUIT_SIZE[kind]
+        )
 
-                workout_session.warmup = generate_warmup('F')
+    return dict(summary, blocks_changed=changed, elapsed_ms=round((time.perf_counter() - started) * 1000, 3))
 
-            elif exercise[0] == 'A':
-                # Accessory work
-                day_plan = create_accessory_day(
-                    muscle_emphasis_current, muscle_emphasis_goal,
-                    exercise[1], primary_movements, exercise_library,
-                    available_equipment
-                )
+# --- STATION ROTATION ---
 
-                if 'exercises' in day_plan:
-                    circuits = create_circuits(day_plan['exercises'], num_soldiers, 2)
-                    workout_session.circuits.extend(circuits)
+# Soldiers one bodyweight station (no equipment) can hold at once
+OPEN_STATION_CAPACITY = 40
 
-                workout_session.warmup = generate_warmup('A')
+@dataclass
+class RotationPlan:
+    """Groups rotating through a circuit's stations.
+
+    `slots[g, s]` is the time slot in which group g works station s; each
+    slot lasts work + transition seconds and the rotation repeats per round.
+    """
+    stations: List[str]
+    capacities: List[int]
+    group_sizes: List[int]
+    slots: np.ndarray
+    slot_count: int
+    slot_seconds: int
+    total_seconds: int
+
+    def station_groups(self, slot: int) -> List[List[int]]:
+        """Groups at each station during one slot"""
+        groups, stations = np.nonzero(self.slots == slot)
+        return [groups[stations == s].tolist() for s in range(len(self.stations))]
+
+    def to_dict(self) -> Dict:
+        order = np.argsort(self.slots, axis=0, kind='stable')
+        counts = [np.bincount(column, minlength=self.slot_count) for column in self.slots.T]
+        # Per slot, per station: the groups working it
+        schedule = []
+        for s in range(len(self.stations)):
+            bounds = np.concatenate(([0], np.cumsum(counts[s])))
+            groups = order[:, s].tolist()
+            schedule.append([groups[bounds[t]:bounds[t + 1]] for t in range(self.slot_count)])
+        return {
+            'stations': self.stations,
+            'capacities': self.capacities,
+            'group_sizes': self.group_sizes,
+            'slot_count': self.slot_count,
+            'slot_seconds': self.slot_seconds,
+            'total_seconds': self.total_seconds,
+            'slots': [[schedule[s][t] for s in range(len(self.stations))] for t in range(self.slot_count)],
+        }
+
+def station_capacity(equipment: List[str], equipment_counts: Dict[str, int]) -> int:
+    """Soldiers a station can hold: its scarcest item, one soldier per item"""
+    if not equipment:
+        return OPEN_STATION_CAPACITY
+    return min(int(equipment_counts.get(item, 0)) for item in equipment)
+
+def schedule_rotation(stations: List[Dict], num_soldiers: int, equipment_counts: Dict[str, int],
+                      work_seconds: int = 45, rest_seconds: int = 15, rounds: int = 3,
+                      rest_between_rounds: int = 60) -> RotationPlan:
+    """Split a roster into groups and rotate them through a circuit's stations.
+
+    `stations` are exercises in circuit_to_dict form (name, equipment). With
+    groups of m soldiers, station s fits k_s = capacity_s // m groups at a
+    time, and every group must visit every station once per round. Group g
+    working station s in slot (g + s) mod T satisfies both whenever
+    T >= max(stations, ceil(groups / min k_s)), which is also a lower bound,
+    so T is optimal for m. Every group size is evaluated at once and the
+    one with the fewest slots wins (larger groups on ties).
+    """
+    if not stations:
+        raise ValueError("Rotation needs at least one station")
+    if num_soldiers < 1:
+        raise ValueError("Rotation needs at least one soldier")
+
+    names = [station.get('name', '') for station in stations]
+    capacities = np.array([station_capacity(station.get('equipment') or [], equipment_counts)
+                           for station in stations], dtype=np.int64)
+    if capacities.min() < 1:
+        short = [name for name, cap in zip(names, capacities.tolist()) if cap < 1]
+        raise ValueError(f"No equipment available for: {', '.join(short)}")
+
+    station_count = len(stations)
+    sizes = np.arange(1, min(int(capacities.min()), num_soldiers) + 1)
+    groups = -(-num_soldiers // sizes)
+    lanes = (capacities[:, None] // sizes[None, :]).min(axis=0)
+    slot_counts = np.maximum(station_count, -(-groups // lanes))
+
+    best = int(np.flatnonzero(slot_counts == slot_counts.min())[-1])
+    group_count, slot_count = int(groups[best]), int(slot_counts[best])
+
+    # Spread the roster evenly instead of leaving one small group
+    base, extra = divmod(num_soldiers, group_count)
+    group_sizes = [base + 1] * extra + [base] * (group_count - extra)
+    slots = (np.arange(group_count)[:, None] + np.arange(station_count)[None, :]) % slot_count
+
+    slot_seconds = work_seconds + rest_seconds
+    total_seconds = rounds * slot_count * slot_seconds + (rounds - 1) * rest_between_rounds
+    return RotationPlan(names, capacities.tolist(), group_sizes, slots, slot_count, slot_seconds, total_seconds)
+
+# --- SHARED EQUIPMENT ---
+
+# Booking grid; every work, rest and round-rest length is a multiple of it
+BOOKING_STEP_SECONDS = 15
 
-        workout_session.cooldown = generate_cooldown()
-        detailed_week.append(workout_session)
+@dataclass
+class SquadBooking:
+    """When one squad runs its circuits in a shared gym window"""
+    squad: int
+    session: WorkoutSession
+    start_seconds: int
+    circuit_order: List[int]
+    circuit_starts: List[int]
+    substitutions: List[Tuple[str, str]] = field(default_factory=list)
+
+    def to_dict(self) -> Dict:
+        return {
+            'squad': self.squad,
+            'start_seconds': self.start_seconds,
+            'circuit_order': self.circuit_order,
+            'circuit_starts': self.circuit_starts,
+            'substitutions': [list(pair) for pair in self.substitutions],
+            'session': session_to_dict(self.session),
+        }
+
+def circuit_seconds(circuit: Circuit) -> int:
+    """Wall time of a circuit: every station busy for every round"""
+    stations = len(circuit.exercises)
+    return (circuit.rounds * stations * (circuit.work_seconds + circuit.rest_seconds)
+            + max(circuit.rounds - 1, 0) * circuit.rest_between_rounds)
+
+class EquipmentBookings:
+    """Per-item usage over time for a fixed inventory of shared items.
+
+    Items not in the inventory are unlimited. Each station books one unit
+    of every shared item its exercise needs for the whole circuit.
+    """
+
+    def __init__(self, equipment_counts: Dict[str, int], horizon: int):
+        self.items = {item: i for i, item in enumerate(equipment_counts)}
+        self.capacity = np.array([int(count) for count in equipment_counts.values()], dtype=np.int64)
+        self.usage = np.zeros((len(self.items), horizon + 1), dtype=np.int64)
+
+    def demand(self, exercises) -> np.ndarray:
+        demand = np.zeros(len(self.items), dtype=np.int64)
+        for exercise in exercises:
+            for item in exercise.equipment:
+                if item in self.items:
+                    demand[self.items[item]] += 1
+        return demand
+
+    def earliest(self, demand: np.ndarray, ready: int, length: int) -> Optional[int]:
+        """First step >= ready where `demand` fits for `length` steps"""
+        used = np.flatnonzero(demand)
+        if not len(used):
+            return ready
+        if (demand[used] > self.capacity[used]).any():
+            return None
+        over = (self.usage[used] + demand[used, None] > self.capacity[used, None]).any(axis=0)
+        blocked = np.concatenate(([0], np.cumsum(over)))
+        starts = np.arange(ready, self.usage.shape[1] - length)
+        fits = np.flatnonzero(blocked[starts + length] == blocked[starts])
+        return int(starts[fits[0]]) if len(fits) else None
+
+    def free(self, start: int, length: int) -> np.ndarray:
+        """Units of each item left over for the whole interval"""
+        return self.capacity - self.usage[:, start:start + length].max(axis=1, initial=0)
+
+    def idle_from(self, start: int) -> int:
+        """First step >= start after which nothing is booked"""
+        busy = np.flatnonzero(self.usage.any(axis=0))
+        return max(start, int(busy[-1]) + 1 if len(busy) else 0)
+
+    def book(self, demand: np.ndarray, start: int, length: int):
+        self.usage[:, start:start + length] += demand[:, None]
+
+def substitute_for_window(circuit: Circuit, bookings: EquipmentBookings, start: int, length: int,
+                          exercise_library: Dict, available_equipment: Optional[List[str]] = None
+                          ) -> Optional[Tuple[List[Prescription], List[Tuple[str, str]]]]:
+    """Swap exercises that don't fit the window for same-category ones that do.
+
+    Alternatives must fit the shared items left in the window and use only
+    the squad's own equipment (anything, for 'all' or no list). None if
+    some exercise has no such alternative.
+    """
+    kit = None if not available_equipment or 'all' in available_equipment else set(available_equipment)
+    free = bookings.free(start, length)
+    exercises, swaps = [], []
+    for exercise in circuit.exercises:
+        need = bookings.demand([exercise])
+        if (need <= free).all():
+            free -= need
+            exercises.append(exercise)
+            continue
+        for alternative in exercise_library.get(exercise.category, ()):
+            if alternative.name == exercise.name:
+                continue
+            if kit is not None and not kit.issuperset(alternative.equipment):
+                continue
+            need = bookings.demand([alternative])
+            if (need <= free).all():
+                free -= need
+                exercises.append(Prescription(alternative, exercise.reps))
+                swaps.append((exercise.name, alternative.name))
+                break
+        else:
+            return None
+    return exercises, swaps
+
+def schedule_shared_equipment(sessions: List[WorkoutSession], equipment_counts: Dict[str, int],
+                              exercise_library: Dict,
+                              available_equipment: Optional[List[List[str]]] = None) -> List[SquadBooking]:
+    """Fit several squads' sessions into one gym window without overbooking.
+
+    Squads are placed heaviest shared-item demand first. Each squad runs its
+    circuits back to back, choosing next whichever remaining circuit can
+    start soonest. A circuit that would have to wait first tries
+    substitute_for_window to start on time; only circuits with no such swap
+    are delayed, which is where start offsets come from. Raises ValueError
+    when a circuit can't fit the inventory even in an empty gym.
+    `available_equipment` holds each squad's own kit, for substitutions.
+    """
+    step = BOOKING_STEP_SECONDS
+    lengths = [[-(-circuit_seconds(circuit) // step) for circuit in session.circuits] for session in sessions]
+    bookings = EquipmentBookings(equipment_counts, sum(map(sum, lengths)))
+
+    load = [sum(int(bookings.demand(circuit.exercises).sum()) * length
+                for circuit, length in zip(session.circuits, squad_lengths))
+            for session, squad_lengths in zip(sessions, lengths)]
+    result = [None] * len(sessions)
+
+    for squad in sorted(range(len(sessions)), key=lambda i: (-load[i], i)):
+        session = sessions[squad]
+        kit = available_equipment[squad] if available_equipment else None
+        circuits = list(session.circuits)
+        remaining = list(range(len(circuits)))
+        order, starts, swaps = [], [], []
+        ready = None
+
+        while remaining:
+            options = []
+            for index in remaining:
+                circuit, length = circuits[index], lengths[squad][index]
+                demand = bookings.demand(circuit.exercises)
+                begin = bookings.earliest(demand, ready or 0, length)
+                exercises = circuit.exercises
+                swapped = []
+                if begin is None or begin > (ready or 0):
+                    substitute = substitute_for_window(circuit, bookings, ready or 0, length, exercise_library, kit)
+                    if substitute:
+                        exercises, swapped = substitute
+                        demand, begin = bookings.demand(exercises), ready or 0
+                if begin is None:
+                    # Too big for the inventory even alone; swap once the gym is clear
+                    idle = bookings.idle_from(ready or 0)
+                    substitute = substitute_for_window(circuit, bookings, idle, length, exercise_library, kit)
+                    if substitute:
+                        exercises, swapped = substitute
+                        demand, begin = bookings.demand(exercises), idle
+                if begin is None:
+                    short = [item for item, i in bookings.items.items() if demand[i] > bookings.capacity[i]]
+                    raise ValueError(f"Squad {squad + 1} circuit {index + 1} needs more {', '.join(short)} "
+                                     f"than the gym has, and no substitute fits")
+                options.append((begin, index, demand, exercises, swapped))
+
+            begin, index, demand, exercises, swapped = min(options, key=lambda option: option[:2])
+            length = lengths[squad][index]
+            bookings.book(demand, begin, length)
+            if swapped:
+                circuits[index] = replace(circuits[index], exercises=list(exercises))
+                swaps.extend(swapped)
+            remaining.remove(index)
+            order.append(index)
+            starts.append(begin * step)
+            ready = begin + length
+
+        result[squad] = SquadBooking(
+            squad=squad,
+            session=replace(session, circuits=[circuits[i] for i in order]),
+            start_seconds=starts[0] if starts else 0,
+            circuit_order=order,
+            circuit_starts=starts,
+            substitutions=swaps,
+        )
 
-    # Populate reps for all exercises
-    for workout in detailed_week:
-        for circuit in workout.circuits:
+    return result
+
+# --- INCREMENTAL RE-PLANNING ---
+
+# Inverse of MUSCLE_TO_CATEGORY, for reading accessory work back
+CATEGORY_TO_MUSCLE = {category: muscle for muscle, category in MUSCLE_TO_CATEGORY.items()}
+
+def add_stored_emphasis(block: str, circuits: List[Dict], current: MuscleVector):
+    """Add the emphasis of a stored block's exercises, read by category.
+
+    Exercises whose category the block doesn't know (hand-edited ones) add
+    nothing.
+    """
+    for circuit in circuits:
+        for exercise in circuit.get('exercises') or []:
+            category = exercise.get('category')
+            if block == 'A':
+                muscle = CATEGORY_TO_MUSCLE.get(category)
+                if muscle:
+                    current.add(1.0, MUSCLE_INDEX[muscle])
+            elif block in BLOCK_LIFTS:
+                lifts = BLOCK_LIFTS[block][0]
+                if category in lifts.names:
+                    current.add(lifts.rows[lifts.names.index(category)], lifts.muscles)
+
+def replan_after(days: List[Dict], edited_day: int, plan_goals: Dict,
+                 exercise_library: Dict) -> Dict[int, List[Dict]]:
+    """Re-select strength work for the days after an edited or deleted one.
+
+    `days` are the program's stored days in session_to_dict form (a deleted
+    day is simply absent) and `plan_goals` the goals it was generated from.
+    Emphasis is rebuilt from the stored circuits of days up to
+    `edited_day`, then every later day's strength blocks are chosen again
+    in order. Returns new circuits (as dicts) by day number; warmup,
+    cardio and cooldown are left alone.
+    """
+    week = schedules[plan_goals['days_per_week']][plan_goals['high_level_focus']]
+    available_equipment = plan_goals.get('equipment', ['all'])
+    num_soldiers = plan_goals.get('num_soldiers', 20)
+    strength_focus = plan_goals.get('strength_focus', 'hypertrophy')
+
+    goal = MuscleVector.from_dict(create_muscle_emphasis(plan_goals.get('muscle_target', []))).normalized()
+    current = MuscleVector()
+    primary_movements = {} if (strength_focus in ['power', 'strength']) else None
+
+    replanned = {}
+    for day in sorted(days, key=lambda d: d['day']):
+        blocks = week[day['day'] - 1] if 1 <= day['day'] <= len(week) else []
+
+        if day['day'] <= edited_day:
+            for block, _ in blocks:
+                take_primary_lifts(block, primary_movements, current)
+            strength = [block for block, _ in blocks if block in BLOCK_BUILDERS]
+            if strength:
+                add_stored_emphasis(strength[0], day.get('circuits') or [], current)
+            continue
+
+        circuits = []
+        for block, minutes in blocks:
+            if block not in BLOCK_BUILDERS:
+                continue
+            day_plan = BLOCK_BUILDERS[block](current, goal, minutes, primary_movements,
+                                             exercise_library, available_equipment)
+            circuits.extend(create_circuits(day_plan['exercises'], num_soldiers, BLOCK_CIRCUIT_SIZE[block]))
+        for circuit in circuits:
             for exercise in circuit.exercises:
-                rep_range = get_rep_range(strength_focus, exercise.difficulty)
-                exercise.reps = f"{rep_range[0]}-{rep_range[1]}"
+                exercise.reps = rep_label(strength_focus, exercise.difficulty)
+        replanned[day['day']] = [circuit_to_dict(circuit) for circuit in circuits]
 
-    return detailed_week
+    return replanned
 
-def format_workout_card(workout: WorkoutSession, strength_focus: str = 'hypertrophy') -> str:
-    """Format workout as printable card"""
+# --- LOAD PRESCRIPTION ---
+
+# Working weights are rounded down to what plates can make
+LOAD_INCREMENT_KG = 2.5
+
+# Short names a roster may record 1RMs under
+LIFT_ALIASES = {
+    'bench': 'Barbell Bench Press',
+    'squat': 'Barbell Back Squat',
+    'deadlift': 'Barbell Deadlift',
+    'hinge': 'Barbell Deadlift',
+    'row': 'Barbell Row',
+    'press': 'Overhead Press',
+}
+
+# Loaded exercises without a recorded 1RM: (reference lift, fraction of its
+# 1RM, fraction of bodyweight). Conservative intermediate standards;
+# dumbbell figures are per dumbbell.
+LOAD_STANDARDS = {
+    'Barbell Bench Press': (None, 0.0, 0.9),
+    'Dumbbell Bench Press': ('Barbell Bench Press', 0.4, 0.35),
+    'Incline Dumbbell Press': ('Barbell Bench Press', 0.35, 0.3),
+    'Overhead Press': ('Barbell Bench Press', 0.65, 0.55),
+    'Dumbbell Shoulder Press': ('Overhead Press', 0.4, 0.22),
+    'Arnold Press': ('Overhead Press', 0.35, 0.2),
+    'Barbell Row': ('Barbell Bench Press', 0.8, 0.7),
+    'Dumbbell Row': ('Barbell Row', 0.45, 0.3),
+    'Overhead Tricep Extension': ('Barbell Bench Press', 0.2, 0.18),
+    'Barbell Curl': ('Barbell Row', 0.45, 0.3),
+    'Dumbbell Curl': ('Barbell Curl', 0.4, 0.12),
+    'Hammer Curl': ('Barbell Curl', 0.45, 0.14),
+    'Barbell Back Squat': (None, 0.0, 1.2),
+    'Front Squat': ('Barbell Back Squat', 0.85, 1.0),
+    'Goblet Squat': ('Barbell Back Squat', 0.3, 0.35),
+    'Bulgarian Split Squat': ('Barbell Back Squat', 0.2, 0.25),
+    'Barbell Deadlift': (None, 0.0, 1.4),
+    'Romanian Deadlift': ('Barbell Deadlift', 0.7, 1.0),
+    'Good Morning': ('Barbell Back Squat', 0.45, 0.5),
+    'Kettlebell Swing': ('Barbell Deadlift', 0.2, 0.3),
+    'Walking Lunge': ('Barbell Back Squat', 0.2, 0.22),
+    'Step-Up': ('Barbell Back Squat', 0.2, 0.22),
+    'Lateral Raise': ('Overhead Press', 0.15, 0.08),
+    'Upright Row': ('Barbell Row', 0.5, 0.35),
+    'Rear Delt Fly': ('Barbell Row', 0.12, 0.08),
+}
+
+# Where each working weight's 1RM came from; LoadTable.source indexes this
+LOAD_SOURCES = ('recorded', 'reference', 'bodyweight', 'none')
+
+@dataclass
+class Roster:
+    """Soldiers' 1RMs as a matrix: one_rep_max_kg[s, l] for soldier s and
+    lift l (an exercise name), NaN where nothing is recorded."""
+    soldier_ids: List[int]
+    names: List[str]
+    bodyweight_kg: np.ndarray
+    lifts: List[str]
+    one_rep_max_kg: np.ndarray
+
+    @classmethod
+    def from_rows(cls, soldiers: List[Tuple], maxes: List[Tuple]) -> 'Roster':
+        """Build from (id, name, bodyweight_kg) and (soldier_id, lift, kg) rows.
+
+        Lifts recorded under a LIFT_ALIASES name count as the full name;
+        missing or non-positive values become NaN.
+        """
+        soldier_ids = [row[0] for row in soldiers]
+        row_of = {soldier_id: i for i, soldier_id in enumerate(soldier_ids)}
+        bodyweight = np.array([np.nan if row[2] is None else row[2] for row in soldiers], dtype=np.float64)
+
+        lifts: Dict[str, int] = {}
+        rows, columns, values = [], [], []
+        for soldier_id, lift, kg in maxes:
+            if soldier_id not in row_of or kg is None:
+                continue
+            lift = LIFT_ALIASES.get(lift, lift)
+            rows.append(row_of[soldier_id])
+            columns.append(lifts.setdefault(lift, len(lifts)))
+            values.append(kg)
+
+        matrix = np.full((len(soldier_ids), len(lifts)), np.nan)
+        matrix[rows, columns] = values
+        bodyweight[bodyweight <= 0] = np.nan
+        matrix[matrix <= 0] = np.nan
+        return cls(soldier_ids, [row[1] for row in soldiers], bodyweight, list(lifts), matrix)
+
+@dataclass
+class LoadTable:
+    """Working weights for every soldier (rows) and exercise (columns).
+
+    `light_kg` is the load for the top of each exercise's rep range and
+    `heavy_kg` for the bottom; both are NaN where nothing gives a 1RM
+    (bodyweight work, or an unrecorded lift with no standard).
+    """
+    soldier_ids: List[int]
+    names: List[str]
+    exercises: List[str]
+    reps: List[str]
+    light_kg: np.ndarray
+    heavy_kg: np.ndarray
+    source: np.ndarray
+
+    def to_dict(self) -> Dict:
+        """Column per exercise, one entry per soldier in `soldier_ids` order"""
+        light = np.where(np.isnan(self.light_kg), None, self.light_kg).T.tolist()
+        heavy = np.where(np.isnan(self.heavy_kg), None, self.heavy_kg).T.tolist()
+        return {
+            'soldier_ids': self.soldier_ids,
+            'names': self.names,
+            'sources': list(LOAD_SOURCES),
+            'exercises': [
+                {'name': name, 'reps': reps, 'light_kg': light[j], 'heavy_kg': heavy[j],
+                 'source': self.source[:, j].tolist()}
+                for j, (name, reps) in enumerate(zip(self.exercises, self.reps))
+            ],
+        }
+
+def parse_rep_range(reps) -> Optional[Tuple[int, int]]:
+    """(low, high) from a reps string like "8-12" or "5", else None"""
+    try:
+        parts = [int(part) for part in str(reps).split('-')]
+    except ValueError:
+        return None
+    if len(parts) == 1:
+        parts = parts * 2
+    if len(parts) != 2 or min(parts) < 1:
+        return None
+    return min(parts), max(parts)
+
+def session_exercises(day: Dict) -> List[Dict]:
+    """Each distinct exercise in a day's circuits (session_to_dict form), in order"""
+    seen = {}
+    for circuit in day.get('circuits') or []:
+        for exercise in circuit.get('exercises') or []:
+            seen.setdefault(exercise.get('name', ''), exercise)
+    return list(seen.values())
+
+def prescribe_loads(exercises: List[Dict], roster: Roster, strength_focus: str = 'hypertrophy') -> LoadTable:
+    """Working weights for a whole roster at once.
+
+    A soldier's 1RM for each exercise is their recorded one, else a
+    fraction of their recorded reference lift, else a fraction of
+    bodyweight (LOAD_STANDARDS). Loads come from Epley, load = 1RM /
+    (1 + reps / 30), at both ends of the rep range, rounded down to
+    LOAD_INCREMENT_KG. Every step is a (soldiers x exercises) array
+    operation; only the per-exercise setup runs in Python.
+    """
+    names = [exercise.get('name', '') for exercise in exercises]
+    ranges = [parse_rep_range(exercise.get('reps'))
+              or get_rep_range(strength_focus, exercise.get('difficulty', 1)) for exercise in exercises]
+    reps = np.array(ranges, dtype=np.float64).reshape(-1, 2)
+
+    # Trailing all-NaN column stands in for lifts nobody recorded
+    soldier_count = len(roster.soldier_ids)
+    maxes = np.hstack([roster.one_rep_max_kg, np.full((soldier_count, 1), np.nan)])
+    column = {lift: i for i, lift in enumerate(roster.lifts)}
+    unknown = len(roster.lifts)
+
+    standards = [LOAD_STANDARDS.get(name, (None, np.nan, np.nan)) for name in names]
+    own = [column.get(name, unknown) for name in names]
+    reference = [column.get(lift, unknown) if lift else unknown for lift, _, _ in standards]
+    reference_ratio = np.array([ratio for _, ratio, _ in standards], dtype=np.float64)
+    bodyweight_ratio = np.array([ratio for _, _, ratio in standards], dtype=np.float64)
+
+    candidates = np.stack([
+        maxes[:, own],
+        maxes[:, reference] * reference_ratio,
+        roster.bodyweight_kg[:, None] * bodyweight_ratio,
+    ])
+    known = ~np.isnan(candidates)
+    first = known.argmax(axis=0)
+    one_rep_max = np.take_along_axis(candidates, first[None], axis=0)[0]
+    source = np.where(known.any(axis=0), first, len(LOAD_SOURCES) - 1).astype(np.int8)
+
+    # A single rep is the 1RM itself rather than Epley's 3% under it
+    fraction = np.where(reps <= 1, 1.0, 1.0 / (1.0 + reps / 30.0))
+    heavy = np.floor(one_rep_max * fraction[:, 0] / LOAD_INCREMENT_KG) * LOAD_INCREMENT_KG
+    light = np.floor(one_rep_max * fraction[:, 1] / LOAD_INCREMENT_KG) * LOAD_INCREMENT_KG
+
+    labels = [str(exercise.get('reps') or f"{lo}-{hi}") for exercise, (lo, hi) in zip(exercises, ranges)]
+    return LoadTable(roster.soldier_ids, roster.names, names, labels, light, heavy, source)
+
+# --- CARDIO PACING ---
+
+TWO_MILE_METERS = 3218.69
+
+# Riegel's endurance exponent: race time grows as distance ** 1.06
+RIEGEL_EXPONENT = 1.06
+
+# Heart-rate reserve bands (Karvonen) matching each session's effort text.
+# Distance runs use the first band when conversational, the second otherwise.
+CARDIO_EFFORT = {
+    'Distance Run': ((0.60, 0.70), (0.70, 0.80)),
+    'Interval Training': ((0.85, 0.95),),
+    'Tempo Run': ((0.80, 0.85),),
+    'HIIT': ((0.90, 1.00),),
+}
+
+# Steady-run pace as a multiple of 2-mile race pace: conversational, moderate
+EASY_PACE_FACTOR = 1.30
+MODERATE_PACE_FACTOR = 1.15
+
+# Tempo pace is the pace a soldier could race for this long
+THRESHOLD_SECONDS = 3600.0
+
+TEMPO_WARMUP_MINUTES = 10
+
+PACING_COLUMNS = ('max_hr', 'hr_low', 'hr_high', 'pace_s_per_km', 'split_s', 'distance_km')
+
+@dataclass
+class FitnessRoster:
+    """Per-soldier cardio inputs as aligned arrays; NaN where not recorded"""
+    soldier_ids: List[int]
+    names: List[str]
+    age: np.ndarray
+    resting_hr: np.ndarray
+    two_mile_seconds: np.ndarray
+
+    @classmethod
+    def from_rows(cls, rows: List[Tuple]) -> 'FitnessRoster':
+        """Build from (id, name, age, resting_hr, two_mile_seconds) rows"""
+        values = np.array([row[2:5] for row in rows], dtype=np.float64).reshape(-1, 3)
+        values[values <= 0] = np.nan
+        return cls([row[0] for row in rows], [row[1] for row in rows],
+                   values[:, 0], values[:, 1], values[:, 2])
+
+@dataclass
+class CardioPacing:
+    """Targets for one cardio session, one array per column, one row per soldier.
+
+    Paces are seconds per km, `split_s` the time for one interval rep and
+    heart rates beats per minute. Columns that don't apply to the session
+    (pace for HIIT, splits outside intervals) or lack inputs are NaN.
+    """
+    type: str
+    soldier_ids: List[int]
+    names: List[str]
+    columns: Dict[str, np.ndarray]
+
+    def to_dict(self) -> Dict:
+        return {
+            'type': self.type,
+            'soldier_ids': self.soldier_ids,
+            'names': self.names,
+            'columns': {name: np.where(np.isnan(values), None, values).tolist()
+                        for name, values in self.columns.items()},
+        }
+
+def riegel_speed(two_mile_seconds: np.ndarray, race_seconds) -> np.ndarray:
+    """Meters per second a soldier could hold for a race lasting `race_seconds`"""
+    speed = TWO_MILE_METERS / two_mile_seconds
+    return speed * (race_seconds / two_mile_seconds) ** (1.0 / RIEGEL_EXPONENT - 1.0)
+
+def pace_cardio(cardio_type: str, duration_minutes: int, details: Dict,
+                fitness: FitnessRoster) -> CardioPacing:
+    """Heart-rate zones, paces and interval splits for a whole roster.
+
+    Max HR is Tanaka's 208 - 0.7 x age and zones are Karvonen bands of
+    heart-rate reserve (a straight %max HR without a resting HR). Paces
+    come from the 2-mile time: steady runs at a multiple of its pace,
+    tempo at the pace Riegel's formula predicts for an hour, intervals at
+    the predicted mile pace. `cardio_type` and `details` are a
+    CardioWorkout's; every column is computed for all soldiers at once.
+    Raises ValueError for a type with no effort bands.
+    """
+    if cardio_type not in CARDIO_EFFORT:
+        raise ValueError(f"No pacing for cardio type: {cardio_type}")
+    bands = CARDIO_EFFORT[cardio_type]
+    low, high = bands[1] if len(bands) > 1 and details.get('pace') != 'conversational' else bands[0]
+    soldiers = len(fitness.soldier_ids)
+    missing = np.full(soldiers, np.nan)
+
+    max_hr = 208.0 - 0.7 * fitness.age
+    reserve = max_hr - fitness.resting_hr
+    has_rest = ~np.isnan(fitness.resting_hr)
+    hr_low = np.where(has_rest, fitness.resting_hr + low * reserve, low * max_hr)
+    hr_high = np.where(has_rest, fitness.resting_hr + high * reserve, high * max_hr)
+
+    race_pace = 1000.0 / (TWO_MILE_METERS / fitness.two_mile_seconds)
+    pace, split, distance = missing, missing, missing
+    if cardio_type == 'Distance Run':
+        pace = race_pace * (EASY_PACE_FACTOR if details.get('pace') == 'conversational' else MODERATE_PACE_FACTOR)
+        distance = duration_minutes * 60.0 / pace
+    elif cardio_type == 'Tempo Run':
+        pace = 1000.0 / riegel_speed(fitness.two_mile_seconds, THRESHOLD_SECONDS)
+        tempo_minutes = details.get('tempo_duration', duration_minutes - TEMPO_WARMUP_MINUTES)
+        distance = (tempo_minutes * 60.0 / pace
+                    + (duration_minutes - tempo_minutes) * 60.0 / (race_pace * EASY_PACE_FACTOR))
+    elif cardio_type == 'Interval Training':
+        mile_seconds = fitness.two_mile_seconds * 0.5 ** RIEGEL_EXPONENT
+        pace = mile_seconds / (TWO_MILE_METERS / 2000.0)
+        work_meters = interval_work_meters(duration_minutes)
+        split = pace * work_meters / 1000.0
+        # Recoveries are half the work distance, jogged
+        distance = np.full(soldiers, details.get('rounds', 0) * work_meters * 1.5 / 1000.0)
+
+    columns = {
+        'max_hr': np.round(max_hr),
+        'hr_low': np.round(hr_low),
+        'hr_high': np.round(hr_high),
+        'pace_s_per_km': np.round(pace, 1),
+        'split_s': np.round(split, 1),
+        'distance_km': np.round(distance, 2),
+    }
+    return CardioPacing(cardio_type, fitness.soldier_ids, fitness.names, columns)
+
+# --- PLAN CACHE ---
+
+PLAN_CACHE_SIZE = 512
+PLAN_CACHE_TTL_SECONDS = 3600.0
+
+def canonical_goals(plan_goals: Dict) -> Tuple:
+    """Hashable form of the goals weekly_plan reads, with defaults filled in.
+
+    Equipment is sorted and deduplicated, and anything that means "all
+    equipment" collapses to ('all',). Muscle targets are sorted but keep
+    repeats, because each repeat compounds that muscle's emphasis.
+    Squad size is reduced to its circuit_soldier_class.
+    """
+    equipment = plan_goals.get('equipment', ['all'])
+    if not equipment or 'all' in equipment:
+        equipment = ('all',)
+    else:
+        equipment = tuple(sorted(set(equipment)))
+    muscle_target = tuple(sorted(m for m in plan_goals.get('muscle_target', []) if m in baseline))
+    return (
+        plan_goals['days_per_week'],
+        plan_goals['high_level_focus'],
+        plan_goals.get('strength_focus', 'hypertrophy'),
+        plan_goals.get('cardio_focus', 'distance'),
+        circuit_soldier_class(plan_goals.get('num_soldiers', 20)),
+        muscle_target,
+        equipment,
+    )
+
+def copy_week(week: List[WorkoutSession]) -> List[WorkoutSession]:
+    """Copy a plan down to every mutable list and dict it contains"""
+    return [
+        replace(
+            session,
+            circuits=[
+                replace(circuit, exercises=[exercise.copy() for exercise in circuit.exercises])
+                for circuit in session.circuits
+            ],
+            cardio=replace(session.cardio, details={
+                key: list(value) if isinstance(value, list) else value
+                for key, value in session.cardio.details.items()
+            }) if session.cardio else None,
+        )
+        for session in week
+    ]
+
+class PlanCache:
+    """LRU + TTL cache in front of weekly_plan, keyed on canonical_goals.
+
+    Callers always get their own copy of a plan, so editing reps on the
+    result never touches the cached entry.
+    """
+
+    def __init__(self, exercise_library: Dict, maxsize: int = PLAN_CACHE_SIZE,
+                 ttl_seconds: float = PLAN_CACHE_TTL_SECONDS, clock=time.monotonic):
+        self.exercise_library = exercise_library
+        self.maxsize = maxsize
+        self.ttl_seconds = ttl_seconds
+        self._clock = clock
+        self._entries: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, plan_goals: Dict) -> List[WorkoutSession]:
+        """Weekly plan for these goals, generated on a miss"""
+        try:
+            key = canonical_goals(plan_goals)
+            hash(key)
+        except TypeError:
+            # Odd value types from the chat model; plan them uncached
+            with self._lock:
+                self.misses += 1
+            return weekly_plan(plan_goals, self.exercise_library)
+
+        now = self._clock()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                expires_at, week = entry
+                if expires_at > now:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return copy_week(week)
+                del self._entries[key]
+                self.expirations += 1
+            self.misses += 1
+
+        week = weekly_plan(plan_goals, self.exercise_library)
+
+        with self._lock:
+            self._entries[key] = (now + self.ttl_seconds, copy_week(week))
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+        return week
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                'size': len(self._entries),
+                'maxsize': self.maxsize,
+                'ttl_seconds': self.ttl_seconds,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'expirations': self.expirations,
+            }
+
+@lru_cache(maxsize=None)
+def get_plan_cache() -> PlanCache:
+    """Shared plan cache over the shared exercise library"""
+    return PlanCache(get_exercise_library())
+
+# --- SERIALIZATION ---
+
+# Same settings as Starlette's JSONResponse so output is byte-identical
+JSON_ENCODER = json.JSONEncoder(ensure_ascii=False, allow_nan=False, separators=(",", ":"))
+
+def dumps_json(value) -> bytes:
+    if type(value) is int:
+        return b'%d' % value
+    return JSON_ENCODER.encode(value).encode("utf-8")
+
+@lru_cache(maxsize=256)
+def string_list_json(items: Tuple[str, ...]) -> bytes:
+    # Warmups and cooldowns repeat across every day of every plan
+    return dumps_json(items)
+
+def prescription_json(exercise: Prescription) -> bytes:
+    if exercise.overrides:
+        return dumps_json(exercise.to_dict())
+    return exercise.exercise.json_head + dumps_json(exercise.reps) + b'}'
+
+def circuit_json(circuit: Circuit) -> bytes:
+    return b''.join((
+        b'{"exercises":[',
+        b','.join([prescription_json(exercise) for exercise in circuit.exercises]),
+        b'],"rounds":', dumps_json(circuit.rounds),
+        b',"work_seconds":', dumps_json(circuit.work_seconds),
+        b',"rest_seconds":', dumps_json(circuit.rest_seconds),
+        b',"rest_between_rounds":', dumps_json(circuit.rest_between_rounds),
+        b'}',
+    ))
+
+def session_json(session: WorkoutSession) -> bytes:
+    """JSON bytes for session_to_dict(session), written without building it"""
+    cardio = session.cardio
+    return b''.join((
+        b'{"day":', dumps_json(session.day),
+        b',"circuits":[', b','.join([circuit_json(circuit) for circuit in session.circuits]),
+        b'],"cardio":',
+        b''.join((
+            b'{"type":', dumps_json(cardio.type),
+            b',"duration_minutes":', dumps_json(cardio.duration_minutes),
+            b',"details":', dumps_json(cardio.details), b'}',
+        )) if cardio else b'null',
+        b',"warmup":', string_list_json(tuple(session.warmup)),
+        b',"cooldown":', string_list_json(tuple(session.cooldown)),
+        b'}',
+    ))
+
+def week_json(week: List[WorkoutSession]) -> bytes:
+    """JSON array bytes for a weekly plan, same as [session_to_dict(day) ...]"""
+    return b'[' + b','.join([session_json(session) for session in week]) + b']'
+
+def circuit_to_dict(circuit: Circuit) -> Dict:
+    return {
+        'exercises': [exercise.to_dict() for exercise in circuit.exercises],
+        'rounds': circuit.rounds,
+        'work_seconds': circuit.work_seconds,
+        'rest_seconds': circuit.rest_seconds,
+        'rest_between_rounds': circuit.rest_between_rounds,
+    }
+
+def session_to_dict(session: WorkoutSession) -> Dict:
+    """JSON-ready dict for a session, same shape asdict() produced before
+    circuits held Prescriptions"""
+    return {
+        'day': session.day,
+        'circuits': [circuit_to_dict(circuit) for circuit in session.circuits],
+        'cardio': asdict(session.cardio) if session.cardio else None,
+        'warmup': list(session.warmup),
+        'cooldown': list(session.cooldown),
+    }
+
+# --- EXPORT ---
+
+EXPORT_FORMATS = ('text', 'markdown', 'csv')
+CSV_COLUMNS = ['day', 'section', 'position', 'item', 'reps', 'equipment', 'details']
+
+def exercise_reps(exercise: Dict, strength_focus: str) -> str:
+    """Prescribed reps, or the focus' default range when none were set"""
+    if exercise.get('reps'):
+        return str(exercise['reps'])
+    rep_range = get_rep_range(strength_focus, exercise.get('difficulty', 1))
+    return f"{rep_range[0]}-{rep_range[1]}"
+
+def equipment_label(exercise: Dict) -> str:
+    return ', '.join(exercise.get('equipment') or []) or 'Bodyweight'
+
+def text_card(day: Dict, strength_focus: str = 'hypertrophy') -> str:
+    """Printable card for one day in session_to_dict form"""
 
     output = []
-    output.append(f"\\n{'='*60}")
-    output.append(f"DAY {workout.day} WORKOUT")
-    output.append(f"{'='*60}\\n")
+    output.append(f"\n{'='*60}")
+    output.append(f"DAY {day.get('day')} WORKOUT")
+    output.append(f"{'='*60}\n")
 
     # Warmup
-    if workout.warmup:
+    if day.get('warmup'):
         output.append("WARMUP:")
-        for item in workout.warmup:
+        for item in day['warmup']:
             output.append(f"  • {item}")
         output.append("")
 
     # Circuits
-    for i, circuit in enumerate(workout.circuits, 1):
-        output.append(f"CIRCUIT {i} - {circuit.rounds} rounds")
-        output.append(f"Work: {circuit.work_seconds}s | Rest: {circuit.rest_seconds}s | Round Rest: {circuit.rest_between_rounds}s")
+    for i, circuit in enumerate(day.get('circuits') or [], 1):
+        output.append(f"CIRCUIT {i} - {circuit.get('rounds')} rounds")
+        output.append(f"Work: {circuit.get('work_seconds')}s | Rest: {circuit.get('rest_seconds')}s | Round Rest: {circuit.get('rest_between_rounds')}s")
         output.append("")
 
-        for j, exercise in enumerate(circuit.exercises, 1):
-            # Use pre-calculated reps if available, otherwise calculate
-            if exercise.reps:
-                reps_str = exercise.reps
-            else:
-                rep_range = get_rep_range(strength_focus, exercise.difficulty)
-                reps_str = f"{rep_range[0]}-{rep_range[1]}"
-            
-            output.append(f"  {j}. {exercise.name}")
-            output.append(f"     Reps: {reps_str} | Equipment: {', '.join(exercise.equipment) if exercise.equipment else 'Bodyweight'}")
-            if exercise.instructions:
-                output.append(f"     → {exercise.instructions}")
+        for j, exercise in enumerate(circuit.get('exercises') or [], 1):
+            output.append(f"  {j}. {exercise.get('name')}")
+            output.append(f"     Reps: {exercise_reps(exercise, strength_focus)} | Equipment: {equipment_label(exercise)}")
+            if exercise.get('instructions'):
+                output.append(f"     → {exercise['instructions']}")
         output.append("")
 
     # Cardio
-    if workout.cardio:
-        output.append(f"CARDIO: {workout.cardio.type}")
-        output.append(f"Duration: {workout.cardio.duration_minutes} minutes")
-        if workout.cardio.details:
-            for key, value in workout.cardio.details.items():
-                if key != 'instructions':
-                    output.append(f"  • {key}: {value}")
-            if 'instructions' in workout.cardio.details:
-                output.append(f"  → {workout.cardio.details['instructions']}")
+    cardio = day.get('cardio')
+    if cardio:
+        details = cardio.get('details') or {}
+        output.append(f"CARDIO: {cardio.get('type')}")
+        output.append(f"Duration: {cardio.get('duration_minutes')} minutes")
+        for key, value in details.items():
+            if key != 'instructions':
+                output.append(f"  • {key}: {value}")
+        if 'instructions' in details:
+            output.append(f"  → {details['instructions']}")
         output.append("")
 
     # Cooldown
-    if workout.cooldown:
+    if day.get('cooldown'):
         output.append("COOLDOWN:")
-        for item in workout.cooldown:
+        for item in day['cooldown']:
             output.append(f"  • {item}")
         output.append("")
 
@@ -965,17 +2343,116 @@ def format_workout_card(workout: WorkoutSession, strength_focus: str = 'hypertro
     output.append(f"INTENSITY: {get_intensity_recommendation(strength_focus)}")
     output.append("")
 
-    return "\\n".join(output)
+    return "\n".join(output)
 
-def export_program_to_text(week_plan: List[WorkoutSession], strength_focus: str = 'hypertrophy') -> str:
-    """Export full week program to text"""
+def markdown_cell(value) -> str:
+    return str(value).replace('|', '\\|')
 
-    output = []
-    output.append("\\n" + "="*60)
-    output.append("WEEKLY WORKOUT PROGRAM")
-    output.append("="*60 + "\\n")
+def markdown_card(day: Dict, strength_focus: str = 'hypertrophy') -> str:
+    """Markdown section for one day in session_to_dict form"""
+
+    output = [f"## Day {day.get('day')}", ""]
+
+    if day.get('warmup'):
+        output.append("### Warmup")
+        output.extend(f"- {item}" for item in day['warmup'])
+        output.append("")
+
+    for i, circuit in enumerate(day.get('circuits') or [], 1):
+        output.append(f"### Circuit {i} - {circuit.get('rounds')} rounds")
+        output.append(f"Work: {circuit.get('work_seconds')}s | Rest: {circuit.get('rest_seconds')}s | Round Rest: {circuit.get('rest_between_rounds')}s")
+        output.append("")
+        output.append("| # | Exercise | Reps | Equipment | Notes |")
+        output.append("|---|---|---|---|---|")
+        for j, exercise in enumerate(circuit.get('exercises') or [], 1):
+            cells = [j, exercise.get('name'), exercise_reps(exercise, strength_focus),
+                     equipment_label(exercise), exercise.get('instructions') or '']
+            output.append("| " + " | ".join(markdown_cell(cell) for cell in cells) + " |")
+        output.append("")
+
+    cardio = day.get('cardio')
+    if cardio:
+        details = cardio.get('details') or {}
+        output.append(f"### Cardio: {cardio.get('type')}")
+        output.append(f"Duration: {cardio.get('duration_minutes')} minutes")
+        output.append("")
+        output.extend(f"- **{key}**: {value}" for key, value in details.items() if key != 'instructions')
+        if 'instructions' in details:
+            output.append(f"\n> {details['instructions']}")
+        output.append("")
+
+    if day.get('cooldown'):
+        output.append("### Cooldown")
+        output.extend(f"- {item}" for item in day['cooldown'])
+        output.append("")
+
+    output.append(f"**Intensity:** {get_intensity_recommendation(strength_focus)}")
+    output.append("")
+    return "\n".join(output) + "\n"
+
+def csv_rows(day: Dict, strength_focus: str = 'hypertrophy') -> Iterator[List]:
+    """CSV_COLUMNS rows for one day in session_to_dict form"""
+    number = day.get('day')
+    for i, item in enumerate(day.get('warmup') or [], 1):
+        yield [number, 'warmup', i, item, '', '', '']
+    for i, circuit in enumerate(day.get('circuits') or [], 1):
+        timing = (f"{circuit.get('rounds')} rounds; work {circuit.get('work_seconds')}s; "
+                  f"rest {circuit.get('rest_seconds')}s; round rest {circuit.get('rest_between_rounds')}s")
+        for j, exercise in enumerate(circuit.get('exercises') or [], 1):
+            yield [number, f'circuit {i}', j, exercise.get('name'), exercise_reps(exercise, strength_focus),
+                   equipment_label(exercise), timing]
+    cardio = day.get('cardio')
+    if cardio:
+        details = cardio.get('details') or {}
+        yield [number, 'cardio', 1, cardio.get('type'), '', '',
+               f"{cardio.get('duration_minutes')} minutes; " + "; ".join(f"{k}: {v}" for k, v in details.items())]
+    for i, item in enumerate(day.get('cooldown') or [], 1):
+        yield [number, 'cooldown', i, item, '', '', '']
+
+def iter_text_export(days: Iterable[Dict], strength_focus: str) -> Iterator[str]:
+    yield "\n".join(["\n" + "="*60, "WEEKLY WORKOUT PROGRAM", "="*60 + "\n"])
+    for day in days:
+        yield "\n" + text_card(day, strength_focus)
+
+def iter_markdown_export(days: Iterable[Dict], strength_focus: str) -> Iterator[str]:
+    yield "# Workout Program\n\n"
+    for day in days:
+        yield markdown_card(day, strength_focus) + "\n"
+
+def iter_csv_export(days: Iterable[Dict], strength_focus: str) -> Iterator[str]:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(CSV_COLUMNS)
+    for day in days:
+        writer.writerows(csv_rows(day, strength_focus))
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue()
+
+EXPORTERS = {
+    'text': iter_text_export,
+    'markdown': iter_markdown_export,
+    'csv': iter_csv_export,
+}
 
-    for workout in week_plan:
-        output.append(format_workout_card(workout, strength_focus))
+def iter_program_export(days: Iterable[Dict], fmt: str = 'text',
+                        strength_focus: str = 'hypertrophy') -> Iterator[str]:
+    """Export a program lazily, one chunk per day card.
 
-    return "\\n".join(output)
+    `days` are in session_to_dict form and may themselves be a generator,
+    so a long program never has to be held as one string.
+    """
+    if fmt not in EXPORTERS:
+        raise ValueError(f"Unknown export format: {fmt}")
+    return EXPORTERS[fmt](days, strength_focus)
+
+def format_workout_card(workout: WorkoutSession, strength_focus: str = 'hypertrophy') -> str:
+    """Format workout as printable card"""
+    return text_card(session_to_dict(workout), strength_focus)
+
+def export_program_to_text(week_plan: List[WorkoutSession], strength_focus: str = 'hypertrophy') -> str:
+    """Export full week program to text"""
+    days = (session_to_dict(workout) for workout in week_plan)
+    return "".join(iter_program_export(days, 'text', strength_focus))
@@ -1,17 +1,41 @@
 import os
 import json
 import google.generativeai as genai
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, Header, HTTPException, Response
+from fastapi.responses import StreamingResponse
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
 from typing import Optional, Dict, Any, List
-from dataclasses import asdict
 from engine import (
-    create_exercise_library, 
-    weekly_plan, 
-    export_program_to_text
+    get_exercise_library, 
+    get_plan_cache,
+    plan_week,
+    replan_after,
+    prescribe_loads,
+    session_exercises,
+    Roster,
+    FitnessRoster,
+    pace_cardio,
+    CARDIO_EFFORT,
+    schedule_rotation,
+    schedule_shared_equipment,
+    weekly_plan_batch,
+    export_program_to_text,
+    iter_program_export,
+    EXPORT_FORMATS,
+    dumps_json,
+    week_json,
+    check_plan_goals
+)
+from plan_table import get_plan_table
+from database import (
+    init_db, close_connection_pool, shutdown_executors, run_read, run_write, iter_read,
+    save_program_to_db, save_programs_bulk, get_active_program_cache,
+    delete_workout, get_program, iter_program_days, get_program_workouts, write_circuit_components,
+    get_workout_day, save_roster, get_roster, get_roster_fitness, list_programs, PROGRAMS_PAGE_LIMIT,
+    exercise_usage
 )
-from database import init_db, save_program_to_db, get_latest_program, delete_workout
 
 # Configure the Gemini API
 # Make sure to set the GEMINI_API_KEY environment variable
@@ -27,6 +51,13 @@ app = FastAPI()
 @app.on_event("startup")
 async def startup_event():
     init_db()
+    get_exercise_library()
+    get_plan_table()
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    shutdown_executors()
+    close_connection_pool()
 
 app.add_middleware(
     CORSMiddleware,
@@ -48,23 +79,94 @@ class SavePlanRequest(BaseModel):
 @app.post("/save-plan")
 async def save_plan(request: SavePlanRequest):
     try:
-        program_id = save_program_to_db(request.program_name, request.description, request.plan_data)
+        program_id = await run_write(
+            save_program_to_db, request.program_name, request.description, request.plan_data
+        )
         return {"status": "success", "program_id": program_id}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+class BulkSavePlansRequest(BaseModel):
+    programs: List[SavePlanRequest]
+
+@app.post("/save-plans/bulk")
+async def save_plans_bulk(request: BulkSavePlansRequest):
+    # One transaction for the whole batch, e.g. the nightly save for every squad
+    try:
+        program_ids = await run_write(
+            save_programs_bulk,
+            [(program.program_name, program.description, program.plan_data) for program in request.programs]
+        )
+        return {"status": "success", "program_ids": program_ids}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    # If-None-Match may list several tags and uses weak comparison
+    if not if_none_match:
+        return False
+    tags = [tag.strip() for tag in if_none_match.split(",")]
+    return "*" in tags or etag in [tag[2:] if tag.startswith("W/") else tag for tag in tags]
+
 @app.get("/active-program")
-async def get_active_program():
+async def get_active_program(if_none_match: Optional[str] = Header(None)):
+    # Dashboard poll: served from memory until a program changes, 304 when the client is current
+    try:
+        cache = get_active_program_cache()
+        etag, body = cache.cached() or await run_read(cache.get)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
+
+@app.get("/active-program/stats")
+async def active_program_stats():
+    return get_active_program_cache().stats()
+
+def parse_program_cursor(after: str):
+    # "<created_at>,<id>" as returned in `next`; created_at itself has no commas
+    created_at, sep, program_id = after.rpartition(",")
+    if not sep or not created_at:
+        raise ValueError(after)
+    return created_at, int(program_id)
+
+@app.get("/programs")
+async def list_programs_endpoint(after: Optional[str] = None, limit: int = 20, include_workouts: bool = False):
+    # Program history, newest first; pass `next` back as `after` for the following page
+    try:
+        cursor = parse_program_cursor(after) if after else None
+    except ValueError:
+        raise HTTPException(status_code=400, detail="after must be '<created_at>,<id>' from a previous page")
+    if not 1 <= limit <= PROGRAMS_PAGE_LIMIT:
+        raise HTTPException(status_code=400, detail=f"limit must be between 1 and {PROGRAMS_PAGE_LIMIT}")
+    try:
+        programs, next_after = await run_read(list_programs, cursor, limit, include_workouts)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    return {"programs": programs, "next": f"{next_after[0]},{next_after[1]}" if next_after else None}
+
+@app.get("/exercise-usage")
+async def exercise_usage_endpoint(exercise: Optional[str] = None, equipment: Optional[str] = None,
+                                  category: Optional[str] = None, since: Optional[str] = None):
+    # e.g. ?exercise=Barbell Deadlift, or ?equipment=rack&since=2026-10-12 for this week's rack circuits
     try:
-        program = get_latest_program()
-        return program
+        programs = await run_read(exercise_usage, exercise, equipment, category, since)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+    return {
+        "circuits": sum(program["circuits"] for program in programs),
+        "workouts": sum(program["workouts"] for program in programs),
+        "programs": programs,
+    }
 
 @app.delete("/workout/{workout_id}")
 async def delete_workout_endpoint(workout_id: int):
     try:
-        delete_workout(workout_id)
+        await run_write(delete_workout, workout_id)
         return {"status": "success"}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -76,7 +178,7 @@ class UpdateWorkoutRequest(BaseModel):
 async def update_workout_endpoint(workout_id: int, request: UpdateWorkoutRequest):
     try:
         from database import update_workout_components
-        update_workout_components(workout_id, request.components)
+        await run_write(update_workout_components, workout_id, request.components)
         return {"status": "success"}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -85,11 +187,233 @@ async def update_workout_endpoint(workout_id: int, request: UpdateWorkoutRequest
 async def delete_program_endpoint(program_id: int):
     try:
         from database import delete_program
-        delete_program(program_id)
+        await run_write(delete_program, program_id)
         return {"status": "success"}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+class SoldierRecord(BaseModel):
+    name: str
+    bodyweight_kg: Optional[float] = None
+    one_rep_max_kg: Dict[str, float] = {}
+    age: Optional[float] = None
+    resting_hr: Optional[float] = None
+    two_mile_seconds: Optional[float] = None
+
+class RosterRequest(BaseModel):
+    soldiers: List[SoldierRecord]
+
+@app.post("/roster/{roster}")
+async def save_roster_endpoint(roster: str, request: RosterRequest):
+    try:
+        soldier_ids = await run_write(save_roster, roster, [soldier.model_dump() for soldier in request.soldiers])
+        return {"status": "success", "soldier_ids": soldier_ids}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.get("/workout/{workout_id}/prescriptions")
+async def workout_prescriptions(workout_id: int, roster: str = "default", strength_focus: str = "hypertrophy"):
+    # Per-soldier working weights for every exercise in the workout, one column per exercise
+    try:
+        day = await run_read(get_workout_day, workout_id)
+        if day is None:
+            raise HTTPException(status_code=404, detail="Workout not found")
+        roster_rows = await run_read(get_roster, roster)
+        loads = await run_in_threadpool(
+            prescribe_loads, session_exercises(day), Roster.from_rows(*roster_rows), strength_focus
+        )
+        body = dumps_json({"workout_id": workout_id, "day": day['day'], "roster": roster, **loads.to_dict()})
+        return Response(content=body, media_type="application/json")
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.get("/workout/{workout_id}/cardio-pacing")
+async def workout_cardio_pacing(workout_id: int, roster: str = "default"):
+    # Run card for the workout's cardio session: HR zones, paces and splits per soldier
+    try:
+        day = await run_read(get_workout_day, workout_id)
+        if day is None:
+            raise HTTPException(status_code=404, detail="Workout not found")
+        cardio = day.get('cardio')
+        if not cardio or cardio.get('type') not in CARDIO_EFFORT:
+            raise HTTPException(status_code=404, detail="Workout has no cardio session")
+        fitness = FitnessRoster.from_rows(await run_read(get_roster_fitness, roster))
+        pacing = await run_in_threadpool(
+            pace_cardio, cardio['type'], cardio.get('duration_minutes', 0), cardio.get('details') or {}, fitness
+        )
+        body = dumps_json({"workout_id": workout_id, "day": day['day'], "roster": roster, **pacing.to_dict()})
+        return Response(content=body, media_type="application/json")
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+class ReplanRequest(BaseModel):
+    goals: Dict[str, Any]
+    after_day: int
+
+@app.post("/program/{program_id}/replan")
+async def replan_program(program_id: int, request: ReplanRequest):
+    # Call after editing or deleting day `after_day`; only later days are re-selected
+    try:
+        workouts = await run_read(get_program_workouts, program_id)
+        if not workouts:
+            raise HTTPException(status_code=404, detail="Program not found")
+        replanned = await run_in_threadpool(replan_after, [day for _, day in workouts], request.after_day,
+                                            request.goals, get_exercise_library())
+        changes = {workout_id: replanned[day['day']] for workout_id, day in workouts if day['day'] in replanned}
+        rows_written = await run_write(write_circuit_components, changes)
+        return {"status": "success", "replanned_days": sorted(replanned), "rows_written": rows_written}
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+class RotationRequest(BaseModel):
+    exercises: List[Dict[str, Any]]
+    num_soldiers: int
+    equipment_counts: Dict[str, int]
+    work_seconds: int = 45
+    rest_seconds: int = 15
+    rounds: int = 3
+    rest_between_rounds: int = 60
+
+@app.post("/circuits/rotation")
+async def circuit_rotation(request: RotationRequest):
+    # Wave/rotation plan for one circuit when a formation outnumbers its stations
+    try:
+        plan = await run_in_threadpool(
+            schedule_rotation, request.exercises, request.num_soldiers, request.equipment_counts,
+            request.work_seconds, request.rest_seconds, request.rounds, request.rest_between_rounds
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    return Response(content=dumps_json(plan.to_dict()), media_type="application/json")
+
+class SquadSession(BaseModel):
+    goals: Dict[str, Any]
+    day: int = 1
+
+class GymScheduleRequest(BaseModel):
+    squads: List[SquadSession]
+    equipment_counts: Dict[str, int]
+
+def squad_bookings(squads: List[SquadSession], equipment_counts: Dict[str, int]):
+    # Each squad's session from the plan cache (a miss plans the whole week), then the shared schedule
+    cache = get_plan_cache()
+    sessions = []
+    for squad in squads:
+        week_plan = cache.get(squad.goals)
+        if not 1 <= squad.day <= len(week_plan):
+            raise ValueError(f"day must be between 1 and {len(week_plan)}")
+        sessions.append(week_plan[squad.day - 1])
+    return schedule_shared_equipment(
+        sessions, equipment_counts, get_exercise_library(),
+        [squad.goals.get('equipment', ['all']) for squad in squads]
+    )
+
+@app.post("/gym/schedule")
+async def gym_schedule(request: GymScheduleRequest):
+    # Several squads' sessions for the same day, fitted into one shared gym
+    try:
+        bookings = await run_in_threadpool(squad_bookings, request.squads, request.equipment_counts)
+        body = dumps_json({"squads": [booking.to_dict() for booking in bookings]})
+        return Response(content=body, media_type="application/json")
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+EXPORT_MEDIA_TYPES = {
+    "text": ("text/plain; charset=utf-8", "txt"),
+    "markdown": ("text/markdown; charset=utf-8", "md"),
+    "csv": ("text/csv; charset=utf-8", "csv"),
+}
+
+@app.get("/program/{program_id}/export")
+async def export_program(program_id: int, format: str = "text", strength_focus: str = "hypertrophy"):
+    # Streams one chunk per day card so long programs are never built as one string
+    if format not in EXPORT_FORMATS:
+        raise HTTPException(status_code=400, detail=f"format must be one of: {', '.join(EXPORT_FORMATS)}")
+    try:
+        program = await run_read(get_program, program_id)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    if not program:
+        raise HTTPException(status_code=404, detail="Program not found")
+
+    media_type, extension = EXPORT_MEDIA_TYPES[format]
+    chunks = iter_program_export(iter_program_days(program_id), format, strength_focus)
+    return StreamingResponse(
+        iter_read(chunks),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="program-{program_id}.{extension}"'},
+    )
+
+PLANS_BATCH_LIMIT = 1000
+
+
+def plans_json(goals: List[Dict[str, Any]]) -> List[bytes]:
+    # plan_data JSON per goal object: from the plan table, else generated in one batch
+    table = get_plan_table()
+    encoded = [None] * len(goals)
+    misses = []
+    for i, plan_goals in enumerate(goals):
+        hit = table.get(plan_goals)
+        if hit:
+            encoded[i] = hit[0]
+        else:
+            misses.append(i)
+    if misses:
+        plans = weekly_plan_batch([goals[i] for i in misses], get_exercise_library())
+        for i, plan in zip(misses, plans):
+            encoded[i] = week_json(plan)
+    return encoded
+
+@app.post("/plans/batch")
+async def plans_batch(goals: List[Dict[str, Any]]):
+    # Each goal object has the same keys /chat extracts from the conversation
+    if len(goals) > PLANS_BATCH_LIMIT:
+        raise HTTPException(status_code=400, detail=f"at most {PLANS_BATCH_LIMIT} goal objects per batch")
+    for i, plan_goals in enumerate(goals):
+        try:
+            check_plan_goals(plan_goals)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=f"goals[{i}]: {e}")
+    try:
+        encoded = await run_in_threadpool(plans_json, goals)
+        body = b'{"plans":[' + b','.join(encoded) + b']}'
+        return Response(content=body, media_type="application/json")
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+MAX_DEADLINE_MS = 2000
+
+@app.post("/plans/optimize")
+async def plans_optimize(goals: Dict[str, Any], deadline_ms: float = 50):
+    # Greedy plan improved by local search until deadline_ms after it starts.
+    # The search is CPU-bound for up to the whole deadline, so it runs off the event loop
+    if not 0 <= deadline_ms <= MAX_DEADLINE_MS:
+        raise HTTPException(status_code=400, detail=f"deadline_ms must be between 0 and {MAX_DEADLINE_MS}")
+    try:
+        week_plan, report = await run_in_threadpool(plan_week, goals, get_exercise_library(), deadline_ms)
+        body = dumps_json({"optimizer": report or {}})[:-1] + b',"plan_data":' + week_json(week_plan) + b'}'
+        return Response(content=body, media_type="application/json")
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.get("/plan-cache/stats")
+async def plan_cache_stats():
+    return get_plan_cache().stats()
+
+@app.get("/plan-table/stats")
+async def plan_table_stats():
+    return get_plan_table().stats()
+
 class ChatResponse(BaseModel):
     message: str
     state: Dict[str, Any]
@@ -135,6 +459,15 @@ Now, generate the updated JSON plan.
         raise HTTPException(status_code=500, detail=f"Error calling Gemini API: {e}")
 
 
+def chat_plan(plan_goals: Dict[str, Any]):
+    # (plan_data JSON, plan text) for /chat; common goals are precomputed
+    table_hit = get_plan_table().get(plan_goals)
+    if table_hit:
+        return table_hit
+    week_plan = get_plan_cache().get(plan_goals)
+    program_text = export_program_to_text(week_plan, plan_goals.get('strength_focus', 'hypertrophy'))
+    return week_json(week_plan), program_text
+
 @app.post("/chat", response_model=ChatResponse)
 async def chat(request: ChatRequest):
     # This is a simplified chat flow now, mainly for the initial plan generation.
@@ -188,21 +521,20 @@ Do not ask for information you already have. Here is the conversation history:
         plan_data_json = json.loads(cleaned_response)
 
         # If we get here, we have the plan data
-        exercise_lib = create_exercise_library()
-        week_plan = weekly_plan(plan_data_json, exercise_lib)
-        program_text = export_program_to_text(week_plan, plan_data_json.get('strength_focus', 'hypertrophy'))
-        plan_data = [asdict(day) for day in week_plan]
+        plan_json, program_text = await run_in_threadpool(chat_plan, plan_data_json)
 
         final_message = "I've generated a custom workout plan for your squad based on your requirements."
         history.append({"role": "model", "parts": [final_message]})
 
-        return ChatResponse(
-            message=final_message,
-            state={"history": history},
-            is_complete=True,
-            plan=program_text,
-            plan_data=plan_data
-        )
+        # Same fields as ChatResponse, with plan_data spliced in as pre-encoded bytes
+        head = dumps_json({
+            "message": final_message,
+            "state": {"history": history},
+            "is_complete": True,
+            "plan": program_text,
+        })
+        body = head[:-1] + b',"plan_data":' + plan_json + b'}'
+        return Response(content=body, media_type="application/json")
 
     except (json.JSONDecodeError, KeyError):
         # The response is another question, so we continue the conversation
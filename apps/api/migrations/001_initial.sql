@@ -24,3 +24,29 @@ CREATE TABLE IF NOT EXISTS workout_components (
     data TEXT, -- JSON blob for flexibility (warmup list, circuit details, cardio stats)
     FOREIGN KEY (workout_id) REFERENCES workouts(id)
 );
+
+CREATE TABLE IF NOT EXISTS soldiers (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    roster TEXT NOT NULL DEFAULT 'default',
+    name TEXT NOT NULL,
+    bodyweight_kg REAL,
+    UNIQUE (roster, name)
+);
+
+CREATE TABLE IF NOT EXISTS soldier_maxes (
+    soldier_id INTEGER NOT NULL,
+    lift TEXT NOT NULL, -- exercise name, or a short alias such as 'bench'
+    one_rep_max_kg REAL NOT NULL,
+    recorded_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (soldier_id, lift),
+    FOREIGN KEY (soldier_id) REFERENCES soldiers(id)
+);
+
+CREATE TABLE IF NOT EXISTS soldier_fitness (
+    soldier_id INTEGER PRIMARY KEY,
+    age REAL,
+    resting_hr REAL,
+    two_mile_seconds REAL,
+    recorded_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    FOREIGN KEY (soldier_id) REFERENCES soldiers(id)
+);
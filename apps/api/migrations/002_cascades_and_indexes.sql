@@ -0,0 +1,72 @@
+-- Cascading deletes and indexes for the lookups every request makes.
+-- SQLite can't add an action to an existing foreign key, so child tables
+-- are rebuilt. Rows whose parent is already gone are dropped, and each
+-- AUTOINCREMENT counter carries over so deleted ids are never reused.
+
+CREATE TABLE workouts_new (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    program_id INTEGER,
+    day_number INTEGER,
+    name TEXT,
+    focus TEXT,
+    FOREIGN KEY (program_id) REFERENCES training_programs(id) ON DELETE CASCADE
+);
+INSERT INTO workouts_new (id, program_id, day_number, name, focus)
+    SELECT id, program_id, day_number, name, focus FROM workouts
+    WHERE program_id IS NULL OR program_id IN (SELECT id FROM training_programs);
+DELETE FROM sqlite_sequence WHERE name = 'workouts_new';
+INSERT INTO sqlite_sequence (name, seq) SELECT 'workouts_new', seq FROM sqlite_sequence WHERE name = 'workouts';
+DROP TABLE workouts;
+ALTER TABLE workouts_new RENAME TO workouts;
+
+CREATE TABLE workout_components_new (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    workout_id INTEGER,
+    component_type TEXT, -- 'warmup', 'circuit', 'cardio'
+    order_index INTEGER,
+    data TEXT, -- JSON blob for flexibility (warmup list, circuit details, cardio stats)
+    FOREIGN KEY (workout_id) REFERENCES workouts(id) ON DELETE CASCADE
+);
+INSERT INTO workout_components_new (id, workout_id, component_type, order_index, data)
+    SELECT id, workout_id, component_type, order_index, data FROM workout_components
+    WHERE workout_id IS NULL OR workout_id IN (SELECT id FROM workouts);
+DELETE FROM sqlite_sequence WHERE name = 'workout_components_new';
+INSERT INTO sqlite_sequence (name, seq)
+    SELECT 'workout_components_new', seq FROM sqlite_sequence WHERE name = 'workout_components';
+DROP TABLE workout_components;
+ALTER TABLE workout_components_new RENAME TO workout_components;
+
+CREATE TABLE soldier_maxes_new (
+    soldier_id INTEGER NOT NULL,
+    lift TEXT NOT NULL, -- exercise name, or a short alias such as 'bench'
+    one_rep_max_kg REAL NOT NULL,
+    recorded_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (soldier_id, lift),
+    FOREIGN KEY (soldier_id) REFERENCES soldiers(id) ON DELETE CASCADE
+);
+INSERT INTO soldier_maxes_new SELECT * FROM soldier_maxes WHERE soldier_id IN (SELECT id FROM soldiers);
+DROP TABLE soldier_maxes;
+ALTER TABLE soldier_maxes_new RENAME TO soldier_maxes;
+
+CREATE TABLE soldier_fitness_new (
+    soldier_id INTEGER PRIMARY KEY,
+    age REAL,
+    resting_hr REAL,
+    two_mile_seconds REAL,
+    recorded_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    FOREIGN KEY (soldier_id) REFERENCES soldiers(id) ON DELETE CASCADE
+);
+INSERT INTO soldier_fitness_new SELECT * FROM soldier_fitness WHERE soldier_id IN (SELECT id FROM soldiers);
+DROP TABLE soldier_fitness;
+ALTER TABLE soldier_fitness_new RENAME TO soldier_fitness;
+
+CREATE INDEX idx_training_programs_created_at ON training_programs (created_at);
+CREATE INDEX idx_workouts_program ON workouts (program_id, day_number);
+CREATE INDEX idx_workout_components_workout ON workout_components (workout_id, order_index);
+
+-- A program goes away with its last workout
+CREATE TRIGGER delete_empty_program AFTER DELETE ON workouts
+WHEN NOT EXISTS (SELECT 1 FROM workouts WHERE program_id = OLD.program_id)
+BEGIN
+    DELETE FROM training_programs WHERE id = OLD.program_id;
+END;
@@ -0,0 +1,5 @@
+-- Keyset pagination over program history orders by (created_at, id);
+-- the composite index also serves the latest-program lookup.
+
+CREATE INDEX idx_training_programs_created_id ON training_programs (created_at, id);
+DROP INDEX idx_training_programs_created_at;
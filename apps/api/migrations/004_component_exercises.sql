@@ -0,0 +1,53 @@
+-- Exercises inside stored circuits, one row per exercise and equipment
+-- item (equipment is NULL for bodyweight exercises), so usage questions
+-- are index lookups instead of parsing every component's JSON. Triggers
+-- keep it in step with workout_components on every write path, including
+-- cascading deletes.
+
+CREATE TABLE component_exercises (
+    component_id INTEGER NOT NULL,
+    workout_id INTEGER,
+    position INTEGER NOT NULL, -- index in the circuit's exercise list
+    exercise_name TEXT NOT NULL COLLATE NOCASE,
+    category TEXT COLLATE NOCASE,
+    equipment TEXT COLLATE NOCASE
+);
+
+CREATE INDEX idx_component_exercises_name ON component_exercises (exercise_name);
+CREATE INDEX idx_component_exercises_equipment ON component_exercises (equipment);
+CREATE INDEX idx_component_exercises_category ON component_exercises (category);
+CREATE INDEX idx_component_exercises_component ON component_exercises (component_id);
+
+CREATE TRIGGER component_exercises_insert AFTER INSERT ON workout_components
+WHEN NEW.component_type = 'circuit' AND json_valid(NEW.data)
+BEGIN
+    INSERT INTO component_exercises (component_id, workout_id, position, exercise_name, category, equipment)
+    SELECT NEW.id, NEW.workout_id, e.key, json_extract(e.value, '$.name'),
+           json_extract(e.value, '$.category'), q.value
+    FROM json_each(NEW.data, '$.exercises') e
+    LEFT JOIN json_each(json_extract(e.value, '$.equipment')) q
+    WHERE json_extract(e.value, '$.name') IS NOT NULL;
+END;
+
+CREATE TRIGGER component_exercises_update AFTER UPDATE OF workout_id, component_type, data ON workout_components
+BEGIN
+    DELETE FROM component_exercises WHERE component_id = OLD.id;
+    INSERT INTO component_exercises (component_id, workout_id, position, exercise_name, category, equipment)
+    SELECT NEW.id, NEW.workout_id, e.key, json_extract(e.value, '$.name'),
+           json_extract(e.value, '$.category'), q.value
+    FROM json_each(CASE WHEN NEW.component_type = 'circuit' AND json_valid(NEW.data) THEN NEW.data END, '$.exercises') e
+    LEFT JOIN json_each(json_extract(e.value, '$.equipment')) q
+    WHERE json_extract(e.value, '$.name') IS NOT NULL;
+END;
+
+CREATE TRIGGER component_exercises_delete AFTER DELETE ON workout_components
+BEGIN
+    DELETE FROM component_exercises WHERE component_id = OLD.id;
+END;
+
+INSERT INTO component_exercises (component_id, workout_id, position, exercise_name, category, equipment)
+SELECT c.id, c.workout_id, e.key, json_extract(e.value, '$.name'), json_extract(e.value, '$.category'), q.value
+FROM workout_components c
+JOIN json_each(CASE WHEN c.component_type = 'circuit' AND json_valid(c.data) THEN c.data END, '$.exercises') e
+LEFT JOIN json_each(json_extract(e.value, '$.equipment')) q
+WHERE json_extract(e.value, '$.name') IS NOT NULL;
@@ -0,0 +1,85 @@
+"""Store each distinct component payload once.
+
+Most of a program's components are the same warmup, cooldown, cardio
+block or circuit that thousands of other days also carry. Payloads move
+into component_blobs keyed by a 16-byte blake2b of their canonical JSON
+(the blob keeps the text as it was written), and workout_components
+points at them through blob_hash. Rows whose data is not valid JSON keep
+it in `data` and have no blob.
+
+Deleting the last component that references a blob releases it by
+trigger. Rows that are repointed release their old blobs through
+database.release_blobs once the whole write is done: a per-row trigger
+would drop a blob that a later row in the same write is about to reuse.
+The component_exercises triggers read the payload through the blob.
+"""
+import json
+
+from database import blob_hash, canonical_json, sql_statements
+
+PAYLOAD = "COALESCE((SELECT data FROM component_blobs WHERE hash = NEW.blob_hash), NEW.data)"
+
+SCHEMA = """
+CREATE TABLE component_blobs (
+    hash BLOB PRIMARY KEY,
+    data TEXT NOT NULL
+) WITHOUT ROWID;
+
+ALTER TABLE workout_components ADD COLUMN blob_hash BLOB REFERENCES component_blobs(hash);
+CREATE INDEX idx_workout_components_blob ON workout_components (blob_hash);
+
+DROP TRIGGER component_exercises_insert;
+DROP TRIGGER component_exercises_update;
+"""
+
+# Created after the backfill: moving a payload into its blob doesn't change
+# the exercises it holds, so the index rows stay as they are
+TRIGGERS = f"""
+CREATE TRIGGER component_exercises_insert AFTER INSERT ON workout_components
+WHEN NEW.component_type = 'circuit'
+BEGIN
+    INSERT INTO component_exercises (component_id, workout_id, position, exercise_name, category, equipment)
+    SELECT NEW.id, NEW.workout_id, e.key, json_extract(e.value, '$.name'),
+           json_extract(e.value, '$.category'), q.value
+    FROM json_each(CASE WHEN json_valid({PAYLOAD}) THEN {PAYLOAD} END, '$.exercises') e
+    LEFT JOIN json_each(json_extract(e.value, '$.equipment')) q
+    WHERE json_extract(e.value, '$.name') IS NOT NULL;
+END;
+
+CREATE TRIGGER component_exercises_update AFTER UPDATE OF workout_id, component_type, data, blob_hash ON workout_components
+BEGIN
+    DELETE FROM component_exercises WHERE component_id = OLD.id;
+    INSERT INTO component_exercises (component_id, workout_id, position, exercise_name, category, equipment)
+    SELECT NEW.id, NEW.workout_id, e.key, json_extract(e.value, '$.name'),
+           json_extract(e.value, '$.category'), q.value
+    FROM json_each(CASE WHEN NEW.component_type = 'circuit' AND json_valid({PAYLOAD}) THEN {PAYLOAD} END, '$.exercises') e
+    LEFT JOIN json_each(json_extract(e.value, '$.equipment')) q
+    WHERE json_extract(e.value, '$.name') IS NOT NULL;
+END;
+
+CREATE TRIGGER component_blobs_release_delete AFTER DELETE ON workout_components
+WHEN OLD.blob_hash IS NOT NULL
+BEGIN
+    DELETE FROM component_blobs WHERE hash = OLD.blob_hash
+        AND NOT EXISTS (SELECT 1 FROM workout_components WHERE blob_hash = OLD.blob_hash);
+END;
+"""
+
+def upgrade(conn):
+    for statement in sql_statements(SCHEMA):
+        conn.execute(statement)
+
+    blobs, moved = {}, []
+    for component_id, data in conn.execute("SELECT id, data FROM workout_components WHERE data IS NOT NULL"):
+        try:
+            key = blob_hash(canonical_json(json.loads(data)))
+        except (TypeError, ValueError):
+            continue
+        blobs.setdefault(key, data)
+        moved.append((key, component_id))
+
+    conn.executemany("INSERT INTO component_blobs (hash, data) VALUES (?, ?)", blobs.items())
+    conn.executemany("UPDATE workout_components SET blob_hash = ?, data = NULL WHERE id = ?", moved)
+
+    for statement in sql_statements(TRIGGERS):
+        conn.execute(statement)
@@ -0,0 +1,251 @@
+"""Precomputed plans for the common goal space.
+
+Almost every plan request falls in a small space: 3-5 days, strength or
+cardio, four strength focuses, zero to two muscle targets and one of the
+standard equipment kits. The build step generates all of those once and
+stores the response bytes in an indexed SQLite file keyed by a hash of
+canonical_goals, so serving a plan is one primary-key lookup.
+
+Plans are zlib-compressed against a shared dictionary taken from sample
+plans (most of every plan is the same warmup, cooldown and cardio text),
+which brings a plan from ~1.2 KB to ~160 bytes.
+
+The table records a fingerprint of the exercise library and of the
+rendered plans for a fixed set of probe goals. Any engine change that
+alters what a plan looks like changes the fingerprint, and a table built
+before it is ignored until rebuilt.
+
+Build from apps/api (rerun whenever the engine or exercise library changes):
+    python -m plan_table [--output plan_table.db]
+"""
+import argparse
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from functools import lru_cache
+from itertools import combinations, product
+from typing import Dict, Iterator, Optional, Tuple
+
+from engine import (
+    LARGE_SQUAD_SOLDIERS, baseline, canonical_goals, circuit_soldier_class,
+    export_program_to_text, get_exercise_library, schedules, week_json,
+    weekly_plan, weekly_plan_batch,
+)
+
+PLAN_TABLE_PATH = os.getenv("PLAN_TABLE_PATH", "plan_table.db")
+
+STANDARD_KITS = [
+    ['all'],
+    ['dumbbell', 'bench'],
+    ['barbell', 'plates', 'rack', 'bench'],
+    ['kettlebell'],
+    ['resistance band'],
+    ['bar', 'box', 'dip bar'],
+]
+
+STRENGTH_FOCUSES = ['endurance', 'hypertrophy', 'power', 'strength']
+
+# Real squads: a default-sized squad and a doubled one. The table keeps one
+# size per circuit_soldier_class among them.
+COMMON_SQUAD_SIZES = [LARGE_SQUAD_SOLDIERS, 2 * LARGE_SQUAD_SOLDIERS]
+SQUAD_SIZES = sorted({circuit_soldier_class(n) for n in COMMON_SQUAD_SIZES})
+
+BUILD_CHUNK = 512
+ZDICT_SAMPLES = 8
+ZDICT_SIZE = 32768
+PROBE_COUNT = 32
+
+SCHEMA = """
+CREATE TABLE meta (key TEXT PRIMARY KEY, value BLOB NOT NULL);
+CREATE TABLE blobs (id INTEGER PRIMARY KEY, plan_json BLOB NOT NULL, plan_text BLOB NOT NULL);
+CREATE TABLE plans (goal_hash BLOB PRIMARY KEY, blob_id INTEGER NOT NULL REFERENCES blobs(id)) WITHOUT ROWID;
+"""
+
+def goal_hash(plan_goals: Dict) -> bytes:
+    """16-byte key for a set of goals; TypeError if they can't be canonicalized"""
+    key = json.dumps(canonical_goals(plan_goals), separators=(",", ":"))
+    return hashlib.blake2b(key.encode(), digest_size=16).digest()
+
+def probe_goals():
+    """A fixed spread of the common goals, PROBE_COUNT of them"""
+    goals = list(common_goals())
+    return goals[::max(1, len(goals) // PROBE_COUNT)][:PROBE_COUNT]
+
+def plan_fingerprint(exercise_library) -> str:
+    """Changes whenever the exercise library or a rendered plan changes.
+
+    The probe plans go through live weekly_plan and render, so lift tables,
+    circuit and rep rules, the warmup/cooldown/cardio generators and the
+    export text are all covered without listing them here.
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    for category, exercises in exercise_library.items():
+        digest.update(category.encode())
+        for exercise in exercises:
+            digest.update(json.dumps(exercise.to_dict(), sort_keys=True).encode())
+    for plan_goals in probe_goals():
+        for piece in render(plan_goals, weekly_plan(plan_goals, exercise_library)):
+            digest.update(piece)
+    return digest.hexdigest()
+
+def common_goals() -> Iterator[Dict]:
+    """Every goal combination the table precomputes"""
+    targets = [[]] + [[m] for m in baseline] + [list(pair) for pair in combinations(baseline, 2)]
+    for days, focus in sorted((d, f) for d in schedules for f in schedules[d]):
+        for strength_focus, target, kit, soldiers in product(STRENGTH_FOCUSES, targets, STANDARD_KITS, SQUAD_SIZES):
+            yield {
+                'days_per_week': days,
+                'high_level_focus': focus,
+                'strength_focus': strength_focus,
+                'muscle_target': target,
+                'equipment': kit,
+                'num_soldiers': soldiers,
+            }
+
+def render(plan_goals: Dict, week) -> Tuple[bytes, bytes]:
+    """The two pieces /chat returns for a plan: plan_data JSON and plan text"""
+    text = export_program_to_text(week, plan_goals.get('strength_focus', 'hypertrophy'))
+    return week_json(week), text.encode('utf-8')
+
+def compress(data: bytes, zdict: bytes) -> bytes:
+    compressor = zlib.compressobj(9, zdict=zdict)
+    return compressor.compress(data) + compressor.flush()
+
+def decompress(data: bytes, zdict: bytes) -> bytes:
+    decompressor = zlib.decompressobj(zdict=zdict)
+    return decompressor.decompress(data) + decompressor.flush()
+
+def build_plan_table(path: str = PLAN_TABLE_PATH, exercise_library=None) -> Dict:
+    """Generate every common plan into a fresh table at `path`.
+
+    Written to a temp file and swapped in, so a running server never sees a
+    half-built table.
+    """
+    exercise_library = exercise_library or get_exercise_library()
+    goals = list(common_goals())
+
+    rendered: Dict[bytes, Tuple[bytes, bytes]] = {}
+    for start in range(0, len(goals), BUILD_CHUNK):
+        chunk = goals[start:start + BUILD_CHUNK]
+        for plan_goals, week in zip(chunk, weekly_plan_batch(chunk, exercise_library)):
+            rendered[goal_hash(plan_goals)] = render(plan_goals, week)
+
+    # Dictionaries end with the most useful material, so spread samples out
+    step = max(1, len(goals) // ZDICT_SAMPLES)
+    samples = [rendered[goal_hash(goals[i])] for i in range(0, len(goals), step)][:ZDICT_SAMPLES]
+    json_dict = b''.join(plan_json for plan_json, _ in samples)[-ZDICT_SIZE:]
+    text_dict = b''.join(plan_text for _, plan_text in samples)[-ZDICT_SIZE:]
+
+    tmp_path = path + '.tmp'
+    if os.path.exists(tmp_path):
+        os.remove(tmp_path)
+    conn = sqlite3.connect(tmp_path)
+    try:
+        conn.executescript(SCHEMA)
+        conn.executemany("INSERT INTO meta (key, value) VALUES (?, ?)", [
+            ('fingerprint', plan_fingerprint(exercise_library)),
+            ('json_dict', json_dict),
+            ('text_dict', text_dict),
+            ('built_at', time.strftime('%Y-%m-%dT%H:%M:%S')),
+        ])
+        blob_ids: Dict[Tuple[bytes, bytes], int] = {}
+        rows = []
+        for key, pieces in rendered.items():
+            blob_id = blob_ids.get(pieces)
+            if blob_id is None:
+                blob_id = blob_ids[pieces] = len(blob_ids) + 1
+                conn.execute(
+                    "INSERT INTO blobs (id, plan_json, plan_text) VALUES (?, ?, ?)",
+                    (blob_id, compress(pieces[0], json_dict), compress(pieces[1], text_dict))
+                )
+            rows.append((key, blob_id))
+        conn.executemany("INSERT INTO plans (goal_hash, blob_id) VALUES (?, ?)", rows)
+        conn.commit()
+        conn.execute("VACUUM")
+    finally:
+        conn.close()
+    os.replace(tmp_path, path)
+    return {'goals': len(goals), 'plans': len(rows), 'unique': len(blob_ids), 'bytes': os.path.getsize(path)}
+
+class PlanTable:
+    """Read-only lookups into a built plan table.
+
+    A missing or stale table (its fingerprint no longer matches the library
+    and engine) is treated as empty, so callers always fall back to live
+    generation.
+    """
+
+    def __init__(self, path: str = PLAN_TABLE_PATH, exercise_library=None):
+        self.path = path
+        self.hits = 0
+        self.misses = 0
+        self.stale = False
+        self._lock = threading.Lock()
+        self._conn = None
+
+        if not os.path.exists(path):
+            return
+        conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True, check_same_thread=False)
+        meta = dict(conn.execute("SELECT key, value FROM meta"))
+        if meta.get('fingerprint') != plan_fingerprint(exercise_library or get_exercise_library()):
+            self.stale = True
+            conn.close()
+            return
+        self._conn = conn
+        self._json_dict = meta['json_dict']
+        self._text_dict = meta['text_dict']
+
+    def get(self, plan_goals: Dict) -> Optional[Tuple[bytes, str]]:
+        """(plan_data JSON bytes, plan text) for these goals, or None on a miss"""
+        row = None
+        if self._conn is not None:
+            try:
+                key = goal_hash(plan_goals)
+            except (TypeError, ValueError, KeyError):
+                key = None
+            if key is not None:
+                with self._lock:
+                    row = self._conn.execute(
+                        "SELECT plan_json, plan_text FROM blobs"
+                        " WHERE id = (SELECT blob_id FROM plans WHERE goal_hash = ?)",
+                        (key,)
+                    ).fetchone()
+
+        with self._lock:
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+        return decompress(row[0], self._json_dict), decompress(row[1], self._text_dict).decode('utf-8')
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                'path': self.path,
+                'loaded': self._conn is not None,
+                'stale': self.stale,
+                'hits': self.hits,
+                'misses': self.misses,
+            }
+
+@lru_cache(maxsize=None)
+def get_plan_table() -> PlanTable:
+    """Shared table at PLAN_TABLE_PATH, opened on first use"""
+    return PlanTable(PLAN_TABLE_PATH)
+
+def main():
+    parser = argparse.ArgumentParser(description="Build the precomputed plan table")
+    parser.add_argument('--output', default=PLAN_TABLE_PATH)
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    stats = build_plan_table(args.output)
+    print(f"{stats['plans']} goal combinations, {stats['unique']} distinct plans, "
+          f"{stats['bytes'] / 1e6:.1f} MB in {time.perf_counter() - start:.1f}s -> {args.output}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,23 @@
+import pytest
+
+import database
+
+
+@pytest.fixture
+def db(tmp_path, monkeypatch):
+    """A freshly migrated database in a temp directory, closed afterwards"""
+    monkeypatch.setattr(database, 'DB_NAME', str(tmp_path / "test.db"))
+    database.close_connection_pool()
+    database.init_db()
+    yield database
+    database.shutdown_executors()
+    database.close_connection_pool()
+
+
+@pytest.fixture
+def api(db, monkeypatch):
+    """main's handlers against the `db` database; needs the Gemini client installed"""
+    pytest.importorskip('google.generativeai')
+    monkeypatch.setenv('GEMINI_API_KEY', 'test')
+    import main
+    return main
@@ -0,0 +1,56 @@
+"""The active-program cache and GET /active-program's ETag / 304 handling."""
+import asyncio
+
+CIRCUIT = {'exercises': [{'name': 'Push-ups', 'category': 'hp', 'equipment': []}], 'rounds': 3}
+DAYS = [{'day': 1, 'focus': 'Full', 'warmup': ['Jog'], 'circuits': [CIRCUIT]},
+        {'day': 2, 'focus': 'Full', 'circuits': [CIRCUIT, CIRCUIT]}]
+
+
+def test_cache_serves_until_a_write(db):
+    cache = db.get_active_program_cache()
+    assert cache.get()[1] == b'null'
+
+    db.save_program_to_db("First", "", DAYS)
+    etag, body = cache.get()
+    assert body == db.get_latest_program_json()
+    assert cache.get() == (etag, body)
+    assert cache.cached() == (etag, body)
+
+    db.save_program_to_db("Second", "", DAYS)
+    assert cache.cached() is None
+    new_etag, new_body = cache.get()
+    assert new_etag != etag
+    assert db.get_latest_program()['name'] == "Second"
+    assert new_body == db.get_latest_program_json()
+
+
+def get(api, if_none_match=None):
+    return asyncio.run(api.get_active_program(if_none_match=if_none_match))
+
+
+def test_if_none_match_answers_304(api, db):
+    db.save_program_to_db("First", "", DAYS)
+
+    first = get(api)
+    etag = first.headers['etag']
+    assert first.status_code == 200
+    assert first.body == db.get_latest_program_json()
+
+    for header in (etag, f"W/{etag}", f'"other", {etag}', "*"):
+        response = get(api, header)
+        assert response.status_code == 304, header
+        assert response.body == b''
+        assert response.headers['etag'] == etag
+
+    assert get(api, '"other"').status_code == 200
+
+
+def test_write_changes_the_etag(api, db):
+    db.save_program_to_db("First", "", DAYS)
+    etag = get(api).headers['etag']
+
+    db.save_program_to_db("Second", "", DAYS)
+
+    response = get(api, etag)
+    assert response.status_code == 200
+    assert response.headers['etag'] != etag
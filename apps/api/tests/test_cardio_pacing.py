@@ -0,0 +1,52 @@
+"""pace_cardio: Tanaka max HR, Karvonen zones and Riegel paces on known inputs."""
+import pytest
+
+from engine import FitnessRoster, pace_cardio
+
+# Fully recorded; no resting HR or run time; nothing usable
+FITNESS = FitnessRoster.from_rows([(1, 'Able', 20, 60, 900), (2, 'Baker', 40, None, None), (3, 'Charlie', 0, -1, 0)])
+
+
+def columns(cardio_type, duration_minutes, details):
+    return pace_cardio(cardio_type, duration_minutes, details, FITNESS).to_dict()['columns']
+
+
+def test_heart_rate_zones():
+    # 208 - 0.7 x age; Karvonen 60 + 0.6 x (194 - 60) with a resting HR, 0.6 x 180 without
+    easy = columns('Distance Run', 30, {'pace': 'conversational'})
+    assert easy['max_hr'] == [194.0, 180.0, None]
+    assert easy['hr_low'] == [140.0, 108.0, None]
+    assert easy['hr_high'] == [154.0, 126.0, None]
+
+    hiit = columns('HIIT', 20, {})
+    assert hiit['hr_high'] == hiit['max_hr']
+    assert hiit['pace_s_per_km'] == [None] * 3
+
+
+def test_steady_run_paces():
+    # 900 s over 3218.69 m is 279.6 s/km; conversational 1.30x, moderate 1.15x
+    easy = columns('Distance Run', 30, {'pace': 'conversational'})
+    assert easy['pace_s_per_km'] == [363.5, None, None]
+    assert easy['distance_km'] == [4.95, None, None]
+
+    moderate = columns('Distance Run', 30, {})
+    assert moderate['pace_s_per_km'] == [321.6, None, None]
+    assert moderate['hr_low'] == [154.0, 126.0, None]
+
+
+def test_riegel_tempo_and_interval_paces():
+    # Hour pace: 1000 / (3.576 m/s x 4 ** (1/1.06 - 1)); then 10 easy minutes
+    tempo = columns('Tempo Run', 30, {'tempo_duration': 20})
+    assert tempo['pace_s_per_km'] == [302.4, None, None]
+    assert tempo['distance_km'] == [5.62, None, None]
+
+    # Mile time 900 x 0.5 ** 1.06; 200 m reps with half-distance jog recoveries
+    intervals = columns('Interval Training', 25, {'rounds': 6})
+    assert intervals['pace_s_per_km'] == [268.2, None, None]
+    assert intervals['split_s'] == [53.6, None, None]
+    assert intervals['distance_km'] == [1.8, 1.8, 1.8]
+
+
+def test_unknown_cardio_type_raises():
+    with pytest.raises(ValueError, match='Swim'):
+        pace_cardio('Swim', 30, {}, FITNESS)
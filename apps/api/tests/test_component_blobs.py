@@ -0,0 +1,71 @@
+import json
+
+
+def latest_components(db):
+    return [c for w in db.get_latest_program()['workouts'] for c in w['components']]
+
+
+def test_blobs_keep_key_order(db):
+    cardio = {'type': 'run', 'duration': 20, 'intensity': 'zone 2'}
+    db.save_program_to_db("p", "", [{'day': 1, 'focus': 'A', 'cardio': cardio}])
+
+    data, = [c['data'] for c in latest_components(db)]
+    assert list(data) == list(cardio)
+
+
+def test_same_payload_shares_blob_whatever_its_spelling(db):
+    program_id = db.save_program_to_db("p", "", [{'day': 1, 'focus': 'A'}, {'day': 2, 'focus': 'B'}])
+    first, second = [w_id for w_id, _ in db.get_program_workouts(program_id)]
+
+    db.update_workout_components(first, [
+        {'component_type': 'cardio', 'order_index': 99, 'data': {'b': 1, 'a': 2}},
+    ])
+    db.update_workout_components(second, [
+        {'component_type': 'cardio', 'order_index': 99, 'data': json.dumps({'a': 2, 'b': 1}, indent=1)},
+        {'component_type': 'note', 'order_index': 1, 'data': 'not json'},
+    ])
+
+    conn = db.get_db_connection()
+    try:
+        rows = conn.execute("SELECT component_type, data, blob_hash FROM workout_components ORDER BY id").fetchall()
+        blobs = conn.execute("SELECT count(*) FROM component_blobs").fetchone()[0]
+    finally:
+        conn.close()
+    cardio = [r for r in rows if r['component_type'] == 'cardio']
+    note, = [r for r in rows if r['component_type'] == 'note']
+
+    assert blobs == 1
+    assert cardio[0]['blob_hash'] == cardio[1]['blob_hash'] and cardio[0]['data'] is None
+    assert note['blob_hash'] is None and note['data'] == 'not json'
+
+
+def circuit(name):
+    return {'exercises': [{'name': name, 'category': 'hp', 'equipment': []}], 'rounds': 3}
+
+
+def stored_circuits(db, workout_id):
+    conn = db.get_db_connection()
+    try:
+        blobs = {row[0] for row in conn.execute("SELECT hash FROM component_blobs")}
+        referenced = {row[0] for row in conn.execute("SELECT blob_hash FROM workout_components")}
+        names = [row[0] for row in conn.execute(
+            "SELECT exercise_name FROM component_exercises WHERE workout_id = ? ORDER BY component_id, position",
+            (workout_id,)
+        )]
+    finally:
+        conn.close()
+    assert blobs == referenced - {None}
+    return [c['exercises'][0]['name'] for c in db.get_workout_day(workout_id)['circuits']], names
+
+
+def test_rewriting_circuits_reorders_shrinks_and_grows(db):
+    program_id = db.save_program_to_db("p", "", [{'day': 1, 'focus': 'A', 'circuits': [circuit('a'), circuit('b')]}])
+    (workout_id, _), = db.get_program_workouts(program_id)
+
+    for names in (['c', 'a'], ['a', 'c'], ['a'], ['b', 'a', 'c'], ['b', 'a', 'c']):
+        db.write_circuit_components({workout_id: [circuit(n) for n in names]})
+        days, indexed = stored_circuits(db, workout_id)
+        assert days == names
+        assert sorted(indexed) == sorted(names)
+
+    assert db.write_circuit_components({workout_id: [circuit(n) for n in ['b', 'a', 'c']]}) == 0
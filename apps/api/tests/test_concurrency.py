@@ -0,0 +1,26 @@
+"""Reads stay fast while a heavy save holds the writer.
+
+Polls program reads through run_read from several tasks while
+save_programs_bulk runs through run_write, the way the handlers do.
+"""
+import asyncio
+
+from benchmarks.concurrency import sample_programs, scenario
+
+PROGRAMS = 1000
+READERS = 4
+INTERVAL_SECONDS = 0.02
+MAX_READ_MS = 50.0
+
+
+def test_reads_stay_fast_during_bulk_save(db):
+    programs = sample_programs(PROGRAMS)
+    program_id = db.save_program_to_db(*programs[0])
+
+    result = asyncio.run(scenario(db.run_write, db.run_read, programs, program_id,
+                                  READERS, INTERVAL_SECONDS))
+
+    # The save must be long enough that a blocked read would break the bound
+    assert result['save_ms'] > 4 * MAX_READ_MS
+    assert result['reads'] >= READERS * result['save_ms'] / 1e3 / INTERVAL_SECONDS / 2
+    assert result['p99_ms'] < MAX_READ_MS
@@ -0,0 +1,29 @@
+from database import ConnectionPool
+
+
+def test_repeat_close_returns_connection_once(tmp_path):
+    pool = ConnectionPool(str(tmp_path / "pool.db"), size=2)
+    conn = pool.acquire()
+    conn.close()
+    conn.close()
+
+    first, second = pool.acquire(), pool.acquire()
+    assert first is not second
+    first.close()
+    second.close()
+    pool.close_all()
+
+
+def test_close_rolls_back_uncommitted_work(tmp_path):
+    pool = ConnectionPool(str(tmp_path / "pool.db"), size=1)
+    conn = pool.acquire()
+    conn.execute("CREATE TABLE t (x)")
+    conn.execute("INSERT INTO t VALUES (1)")
+    assert conn.in_transaction
+    conn.close()
+
+    again = pool.acquire()
+    assert not again.in_transaction
+    assert again.execute("SELECT count(*) FROM t").fetchone()[0] == 0
+    again.close()
+    pool.close_all()
@@ -0,0 +1,105 @@
+"""exercise_usage answers from component_exercises, which every write keeps in step."""
+import asyncio
+
+import pytest
+
+PUSH_UPS = {'name': 'Push-ups', 'category': 'hp', 'equipment': []}
+ROW = {'name': 'Barbell Row', 'category': 'hpl', 'equipment': ['barbell', 'plates']}
+DEADLIFT = {'name': 'Barbell Deadlift', 'category': 'hinge', 'equipment': ['barbell', 'plates']}
+GOBLET = {'name': 'Goblet Squat', 'category': 'squat', 'equipment': ['dumbbell']}
+
+
+def circuit(*exercises):
+    return {'exercises': list(exercises), 'rounds': 3}
+
+
+def save(db):
+    first = db.save_program_to_db("First", "", [
+        {'day': 1, 'focus': 'Full', 'circuits': [circuit(ROW, PUSH_UPS)]},
+        {'day': 2, 'focus': 'Full', 'circuits': [circuit(DEADLIFT), circuit(PUSH_UPS)]},
+    ])
+    second = db.save_program_to_db("Second", "", [{'day': 1, 'focus': 'Full', 'circuits': [circuit(PUSH_UPS)]}])
+    return first, second
+
+
+def check_index_and_cache(db):
+    """The index matches the stored circuits, and the cached program matches SQLite"""
+    conn = db.get_db_connection()
+    try:
+        indexed = [tuple(row) for row in conn.execute(
+            "SELECT workout_id, exercise_name, category, equipment FROM component_exercises"
+        )]
+        program_ids = [row[0] for row in conn.execute("SELECT id FROM training_programs")]
+    finally:
+        conn.close()
+
+    stored = []
+    for program_id in program_ids:
+        for workout_id, day in db.get_program_workouts(program_id):
+            for stored_circuit in day['circuits']:
+                for exercise in stored_circuit['exercises']:
+                    for item in exercise['equipment'] or [None]:
+                        stored.append((workout_id, exercise['name'], exercise['category'], item))
+    order = lambda row: tuple(map(str, row))
+    assert sorted(indexed, key=order) == sorted(stored, key=order)
+
+    assert db.get_active_program_cache().get()[1] == db.get_latest_program_json()
+
+
+def usage(db, **filters):
+    return {row['name']: (row['circuits'], row['workouts']) for row in db.exercise_usage(**filters)}
+
+
+def test_filters(db):
+    save(db)
+
+    assert usage(db, exercise='push-ups') == {'First': (2, 2), 'Second': (1, 1)}
+    assert usage(db, equipment='BARBELL') == {'First': (2, 2)}
+    assert usage(db, exercise='Barbell Row', equipment='plates') == {'First': (1, 1)}
+    assert usage(db, category='hinge') == {'First': (1, 1)}
+    assert usage(db, exercise='Push-ups', since='2999-01-01') == {}
+    with pytest.raises(ValueError):
+        db.exercise_usage()
+
+
+def test_index_and_cache_follow_every_write(db):
+    first, _ = save(db)
+    check_index_and_cache(db)
+    (day_one, _), (day_two, _) = db.get_program_workouts(first)
+
+    db.update_workout_components(day_one, [
+        {'component_type': 'circuit', 'order_index': 1, 'data': circuit(GOBLET)},
+        {'component_type': 'cardio', 'order_index': 99, 'data': {'type': 'HIIT'}},
+    ])
+    check_index_and_cache(db)
+    assert usage(db, exercise='Barbell Row') == {}
+    assert usage(db, exercise='Goblet Squat') == {'First': (1, 1)}
+
+    db.write_circuit_components({day_two: [circuit(PUSH_UPS), circuit(ROW), circuit(DEADLIFT)]})
+    check_index_and_cache(db)
+    assert usage(db, equipment='barbell') == {'First': (2, 1)}
+
+    db.write_circuit_components({day_two: [circuit(GOBLET)]})
+    check_index_and_cache(db)
+    assert usage(db, equipment='barbell') == {}
+    assert usage(db, exercise='Goblet Squat') == {'First': (2, 2)}
+
+    db.delete_workout(day_one)
+    check_index_and_cache(db)
+    assert usage(db, exercise='Goblet Squat') == {'First': (1, 1)}
+
+    db.delete_program(first)
+    check_index_and_cache(db)
+    assert usage(db, exercise='Push-ups') == {'Second': (1, 1)}
+
+
+def test_endpoint_totals_and_missing_filter(api, db):
+    save(db)
+
+    result = asyncio.run(api.exercise_usage_endpoint(exercise='Push-ups', equipment=None, category=None, since=None))
+    assert (result['circuits'], result['workouts']) == (3, 3)
+    assert [program['name'] for program in result['programs']] == ['Second', 'First']
+
+    with pytest.raises(api.HTTPException) as error:
+        asyncio.run(api.exercise_usage_endpoint(exercise=None, equipment=None, category=None, since=None))
+    assert error.value.status_code == 400
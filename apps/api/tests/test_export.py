@@ -0,0 +1,132 @@
+"""Streaming exports: text matches the old all-at-once export byte for byte, CSV quotes properly."""
+import csv
+import io
+
+import pytest
+
+from engine import (
+    CSV_COLUMNS, export_program_to_text, get_exercise_library, get_intensity_recommendation, get_rep_range,
+    iter_program_export, session_to_dict, weekly_plan,
+)
+
+GOALS = [
+    {'days_per_week': 3, 'high_level_focus': 'strength', 'strength_focus': 'strength',
+     'equipment': ['all'], 'muscle_target': ['chest']},
+    {'days_per_week': 5, 'high_level_focus': 'cardio', 'strength_focus': 'endurance',
+     'equipment': ['dumbbell', 'bench'], 'muscle_target': [], 'cardio_focus': 'speed'},
+]
+
+
+def reference_card(workout, strength_focus):
+    """format_workout_card as it was before exports streamed"""
+    output = []
+    output.append(f"\n{'='*60}")
+    output.append(f"DAY {workout.day} WORKOUT")
+    output.append(f"{'='*60}\n")
+
+    if workout.warmup:
+        output.append("WARMUP:")
+        for item in workout.warmup:
+            output.append(f"  • {item}")
+        output.append("")
+
+    for i, circuit in enumerate(workout.circuits, 1):
+        output.append(f"CIRCUIT {i} - {circuit.rounds} rounds")
+        output.append(f"Work: {circuit.work_seconds}s | Rest: {circuit.rest_seconds}s | Round Rest: {circuit.rest_between_rounds}s")
+        output.append("")
+
+        for j, exercise in enumerate(circuit.exercises, 1):
+            if exercise.reps:
+                reps_str = exercise.reps
+            else:
+                rep_range = get_rep_range(strength_focus, exercise.difficulty)
+                reps_str = f"{rep_range[0]}-{rep_range[1]}"
+
+            output.append(f"  {j}. {exercise.name}")
+            output.append(f"     Reps: {reps_str} | Equipment: {', '.join(exercise.equipment) if exercise.equipment else 'Bodyweight'}")
+            if exercise.instructions:
+                output.append(f"     → {exercise.instructions}")
+        output.append("")
+
+    if workout.cardio:
+        output.append(f"CARDIO: {workout.cardio.type}")
+        output.append(f"Duration: {workout.cardio.duration_minutes} minutes")
+        if workout.cardio.details:
+            for key, value in workout.cardio.details.items():
+                if key != 'instructions':
+                    output.append(f"  • {key}: {value}")
+            if 'instructions' in workout.cardio.details:
+                output.append(f"  → {workout.cardio.details['instructions']}")
+        output.append("")
+
+    if workout.cooldown:
+        output.append("COOLDOWN:")
+        for item in workout.cooldown:
+            output.append(f"  • {item}")
+        output.append("")
+
+    output.append(f"INTENSITY: {get_intensity_recommendation(strength_focus)}")
+    output.append("")
+
+    return "\n".join(output)
+
+
+def reference_export(week_plan, strength_focus):
+    output = ["\n" + "="*60, "WEEKLY WORKOUT PROGRAM", "="*60 + "\n"]
+    for workout in week_plan:
+        output.append(reference_card(workout, strength_focus))
+    return "\n".join(output)
+
+
+@pytest.mark.parametrize('plan_goals', GOALS)
+@pytest.mark.parametrize('strength_focus', ['hypertrophy', 'power'])
+def test_text_matches_the_old_export(plan_goals, strength_focus):
+    week = weekly_plan(plan_goals, get_exercise_library())
+    expected = reference_export(week, strength_focus).encode('utf-8')
+
+    assert export_program_to_text(week, strength_focus).encode('utf-8') == expected
+    chunks = list(iter_program_export((session_to_dict(s) for s in week), 'text', strength_focus))
+    assert len(chunks) == len(week) + 1
+    assert "".join(chunks).encode('utf-8') == expected
+
+
+def test_stored_program_exports_the_same_text(db):
+    week = weekly_plan(GOALS[1], get_exercise_library())
+    program_id = db.save_program_to_db("p", "", [session_to_dict(s) for s in week])
+
+    exported = "".join(iter_program_export(db.iter_program_days(program_id), 'text', 'hypertrophy'))
+
+    assert exported == reference_export(week, 'hypertrophy')
+
+
+def test_csv_header_and_escaping():
+    day = {
+        'day': 1,
+        'warmup': ['Jog, then "strides"', 'Line\nbreak'],
+        'circuits': [{'rounds': 3, 'work_seconds': 45, 'rest_seconds': 15, 'rest_between_rounds': 60,
+                      'exercises': [{'name': 'Press, heavy', 'reps': '5', 'equipment': ['barbell', 'plates']},
+                                    {'name': 'Push-ups', 'difficulty': 1, 'equipment': []}]}],
+        'cardio': {'type': 'Tempo Run', 'duration_minutes': 30, 'details': {'pace': 'hard, steady'}},
+        'cooldown': ['Stretch'],
+    }
+
+    chunks = list(iter_program_export([day, dict(day, day=2)], 'csv', 'strength'))
+    rows = list(csv.reader(io.StringIO("".join(chunks))))
+
+    assert len(chunks) == 2
+    assert rows[0] == CSV_COLUMNS
+    assert rows[1:7] == [
+        ['1', 'warmup', '1', 'Jog, then "strides"', '', '', ''],
+        ['1', 'warmup', '2', 'Line\nbreak', '', '', ''],
+        ['1', 'circuit 1', '1', 'Press, heavy', '5', 'barbell, plates',
+         '3 rounds; work 45s; rest 15s; round rest 60s'],
+        ['1', 'circuit 1', '2', 'Push-ups', '1-5', 'Bodyweight', '3 rounds; work 45s; rest 15s; round rest 60s'],
+        ['1', 'cardio', '1', 'Tempo Run', '', '', '30 minutes; pace: hard, steady'],
+        ['1', 'cooldown', '1', 'Stretch', '', '', ''],
+    ]
+    assert [row[0] for row in rows[7:]] == ['2'] * 6
+
+
+def test_unknown_format_raises():
+    with pytest.raises(ValueError, match='pdf'):
+        iter_program_export([], 'pdf')
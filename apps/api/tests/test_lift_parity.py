@@ -0,0 +1,162 @@
+"""LiftTable picks and weekly_plan selections match the original planner.
+
+The reference below is the dict-based selection the engine started from:
+every step scores each candidate lift on its own (cosine_similarity for
+upper and lower days, a plain dot product for full days) and takes the
+first best with max(). It runs over every schedule, strength focus and
+muscle target (none, one or two muscles).
+"""
+from itertools import combinations
+
+import numpy as np
+import pytest
+
+from engine import (
+    FULL_LIFTS, LOWER_LIFTS, UPPER_LIFTS, baseline, create_muscle_emphasis,
+    get_exercise_library, schedules, select_exercises, weekly_plan,
+)
+
+STRENGTH_FOCUSES = ['endurance', 'hypertrophy', 'power', 'strength']
+
+MUSCLE_TARGETS = [[]] + [[m] for m in baseline] + [list(pair) for pair in combinations(baseline, 2)]
+
+UPPER_MUSCLES = ["chest", "tricep", "frontdelt", "lat", "bicep", "trap_rhomboid"]
+LOWER_MUSCLES = ["quad", "glute", "lowback", "hamstring", "calf"]
+FULL_MUSCLES = UPPER_MUSCLES + LOWER_MUSCLES
+
+UPPER = {
+    'hp': [1, 0.5, 0.5, 0, 0, 0],
+    'vp': [0, 0.5, 1, 0, 0, 0],
+    'hpl': [0, 0, 0, 0.5, 0.5, 1],
+    'vpl': [0, 0, 0, 1, 1, 0],
+    'tricep': [0, 1, 0, 0, 0, 0],
+    'bicep': [0, 0, 0, 0, 1, 0],
+    'middelt': [0, 0.3, 0.5, 0, 0, 0],
+    'reardelt': [0, 0, 0, 0.3, 0, 0.6],
+}
+
+LOWER = {
+    'squat': [1, 1, 0.5, 0, 0],
+    'hinge': [0, 0.5, 1, 1, 0],
+    'quad': [1, 0, 0, 0, 0],
+    'hamstring': [0, 0, 0, 1, 0],
+    'calf': [0, 0, 0, 0, 1],
+}
+
+FULL = {
+    **{name: row + [0] * 5 for name, row in UPPER.items() if name not in ('middelt', 'reardelt')},
+    **{name: [0] * 6 + row for name, row in LOWER.items()},
+}
+
+PRIMARY = {
+    'bench': {'frontdelt': 0.75, 'tricep': 0.75, 'chest': 1.5},
+    'row': {'trap_rhomboid': 1.5, 'lat': 0.75, 'bicep': 0.75},
+    'squat': {'quad': 1.5, 'glute': 1.5, 'lowback': 0.75},
+    'hinge': {'hamstring': 1.5, 'lowback': 1.5, 'glute': 0.75},
+}
+
+# Primary pairs each block works through, and the minutes they take
+BLOCK_PRIMARIES = {
+    'U': ([('bench', 'row')], 15),
+    'L': ([('squat', 'hinge')], 15),
+    'F': ([('squat', 'hinge'), ('bench', 'row')], 25),
+    'A': ([], 0),
+}
+
+MUSCLE_TO_CATEGORY = {
+    'chest': 'hp', 'frontdelt': 'vp', 'tricep': 'tricep',
+    'lat': 'vpl', 'bicep': 'bicep', 'trap_rhomboid': 'hpl',
+    'quad': 'quad', 'hamstring': 'hamstring', 'glute': 'squat',
+    'calf': 'calf', 'core': 'core', 'middelt': 'middelt',
+    'reardelt': 'reardelt', 'lowback': 'hinge'
+}
+
+def normalize(emph):
+    total = sum(emph.values())
+    if not total:
+        return emph
+    return {k: v / total for k, v in emph.items()}
+
+def cosine_similarity(a, b):
+    if np.linalg.norm(a) == 0 or np.linalg.norm(b) == 0:
+        return 0
+    return np.dot(a, b) / (np.linalg.norm(a) * np.linalg.norm(b))
+
+def reference_block(block, minutes, current, goal, primary_movements, picks):
+    """Categories the original planner chose for one strength block.
+
+    Also checks the engine's LiftTable.pick against every step, recording
+    (table, need, expected index) in `picks`.
+    """
+    if block == 'A':
+        categories = []
+        for _ in range(minutes // 7):
+            lag = (float('inf'), None)
+            for k, v in normalize(current).items():
+                if k in goal and goal[k] > 0 and v / goal[k] < lag[0]:
+                    lag = (v / goal[k], k)
+            if lag[1]:
+                categories.append(MUSCLE_TO_CATEGORY.get(lag[1], 'core'))
+                current[lag[1]] += 1
+        return categories
+
+    pairs, primary_minutes = BLOCK_PRIMARIES[block]
+    if primary_movements is not None:
+        for pair in pairs:
+            for lift in pair:
+                if lift not in primary_movements:
+                    primary_movements[lift] = 1
+                    for muscle, value in PRIMARY[lift].items():
+                        current[muscle] += value
+                    break
+        minutes -= primary_minutes
+
+    lifts, muscles, table, score = {
+        'U': (UPPER, UPPER_MUSCLES, UPPER_LIFTS, cosine_similarity),
+        'L': (LOWER, LOWER_MUSCLES, LOWER_LIFTS, cosine_similarity),
+        'F': (FULL, FULL_MUSCLES, FULL_LIFTS, np.dot),
+    }[block]
+    vectors = {name: np.array(row) for name, row in lifts.items()}
+    want = np.array([goal[m] for m in muscles])
+
+    categories = []
+    for _ in range(minutes // 7):
+        normed = normalize(current)
+        need = want - np.array([normed[m] for m in muscles])
+        scores = {name: score(need, vec) for name, vec in vectors.items()}
+        best = max(scores, key=scores.get)
+        picks.append((table, need, list(lifts).index(best)))
+        categories.append(best)
+        for i, m in enumerate(muscles):
+            current[m] += lifts[best][i]
+    return categories
+
+def reference_week(plan_goals, picks):
+    """Per day, the strength categories of each block in schedule order"""
+    goal = normalize(create_muscle_emphasis(plan_goals['muscle_target']))
+    current = {m: 0 for m in baseline}
+    primary_movements = {} if plan_goals['strength_focus'] in ['power', 'strength'] else None
+    week = []
+    for day in schedules[plan_goals['days_per_week']][plan_goals['high_level_focus']]:
+        week.append([reference_block(block, minutes, current, goal, primary_movements, picks)
+                     for block, minutes in day if block != 'C'])
+    return week
+
+@pytest.mark.parametrize('days,focus', [(d, f) for d in schedules for f in schedules[d]])
+@pytest.mark.parametrize('strength_focus', STRENGTH_FOCUSES)
+def test_selections_match_reference(days, focus, strength_focus):
+    library = get_exercise_library()
+    for muscle_target in MUSCLE_TARGETS:
+        plan_goals = {'days_per_week': days, 'high_level_focus': focus, 'strength_focus': strength_focus,
+                      'equipment': ['all'], 'muscle_target': muscle_target}
+        picks = []
+        expected = [
+            [p.name for blocks in day for p in select_exercises(blocks, ['all'], library)]
+            for day in reference_week(plan_goals, picks)
+        ]
+
+        for table, need, index in picks:
+            assert table.pick(need) == index, (muscle_target, table.names[index])
+
+        week = weekly_plan(plan_goals, library)
+        assert [[e.name for c in s.circuits for e in c.exercises] for s in week] == expected, muscle_target
@@ -0,0 +1,77 @@
+"""prescribe_loads applies Epley to the right 1RM for every soldier."""
+import numpy as np
+
+from engine import LOAD_SOURCES, Roster, parse_rep_range, prescribe_loads
+
+SOLDIERS = [(1, 'Able', 80.0), (2, 'Baker', 100.0), (3, 'Charlie', None)]
+MAXES = [(1, 'bench', 100.0), (2, 'squat', 0), (3, 'deadlift', None), (9, 'bench', 120.0)]
+
+EXERCISES = [
+    {'name': 'Barbell Bench Press', 'reps': '8-12'},
+    {'name': 'Dumbbell Bench Press', 'reps': '10'},
+    {'name': 'Barbell Deadlift', 'reps': '1'},
+    {'name': 'Barbell Back Squat', 'difficulty': 2},
+    {'name': 'Push-ups', 'reps': '15'},
+]
+
+
+def column(table, name):
+    j = table.exercises.index(name)
+    return table.heavy_kg[:, j].tolist(), table.light_kg[:, j].tolist(), table.source[:, j].tolist()
+
+
+def test_roster_drops_missing_and_unknown_values():
+    roster = Roster.from_rows(SOLDIERS, MAXES)
+
+    # Aliases resolve; zero is recorded as missing, unknown soldiers are skipped
+    assert roster.lifts == ['Barbell Bench Press', 'Barbell Back Squat']
+    assert roster.one_rep_max_kg[0, 0] == 100.0
+    assert np.isnan(roster.one_rep_max_kg[1:, 0]).all()
+    assert np.isnan(roster.one_rep_max_kg[:, 1]).all()
+    assert np.isnan(roster.bodyweight_kg[2])
+
+
+def test_known_loads():
+    table = prescribe_loads(EXERCISES, Roster.from_rows(SOLDIERS, MAXES), 'strength')
+    recorded, reference, bodyweight, none = range(len(LOAD_SOURCES))
+
+    # 100 / (1 + 8/30) = 78.9 and 100 / (1 + 12/30) = 71.4; bodyweight 100 x 0.9 = 90
+    heavy, light, source = column(table, 'Barbell Bench Press')
+    assert heavy[:2] == [77.5, 70.0] and light[:2] == [70.0, 62.5]
+    assert source == [recorded, bodyweight, none]
+    assert np.isnan(heavy[2]) and np.isnan(light[2])
+
+    # 40% of the 100 kg bench, else 35% of bodyweight; 10 reps is 3/4 of the 1RM
+    heavy, light, source = column(table, 'Dumbbell Bench Press')
+    assert heavy[:2] == light[:2] == [30.0, 25.0]
+    assert source[:2] == [reference, bodyweight]
+
+    # A single rep is the 1RM: 100 x 1.4 bodyweight
+    heavy, light, _ = column(table, 'Barbell Deadlift')
+    assert heavy[1] == light[1] == 140.0
+
+    # No reps given: the strength range 1-5 on 120 kg
+    heavy, light, _ = column(table, 'Barbell Back Squat')
+    assert heavy[1] == 120.0 and light[1] == 102.5
+    assert table.reps[table.exercises.index('Barbell Back Squat')] == '1-5'
+
+    _, _, source = column(table, 'Push-ups')
+    assert source == [none] * 3
+
+
+def test_to_dict_has_a_column_per_exercise():
+    table = prescribe_loads(EXERCISES, Roster.from_rows(SOLDIERS, MAXES), 'strength')
+    as_dict = table.to_dict()
+
+    assert as_dict['soldier_ids'] == [1, 2, 3]
+    assert [e['name'] for e in as_dict['exercises']] == [e['name'] for e in EXERCISES]
+    assert as_dict['exercises'][0]['heavy_kg'] == [77.5, 70.0, None]
+
+
+def test_rep_ranges():
+    assert parse_rep_range('8-12') == (8, 12)
+    assert parse_rep_range('12-8') == (8, 12)
+    assert parse_rep_range('5') == (5, 5)
+    assert parse_rep_range('30s') is None
+    assert parse_rep_range('0-5') is None
+    assert parse_rep_range(None) is None
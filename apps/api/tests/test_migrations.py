@@ -0,0 +1,88 @@
+"""A database created from the pre-versioning schema upgrades through every migration."""
+import json
+import sqlite3
+
+import pytest
+
+import database
+
+CIRCUIT = {'exercises': [{'name': 'Push-ups', 'category': 'hp', 'equipment': []},
+                         {'name': 'Barbell Row', 'category': 'hpl', 'equipment': ['barbell', 'plates']}],
+           'rounds': 3}
+CARDIO = {'type': 'Distance Run', 'duration_minutes': 30, 'details': {'pace': 'conversational'}}
+
+
+@pytest.fixture
+def legacy_db(tmp_path, monkeypatch):
+    """A file at user_version 0 with the original schema, a program and an orphaned component"""
+    path = str(tmp_path / "legacy.db")
+    conn = sqlite3.connect(path)
+    with open(database.migration_files()[0][1]) as f:
+        conn.executescript(f.read())
+    conn.execute("INSERT INTO training_programs (id, name, description) VALUES (1, 'Old', '')")
+    conn.executemany("INSERT INTO workouts (id, program_id, day_number, name, focus) VALUES (?, 1, ?, ?, 'Full')",
+                     [(1, 1, 'Day 1'), (2, 2, 'Day 2')])
+    conn.executemany(
+        "INSERT INTO workout_components (workout_id, component_type, order_index, data) VALUES (?, ?, ?, ?)",
+        [(1, 'circuit', 1, json.dumps(CIRCUIT)), (1, 'cardio', 99, json.dumps(CARDIO)),
+         (2, 'circuit', 1, json.dumps(CIRCUIT)), (2, 'note', 5, 'not json'),
+         (7, 'circuit', 1, json.dumps(CIRCUIT))]
+    )
+    conn.commit()
+    conn.close()
+
+    monkeypatch.setattr(database, 'DB_NAME', path)
+    database.close_connection_pool()
+    yield database
+    database.shutdown_executors()
+    database.close_connection_pool()
+
+
+def schema(conn):
+    return conn.execute("SELECT type, name, sql FROM sqlite_master ORDER BY type, name").fetchall()
+
+
+def test_upgrade_from_baseline(legacy_db):
+    versions = [version for version, _ in legacy_db.migration_files()]
+    conn = legacy_db.get_db_connection()
+    try:
+        assert legacy_db.migrate(conn) == versions
+        assert conn.execute("PRAGMA user_version").fetchone()[0] == versions[-1]
+        assert conn.execute("PRAGMA integrity_check").fetchone()[0] == 'ok'
+        assert conn.execute("PRAGMA foreign_key_check").fetchall() == []
+
+        # The orphan is gone; both circuits share one blob and are indexed
+        assert conn.execute("SELECT count(*) FROM workout_components").fetchone()[0] == 4
+        assert conn.execute("SELECT count(*) FROM component_blobs").fetchone()[0] == 2
+        assert conn.execute("SELECT count(*) FROM component_exercises").fetchone()[0] == 2 * 3
+    finally:
+        conn.close()
+
+    program = legacy_db.get_latest_program()
+    day_one, day_two = program['workouts']
+    assert [c['data'] for c in day_one['components']] == [CIRCUIT, CARDIO]
+    assert [c['data'] for c in day_two['components']] == [CIRCUIT, 'not json']
+    assert legacy_db.get_workout_day(1)['cardio'] == CARDIO
+
+
+def test_second_run_does_nothing(legacy_db):
+    conn = legacy_db.get_db_connection()
+    try:
+        legacy_db.migrate(conn)
+        before = schema(conn)
+        total_changes = conn.total_changes
+
+        assert legacy_db.migrate(conn) == []
+        assert schema(conn) == before
+        assert conn.total_changes == total_changes
+    finally:
+        conn.close()
+
+
+def test_fresh_database_ends_at_the_latest_version(db):
+    conn = db.get_db_connection()
+    try:
+        assert conn.execute("PRAGMA user_version").fetchone()[0] == db.migration_files()[-1][0]
+        assert db.migrate(conn) == []
+    finally:
+        conn.close()
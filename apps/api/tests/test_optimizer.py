@@ -0,0 +1,78 @@
+"""The anytime lift optimizer keeps to its deadline and never ends worse than greedy."""
+import time
+
+import numpy as np
+import pytest
+
+from engine import (
+    MUSCLES, OPTIMIZER_LIFTS, MuscleVector, create_muscle_emphasis, emphasis_distance, get_exercise_library,
+    improve_lifts, plan_week, week_json, weekly_plan,
+)
+
+GOALS = [
+    {'days_per_week': days, 'high_level_focus': focus, 'strength_focus': strength_focus,
+     'equipment': ['all'], 'muscle_target': target}
+    for days, focus in [(3, 'strength'), (4, 'cardio'), (5, 'strength')]
+    for strength_focus in ['hypertrophy', 'strength']
+    for target in [[], ['chest'], ['quad', 'lat']]
+]
+
+
+def goal_vector(target):
+    return MuscleVector.from_dict(create_muscle_emphasis(target)).normalized()
+
+
+def totals(blocks, picks, fixed):
+    result = fixed.copy()
+    for block, choice in zip(blocks, picks):
+        result += OPTIMIZER_LIFTS[block][1][choice].sum(axis=0)
+    return result
+
+
+@pytest.mark.parametrize('plan_goals', GOALS)
+def test_never_worse_than_greedy(plan_goals):
+    _, report = plan_week(plan_goals, get_exercise_library(), 20)
+
+    assert report['distance'] <= report['greedy_distance']
+
+
+@pytest.mark.parametrize('deadline_ms', [5, 25, 100])
+def test_deadline_is_respected(deadline_ms):
+    plan_goals = GOALS[-1]
+    library = get_exercise_library()
+    started = time.perf_counter()
+    week, report = plan_week(plan_goals, library, deadline_ms)
+    elapsed_ms = (time.perf_counter() - started) * 1000
+
+    # One descent step and rebuilding the changed blocks may run past the deadline
+    assert elapsed_ms < deadline_ms + 50
+    assert report['elapsed_ms'] < deadline_ms + 50
+    assert len(week) == plan_goals['days_per_week']
+
+
+def test_zero_deadline_keeps_the_greedy_plan():
+    plan_goals = GOALS[4]
+    library = get_exercise_library()
+
+    week, report = plan_week(plan_goals, library, 0)
+
+    assert report['moves'] == 0 and report['blocks_changed'] == 0
+    assert report['distance'] == report['greedy_distance']
+    assert week_json(week) == week_json(weekly_plan(plan_goals, library))
+
+
+def test_search_reports_the_distance_it_returns():
+    rng = np.random.default_rng(3)
+    blocks = ['U', 'L', 'F', 'A', 'U']
+    choices = [rng.integers(len(OPTIMIZER_LIFTS[b][0].names), size=3).astype(np.intp) for b in blocks]
+    fixed = np.zeros(len(MUSCLES))
+    goal = goal_vector(['chest', 'hamstring'])
+    greedy = emphasis_distance(totals(blocks, choices, fixed), goal)
+
+    best, summary = improve_lifts(blocks, choices, fixed, goal, time.perf_counter() + 5)
+
+    assert summary['converged']
+    assert summary['greedy_distance'] == pytest.approx(greedy)
+    assert summary['distance'] == pytest.approx(emphasis_distance(totals(blocks, best, fixed), goal))
+    assert summary['distance'] < greedy
+    assert [len(choice) for choice in best] == [3] * len(blocks)
@@ -0,0 +1,73 @@
+"""weekly_plan_batch returns exactly what weekly_plan does, goal by goal."""
+from itertools import combinations
+
+import pytest
+
+from engine import (
+    baseline, check_plan_goals, get_exercise_library, schedules, week_json, weekly_plan, weekly_plan_batch,
+)
+
+STRENGTH_FOCUSES = ['endurance', 'hypertrophy', 'power', 'strength']
+KITS = [['all'], ['dumbbell', 'bench'], ['barbell', 'plates', 'rack', 'bench'], []]
+SQUAD_SIZES = [4, 12, 20, 40]
+CARDIO_FOCUSES = ['distance', 'speed']
+
+
+def all_goals():
+    targets = [[]] + [[m] for m in baseline] + [list(pair) for pair in combinations(baseline, 2)]
+    goals = []
+    for days, focus in sorted((d, f) for d in schedules for f in schedules[d]):
+        for strength_focus in STRENGTH_FOCUSES:
+            for target in targets:
+                i = len(goals)
+                goals.append({
+                    'days_per_week': days,
+                    'high_level_focus': focus,
+                    'strength_focus': strength_focus,
+                    'muscle_target': target,
+                    'equipment': KITS[i % len(KITS)],
+                    'num_soldiers': SQUAD_SIZES[i // len(KITS) % len(SQUAD_SIZES)],
+                    'cardio_focus': CARDIO_FOCUSES[i // 3 % len(CARDIO_FOCUSES)],
+                })
+    return goals
+
+
+def test_batch_matches_weekly_plan():
+    library = get_exercise_library()
+    goals = all_goals()
+
+    batch = weekly_plan_batch(goals, library)
+
+    assert len(batch) == len(goals)
+    for plan_goals, week in zip(goals, batch):
+        assert week_json(week) == week_json(weekly_plan(plan_goals, library)), plan_goals
+
+
+def test_batch_handles_mixed_and_empty_input():
+    library = get_exercise_library()
+    goals = all_goals()[::97]
+
+    assert weekly_plan_batch([], library) == []
+    for plan_goals, week in zip(goals, weekly_plan_batch(goals[::-1], library)[::-1]):
+        assert week_json(week) == week_json(weekly_plan(plan_goals, library))
+
+
+def test_every_generated_goal_passes_the_check():
+    for plan_goals in all_goals():
+        check_plan_goals(plan_goals)
+
+
+@pytest.mark.parametrize('bad,field', [
+    ({'days_per_week': 6}, 'days_per_week'),
+    ({'days_per_week': '3'}, 'days_per_week'),
+    ({'days_per_week': [3]}, 'days_per_week'),
+    ({'high_level_focus': 'mobility'}, 'high_level_focus'),
+    ({'num_soldiers': 0}, 'num_soldiers'),
+    ({'num_soldiers': '20'}, 'num_soldiers'),
+    ({'equipment': 'all'}, 'equipment'),
+    ({'muscle_target': 'chest'}, 'muscle_target'),
+])
+def test_unsupported_goals_name_the_field(bad, field):
+    plan_goals = dict(all_goals()[0], **bad)
+    with pytest.raises(ValueError, match=field):
+        check_plan_goals(plan_goals)
@@ -0,0 +1,34 @@
+import pytest
+
+from engine import PlanCache, get_exercise_library, weekly_plan, week_json
+
+GOALS = {'days_per_week': 3, 'high_level_focus': 'strength', 'strength_focus': 'hypertrophy',
+         'equipment': ['barbell', 'dumbbell'], 'muscle_target': ['chest']}
+
+
+@pytest.mark.parametrize('odd', [
+    {'equipment': [['barbell']]},
+    {'muscle_target': [['chest']]},
+    {'equipment': ['barbell', 1]},
+])
+def test_uncanonicalizable_goals_are_planned_uncached(odd):
+    library = get_exercise_library()
+    cache = PlanCache(library)
+    plan_goals = dict(GOALS, **odd)
+
+    week = cache.get(plan_goals)
+
+    assert week_json(week) == week_json(weekly_plan(plan_goals, library))
+    assert cache.stats()['misses'] == 1
+    assert cache.stats()['size'] == 0
+
+
+def test_reordered_goals_hit_and_get_copies():
+    cache = PlanCache(get_exercise_library())
+    first = cache.get(GOALS)
+    first[0].circuits[0].exercises[0].reps = "99"
+
+    second = cache.get(dict(GOALS, equipment=['dumbbell', 'barbell', 'barbell']))
+
+    assert cache.stats()['hits'] == 1
+    assert second[0].circuits[0].exercises[0].reps != "99"
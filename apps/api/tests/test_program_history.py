@@ -0,0 +1,78 @@
+"""Keyset pagination of program history, in list_programs and GET /programs."""
+import asyncio
+
+import pytest
+
+from database import PROGRAMS_PAGE_LIMIT
+
+DAYS = [{'day': 1, 'focus': 'Full', 'circuits': [{'exercises': [], 'rounds': 3}]}]
+
+
+def save_programs(db, count):
+    return db.save_programs_bulk([(f"Program {i}", "", DAYS) for i in range(count)])
+
+
+def test_pages_cover_every_program_once(db):
+    ids = save_programs(db, 25)
+
+    seen, after, sizes = [], None, []
+    while True:
+        programs, after = db.list_programs(after, 10)
+        sizes.append(len(programs))
+        seen.extend(program['id'] for program in programs)
+        if after is None:
+            break
+
+    # Same created_at second for all: id breaks the tie, newest first
+    assert sizes == [10, 10, 5]
+    assert seen == sorted(ids, reverse=True)
+    assert all(program['workout_count'] == 1 for program in db.list_programs(None, 100)[0])
+
+
+def test_full_last_page_is_followed_by_an_empty_one(db):
+    save_programs(db, 4)
+
+    first, after = db.list_programs(None, 4)
+    assert len(first) == 4 and after is not None
+    assert db.list_programs(after, 4) == ([], None)
+
+
+def test_include_workouts_and_limit_clamp(db):
+    save_programs(db, 3)
+
+    programs, _ = db.list_programs(None, PROGRAMS_PAGE_LIMIT + 1, include_workouts=True)
+    assert len(programs) == 3
+    assert [w['day_number'] for w in programs[0]['workouts']] == [1]
+    assert 'workouts' not in db.list_programs(None, 1)[0][0]
+    assert len(db.list_programs(None, 0)[0]) == 1
+
+
+def page(api, after=None, limit=20):
+    return asyncio.run(api.list_programs_endpoint(after=after, limit=limit, include_workouts=False))
+
+
+def test_endpoint_follows_next(api, db):
+    ids = save_programs(db, 7)
+
+    seen, after = [], None
+    while True:
+        result = page(api, after, 3)
+        seen.extend(program['id'] for program in result['programs'])
+        after = result['next']
+        if after is None:
+            break
+
+    assert seen == sorted(ids, reverse=True)
+
+
+@pytest.mark.parametrize('after,limit', [
+    ('no-comma', 20),
+    ('2026-10-18 00:00:00,abc', 20),
+    (',5', 20),
+    (None, 0),
+    (None, PROGRAMS_PAGE_LIMIT + 1),
+])
+def test_endpoint_rejects_bad_cursor_and_limit(api, db, after, limit):
+    with pytest.raises(api.HTTPException) as error:
+        page(api, after, limit)
+    assert error.value.status_code == 400
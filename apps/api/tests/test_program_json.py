@@ -0,0 +1,15 @@
+def test_workouts_and_components_come_back_in_order(db):
+    days = [{'day': 3 - i, 'focus': 'A'} for i in range(3)]
+    program_id = db.save_program_to_db("p", "", days)
+    for workout_id, _ in db.get_program_workouts(program_id):
+        db.update_workout_components(workout_id, [
+            {'component_type': 'circuit', 'order_index': i, 'data': {'exercises': [], 'n': i}}
+            for i in (3, 1, 2)
+        ])
+
+    latest = db.get_latest_program()
+    listed, = db.list_programs(include_workouts=True)[0]
+    for program in (latest, listed):
+        assert [w['day_number'] for w in program['workouts']] == [1, 2, 3]
+        for workout in program['workouts']:
+            assert [c['order_index'] for c in workout['components']] == [1, 2, 3]
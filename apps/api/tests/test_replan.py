@@ -0,0 +1,73 @@
+"""replan_after and write_circuit_components, as POST /program/{id}/replan uses them."""
+import pytest
+
+from engine import get_exercise_library, replan_after, schedules, session_to_dict, weekly_plan
+
+GOALS = {'days_per_week': 4, 'high_level_focus': 'strength', 'strength_focus': 'strength',
+         'equipment': ['all'], 'muscle_target': ['chest']}
+
+
+def save_week(db, plan_goals):
+    week = weekly_plan(plan_goals, get_exercise_library())
+    program_id = db.save_program_to_db("p", "", [session_to_dict(session) for session in week])
+    return program_id, [session_to_dict(session)['circuits'] for session in week]
+
+
+def replan(db, program_id, after_day, plan_goals):
+    workouts = db.get_program_workouts(program_id)
+    replanned = replan_after([day for _, day in workouts], after_day, plan_goals, get_exercise_library())
+    changes = {workout_id: replanned[day['day']] for workout_id, day in workouts if day['day'] in replanned}
+    return sorted(replanned), db.write_circuit_components(changes)
+
+
+def stored_circuits(db, program_id):
+    return [day['circuits'] for _, day in db.get_program_workouts(program_id)]
+
+
+@pytest.mark.parametrize('days,focus', [(d, f) for d in schedules for f in schedules[d]])
+@pytest.mark.parametrize('strength_focus', ['hypertrophy', 'strength'])
+def test_unchanged_goals_write_nothing(db, days, focus, strength_focus):
+    plan_goals = dict(GOALS, days_per_week=days, high_level_focus=focus, strength_focus=strength_focus)
+    program_id, _ = save_week(db, plan_goals)
+
+    for after_day in range(days + 1):
+        assert replan(db, program_id, after_day, plan_goals) == (list(range(after_day + 1, days + 1)), 0)
+
+
+def test_only_later_days_follow_new_goals(db):
+    program_id, before = save_week(db, GOALS)
+    new_goals = dict(GOALS, muscle_target=['quad', 'glute'])
+
+    replanned, written = replan(db, program_id, 2, new_goals)
+
+    after = stored_circuits(db, program_id)
+    assert replanned == [3, 4]
+    assert written > 0
+    assert after[:2] == before[:2]
+    assert after[2:] != before[2:]
+    assert replan(db, program_id, 2, new_goals) == ([3, 4], 0)
+
+
+def test_deleted_day_is_skipped(db):
+    program_id, before = save_week(db, GOALS)
+    workout_ids = [workout_id for workout_id, _ in db.get_program_workouts(program_id)]
+    db.delete_workout(workout_ids[1])
+
+    replanned, _ = replan(db, program_id, 2, GOALS)
+
+    assert replanned == [3, 4]
+    assert stored_circuits(db, program_id)[0] == before[0]
+
+
+def test_circuits_move_back_to_their_slots(db):
+    program_id, before = save_week(db, GOALS)
+    workouts = db.get_program_workouts(program_id)
+    last_id, last_day = workouts[-1]
+    assert len(last_day['circuits']) > 1
+    db.write_circuit_components({last_id: last_day['circuits'][::-1]})
+
+    replanned, written = replan(db, program_id, len(workouts) - 1, GOALS)
+
+    assert replanned == [len(workouts)]
+    assert written == sum(a != b for a, b in zip(last_day['circuits'], last_day['circuits'][::-1]))
+    assert stored_circuits(db, program_id) == before
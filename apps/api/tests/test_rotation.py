@@ -0,0 +1,77 @@
+"""schedule_rotation fits every group through every station within capacity."""
+import random
+
+import numpy as np
+import pytest
+
+from engine import OPEN_STATION_CAPACITY, schedule_rotation
+
+COUNTS = {'dumbbell': 6, 'barbell': 2, 'plates': 10, 'bench': 3}
+
+STATIONS = [
+    {'name': 'Push-ups', 'equipment': []},
+    {'name': 'Dumbbell Row', 'equipment': ['dumbbell']},
+    {'name': 'Barbell Row', 'equipment': ['barbell', 'plates']},
+]
+
+
+def check_plan(plan, stations, num_soldiers):
+    assert sum(plan.group_sizes) == num_soldiers
+    assert max(plan.group_sizes) - min(plan.group_sizes) <= 1
+    assert plan.slots.shape == (len(plan.group_sizes), len(stations))
+    sizes = np.array(plan.group_sizes)
+    for slots in plan.slots:
+        # Each group works every station once, one station at a time
+        assert len(set(slots.tolist())) == len(stations)
+    for slot in range(plan.slot_count):
+        for station, groups in enumerate(plan.station_groups(slot)):
+            assert sizes[groups].sum() <= plan.capacities[station]
+
+
+def test_known_circuit():
+    plan = schedule_rotation(STATIONS, 12, COUNTS, work_seconds=45, rest_seconds=15,
+                             rounds=3, rest_between_rounds=60)
+
+    assert plan.capacities == [OPEN_STATION_CAPACITY, 6, 2]
+    # One soldier per group needs 12 / 2 = 6 slots; pairs also need 6 and win the tie
+    assert plan.group_sizes == [2] * 6
+    assert plan.slot_count == 6
+    assert plan.slot_seconds == 60
+    assert plan.total_seconds == 3 * 6 * 60 + 2 * 60
+    check_plan(plan, STATIONS, 12)
+
+    as_dict = plan.to_dict()
+    assert len(as_dict['slots']) == 6
+    assert all(len(groups) == len(STATIONS) for groups in as_dict['slots'])
+
+
+def test_small_formation_uses_one_slot_per_station():
+    plan = schedule_rotation(STATIONS[:2], 5, COUNTS)
+
+    assert plan.slot_count == 2
+    check_plan(plan, STATIONS[:2], 5)
+
+
+def test_random_circuits_stay_within_capacity():
+    rng = random.Random(7)
+    kinds = [[], ['dumbbell'], ['barbell', 'plates'], ['bench', 'dumbbell']]
+    for _ in range(200):
+        stations = [{'name': str(i), 'equipment': rng.choice(kinds)} for i in range(rng.randint(1, 8))]
+        counts = {item: rng.randint(1, 12) for item in COUNTS}
+        num_soldiers = rng.randint(1, 150)
+
+        plan = schedule_rotation(stations, num_soldiers, counts)
+
+        check_plan(plan, stations, num_soldiers)
+        assert plan.slot_count >= len(stations)
+
+
+@pytest.mark.parametrize('stations,num_soldiers,counts,message', [
+    ([], 10, COUNTS, 'at least one station'),
+    (STATIONS, 0, COUNTS, 'at least one soldier'),
+    (STATIONS, 10, dict(COUNTS, barbell=0), 'Barbell Row'),
+    (STATIONS, 10, {'dumbbell': 6}, 'Barbell Row'),
+])
+def test_impossible_rotations_raise(stations, num_soldiers, counts, message):
+    with pytest.raises(ValueError, match=message):
+        schedule_rotation(stations, num_soldiers, counts)
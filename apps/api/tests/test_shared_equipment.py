@@ -0,0 +1,99 @@
+"""schedule_shared_equipment never books more of an item than the gym has."""
+from collections import Counter
+
+import pytest
+
+from engine import (
+    BOOKING_STEP_SECONDS, Circuit, Prescription, WorkoutSession, circuit_seconds, get_exercise_library,
+    schedule_shared_equipment, weekly_plan,
+)
+
+COUNTS = {'barbell': 2, 'plates': 4, 'rack': 1, 'bench': 2, 'dumbbell': 8, 'kettlebell': 2}
+
+KITS = [['all'], ['barbell', 'plates', 'rack', 'bench'], ['dumbbell', 'bench', 'kettlebell']]
+
+
+def squad_sessions(day):
+    library = get_exercise_library()
+    sessions = []
+    for i, kit in enumerate(KITS * 2):
+        plan_goals = {'days_per_week': 3, 'high_level_focus': 'strength', 'strength_focus': 'strength',
+                      'equipment': kit, 'muscle_target': [['chest'], ['quad'], []][i % 3], 'num_soldiers': 12}
+        sessions.append(weekly_plan(plan_goals, library)[day])
+    return sessions, KITS * 2
+
+
+def steps(circuit):
+    return -(-circuit_seconds(circuit) // BOOKING_STEP_SECONDS)
+
+
+def check_bookings(bookings, sessions, kits, counts):
+    by_name = {e.name: e for exercises in get_exercise_library().values() for e in exercises}
+    usage = Counter()
+    for booking, session, kit in zip(bookings, sessions, kits):
+        assert sorted(booking.circuit_order) == list(range(len(session.circuits)))
+        assert len(booking.session.circuits) == len(session.circuits)
+
+        end = 0
+        for circuit, start in zip(booking.session.circuits, booking.circuit_starts):
+            # A squad runs one circuit at a time
+            assert start % BOOKING_STEP_SECONDS == 0 and start >= end
+            first = start // BOOKING_STEP_SECONDS
+            end = start + steps(circuit) * BOOKING_STEP_SECONDS
+            for step in range(first, first + steps(circuit)):
+                for exercise in circuit.exercises:
+                    for item in exercise.equipment:
+                        if item in counts:
+                            usage[item, step] += 1
+
+        names = {e.name for circuit in booking.session.circuits for e in circuit.exercises}
+        for old, new in booking.substitutions:
+            assert new in names
+            assert by_name[new].category == by_name[old].category
+            assert 'all' in kit or set(by_name[new].equipment) <= set(kit)
+
+    for (item, step), used in usage.items():
+        assert used <= counts[item], (item, step)
+
+
+@pytest.mark.parametrize('day', [0, 1, 2])
+def test_squads_share_without_overbooking(day):
+    sessions, kits = squad_sessions(day)
+
+    bookings = schedule_shared_equipment(sessions, COUNTS, get_exercise_library(), kits)
+
+    assert [booking.squad for booking in bookings] == list(range(len(sessions)))
+    check_bookings(bookings, sessions, kits, COUNTS)
+
+
+def test_plenty_of_equipment_starts_everyone_at_once():
+    sessions, kits = squad_sessions(0)
+    counts = {item: 100 for item in COUNTS}
+
+    bookings = schedule_shared_equipment(sessions, counts, get_exercise_library(), kits)
+
+    assert all(booking.start_seconds == 0 and not booking.substitutions for booking in bookings)
+    check_bookings(bookings, sessions, kits, counts)
+
+
+def deadlift_session():
+    deadlift = next(e for e in get_exercise_library()['hinge'] if e.name == 'Barbell Deadlift')
+    return WorkoutSession(day=1, circuits=[Circuit([Prescription(deadlift, "5")])])
+
+
+def test_squad_waits_for_the_only_barbell():
+    sessions = [deadlift_session(), deadlift_session()]
+    counts = {'barbell': 1, 'plates': 10}
+
+    bookings = schedule_shared_equipment(sessions, counts, {}, [['all'], ['all']])
+
+    length = steps(sessions[0].circuits[0]) * BOOKING_STEP_SECONDS
+    assert sorted(booking.start_seconds for booking in bookings) == [0, length]
+    check_bookings(bookings, sessions, [['all'], ['all']], counts)
+
+
+def test_circuit_too_big_for_the_gym_raises():
+    session = deadlift_session()
+
+    with pytest.raises(ValueError, match='Squad 1 circuit 1 needs more barbell'):
+        schedule_shared_equipment([session], {'barbell': 0}, {}, [['all']])